@@ -11,7 +11,11 @@ from .models import (
     User, 
     Cargo, 
     Empleado,
-    Alert
+    Alert,
+    AlertDailySummary,
+    AlertSnapshot,
+    Camera,
+    RecordingAnalysis
 )
 
 # --- 1. Definir la clase Admin para el modelo User personalizado ---
@@ -65,6 +69,35 @@ class AlertAdmin(admin.ModelAdmin):
     readonly_fields = ('timestamp',)  # campo solo lectura
 
 
+class AlertDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ('date', 'total', 'level_high', 'resolved', 'status_non_compliant')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False  # Lo mantiene Alert.save() / backfill_alert_rollup
+
+
+class AlertSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('path', 'alert', 'camera', 'width', 'height', 'size', 'created_at')
+    list_filter = ('camera',)
+    search_fields = ('path', 'checksum')
+    raw_id_fields = ('alert',)
+    readonly_fields = ('size', 'width', 'height', 'checksum', 'created_at')
+
+
+class CameraAdmin(admin.ModelAdmin):
+    list_display = ('name', 'source_type', 'url', 'ip_address', 'port', 'fps_target', 'enabled')
+    list_editable = ('enabled',)
+    list_filter = ('source_type', 'enabled')
+    search_fields = ('name', 'url', 'ip_address')
+
+
+class RecordingAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('path', 'model_version', 'status', 'progress', 'detections_count', 'alerts_count', 'finished_at')
+    list_filter = ('status', 'model_version')
+    search_fields = ('path',)
+    readonly_fields = ('chunks_done', 'started_at', 'finished_at', 'last_error')
+
 
 
 # --- 3. Registrar los modelos en el sitio de administración ---
@@ -83,6 +116,10 @@ admin.site.register(Cargo)
 admin.site.register(Empleado, EmpleadoAdmin)
 # Register your models here.
 admin.site.register(Alert, AlertAdmin)
+admin.site.register(AlertDailySummary, AlertDailySummaryAdmin)
+admin.site.register(AlertSnapshot, AlertSnapshotAdmin)
+admin.site.register(Camera, CameraAdmin)
+admin.site.register(RecordingAnalysis, RecordingAnalysisAdmin)
 
 
 
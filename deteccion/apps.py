@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DeteccionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deteccion'
+
+    def ready(self):
+        # Invalidación de la caché de reportes al guardar o borrar (ver caching.py)
+        from .caching import connect_invalidation_signals
+        connect_invalidation_signals()
@@ -0,0 +1,72 @@
+# deteccion/association.py
+"""
+Asociación espacial de cajas de EPP a cada persona detectada.
+
+Cada elemento se busca en una franja vertical de la caja de la persona
+(casco en la cabeza, chaleco en el torso, botas en los pies). Un elemento se
+asigna a la persona cuya franja cubre la mayor fracción de su caja, de modo
+que el casco de un trabajador no "cubre" a un compañero sin casco. Todo se
+calcula con operaciones NumPy sobre las matrices personas × elementos, sin
+recorrer nombres de clase por frame.
+"""
+import numpy as np
+
+# Franjas (inicio, fin) como fracción de la altura de la persona, desde arriba
+ITEM_BANDS = {
+    'helmet': (0.0, 0.3),
+    'vest': (0.2, 0.7),
+    'boots': (0.7, 1.0),
+}
+MIN_OVERLAP = 0.3  # Fracción mínima de la caja del elemento dentro de la franja
+
+
+def class_ids(names, wanted):
+    """IDs de clase (según `names` {id: nombre}) de cada nombre en `wanted`; -1 si no existe"""
+    inverso = {nombre: i for i, nombre in names.items()}
+    return np.array([inverso.get(nombre, -1) for nombre in wanted], dtype=np.int64)
+
+
+def associate_items(boxes, classes, person_ids, item_ids, item_classes, min_overlap=MIN_OVERLAP):
+    """
+    Asocia elementos de EPP a personas en una sola pasada.
+
+    `boxes` (D×4 xyxy) y `classes` (D) son todas las detecciones del frame;
+    `person_ids` son los IDs de clase de persona e `item_ids` los IDs de cada
+    elemento de `item_classes` (en el mismo orden). Devuelve
+    (índices de las personas en `boxes`, matriz de cumplimiento P×K) donde
+    la fila p indica qué elementos se asociaron a la persona p.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    classes = np.asarray(classes).reshape(-1)
+    person_idx = np.flatnonzero(np.isin(classes, person_ids))
+    compliance = np.zeros((len(person_idx), len(item_classes)), dtype=bool)
+
+    # Para cada detección, posición del elemento en item_classes (-1 = no es EPP)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    coincide = classes[:, None] == item_ids[None, :]
+    item_k = np.where(coincide.any(axis=1), coincide.argmax(axis=1), -1)
+    item_idx = np.flatnonzero(item_k >= 0)
+    if len(person_idx) == 0 or len(item_idx) == 0:
+        return person_idx, compliance
+
+    personas = boxes[person_idx]                      # P×4
+    items = boxes[item_idx]                           # M×4
+    k = item_k[item_idx]                              # M
+    bandas = np.array([ITEM_BANDS[c] for c in item_classes], dtype=np.float32)[k]  # M×2
+
+    # Franja de cada persona para el tipo de cada elemento: P×M
+    alto = (personas[:, 3] - personas[:, 1])[:, None]
+    banda_y1 = personas[:, 1, None] + alto * bandas[None, :, 0]
+    banda_y2 = personas[:, 1, None] + alto * bandas[None, :, 1]
+
+    ancho_inter = np.clip(np.minimum(personas[:, 2, None], items[None, :, 2]) -
+                          np.maximum(personas[:, 0, None], items[None, :, 0]), 0, None)
+    alto_inter = np.clip(np.minimum(banda_y2, items[None, :, 3]) -
+                         np.maximum(banda_y1, items[None, :, 1]), 0, None)
+    area_item = np.maximum((items[:, 2] - items[:, 0]) * (items[:, 3] - items[:, 1]), 1e-6)
+    cobertura = ancho_inter * alto_inter / area_item[None, :]
+
+    mejor = cobertura.argmax(axis=0)                  # Persona con más cobertura por elemento
+    valido = cobertura[mejor, np.arange(len(item_idx))] >= min_overlap
+    compliance[mejor[valido], k[valido]] = True
+    return person_idx, compliance
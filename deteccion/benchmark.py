@@ -0,0 +1,241 @@
+# deteccion/benchmark.py
+"""
+Benchmark reproducible del pipeline de detección (comando bench_pipeline).
+
+Reproduce un video fijo o un set de frames sintéticos (generados con una
+semilla) por el mismo camino que DroidCamera.read_frame: inferencia,
+alertas por persona, dibujo y codificación JPEG. Los frames se decodifican
+de antemano y se sirven desde memoria (ReplayCapture), de modo que la
+lectura del disco no agrega ruido; las alertas se cuentan pero no se
+guardan (sin base de datos ni archivos).
+
+El resultado es un diccionario listo para guardarse como JSON y comparar
+corridas entre commits, tamaños de inferencia (imgsz) o backends (modelo
+.pt, .onnx, .engine...).
+"""
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import psutil
+
+from .droidcam import DroidCamera
+from .metrics import PipelineMetrics
+from .models import Camera
+
+
+class ReplayCapture:
+    """Sustituto de cv2.VideoCapture que entrega frames ya decodificados, en bucle"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        # Copia: el pipeline dibuja sobre el frame y la próxima vuelta debe llegar limpio
+        return True, frame.copy()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position % len(self.frames)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.frames)
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+        return True
+
+    def release(self):
+        pass
+
+
+def load_video_frames(path, limit=None, size=None):
+    """Decodifica hasta `limit` frames del video (opcionalmente redimensionados a `size`)"""
+    video = cv2.VideoCapture(path)
+    frames = []
+    try:
+        while limit is None or len(frames) < limit:
+            ok, frame = video.read()
+            if not ok:
+                break
+            frames.append(cv2.resize(frame, size) if size else frame)
+    finally:
+        video.release()
+    return frames
+
+
+def synthetic_frames(count, size=(640, 480), seed=0):
+    """Frames deterministas: fondo con ruido y rectángulos de colores (no triviales para JPEG)"""
+    rng = np.random.default_rng(seed)
+    ancho, alto = size
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(60, 120, size=(alto, ancho, 3), dtype=np.uint8)
+        for _ in range(6):
+            x1, y1 = int(rng.integers(0, ancho - 40)), int(rng.integers(0, alto - 80))
+            x2, y2 = x1 + int(rng.integers(20, 120)), y1 + int(rng.integers(40, 240))
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+        frames.append(frame)
+    return frames
+
+
+class BenchmarkCamera(DroidCamera):
+    """DroidCamera sin base de datos: las alertas sólo se cuentan"""
+
+    def __init__(self, frames, **kwargs):
+        # Registro Camera sin guardar: fuente propia, sin ROI de la base ni modo demo
+        super().__init__(camera=Camera(name='benchmark', source_type='file', url='benchmark'), **kwargs)
+        self.video = ReplayCapture(frames)
+        self.is_running = True
+        self.alerts = 0
+
+    def save_alert_capture(self, frame, alert_message, missing_item, track_id=None):
+        self.alerts += 1
+        return None
+
+    def _reconnect_camera(self):
+        pass
+
+
+def _percentiles(valores):
+    valores = np.asarray(valores, dtype=np.float64)
+    if not valores.size:
+        return {}
+    p50, p95, p99 = np.quantile(valores, (0.5, 0.95, 0.99))
+    return {
+        'mean_ms': round(float(valores.mean()) * 1000, 3),
+        'p50_ms': round(float(p50) * 1000, 3),
+        'p95_ms': round(float(p95) * 1000, 3),
+        'p99_ms': round(float(p99) * 1000, 3),
+        'max_ms': round(float(valores.max()) * 1000, 3),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _versions():
+    versiones = {'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__}
+    for modulo in ('torch', 'ultralytics'):
+        try:
+            versiones[modulo] = __import__(modulo).__version__
+        except Exception:
+            versiones[modulo] = None
+    return versiones
+
+
+def run_pipeline_benchmark(frames, model_path=None, frame_count=200, warmup=10, imgsz=320, device=None,
+                           two_stage=False, tier='full', viewers=1, alloc_frames=20, source=None):
+    """
+    Procesa `frame_count` frames (después de `warmup` sin medir) y devuelve
+    el reporte: throughput, latencias por frame y por etapa, memoria y
+    asignaciones por frame (en una pasada aparte con tracemalloc, para no
+    distorsionar los tiempos).
+    """
+    proceso = psutil.Process()
+    rss_inicial = proceso.memory_info().rss
+
+    inicio_carga = time.perf_counter()
+    camera = BenchmarkCamera(frames, model_path=model_path)
+    carga_modelo = time.perf_counter() - inicio_carga
+    camera.imgsz = imgsz
+    camera.device = device
+    camera.two_stage = two_stage
+    camera.viewers = viewers
+
+    def procesar():
+        frame = camera.read_frame()
+        if frame:
+            frame.jpeg(tier)
+
+    for _ in range(warmup):
+        procesar()
+
+    # Métricas limpias (sin el calentamiento) y fuera del registro global de /metrics
+    camera.metrics = PipelineMetrics('benchmark', window=max(frame_count, 1))
+    latencias = []
+    rss_pico = proceso.memory_info().rss
+    inicio = time.perf_counter()
+    for _ in range(frame_count):
+        t0 = time.perf_counter()
+        procesar()
+        latencias.append(time.perf_counter() - t0)
+        rss_pico = max(rss_pico, proceso.memory_info().rss)
+    total = time.perf_counter() - inicio
+
+    etapas = {
+        nombre: {
+            'p50_ms': round(datos['p50'] * 1000, 3),
+            'p95_ms': round(datos['p95'] * 1000, 3),
+            'p99_ms': round(datos['p99'] * 1000, 3),
+            'count': datos['count'],
+        }
+        for nombre, datos in camera.metrics.snapshot().items()
+    }
+
+    # Asignaciones por frame: pico de memoria trazada y bloques netos retenidos
+    picos, bloques = [], []
+    if alloc_frames:
+        tracemalloc.start()
+        try:
+            for _ in range(alloc_frames):
+                actual, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                bloques_antes = sys.getallocatedblocks()
+                procesar()
+                bloques.append(sys.getallocatedblocks() - bloques_antes)
+                picos.append(tracemalloc.get_traced_memory()[1] - actual)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'source': source,
+            'frames': frame_count,
+            'distinct_frames': len(frames),
+            'frame_size': [int(frames[0].shape[1]), int(frames[0].shape[0])],
+            'warmup': warmup,
+            'model': camera.model_path,
+            'imgsz': imgsz,
+            'device': device,
+            'two_stage': two_stage,
+            'tier': tier,
+            'viewers': viewers,
+        },
+        'environment': {
+            **_versions(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'model_load_s': round(carga_modelo, 3),
+        'throughput_fps': round(frame_count / total, 2) if total > 0 else None,
+        'latency': _percentiles(latencias),
+        'stages': etapas,
+        'memory': {
+            'rss_start_mb': round(rss_inicial / 2 ** 20, 1),
+            'rss_peak_mb': round(rss_pico / 2 ** 20, 1),
+            'alloc_peak_kb_per_frame': round(float(np.median(picos)) / 1024, 1) if picos else None,
+            'net_blocks_per_frame': round(float(np.mean(bloques)), 1) if bloques else None,
+        },
+        'alerts': camera.alerts,
+    }
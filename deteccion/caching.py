@@ -0,0 +1,199 @@
+# deteccion/caching.py
+"""
+Caché de reportes y endpoints JSON con claves versionadas.
+
+Cada grupo de datos ("alerts", "capacitaciones") tiene un número de
+versión guardado en la caché `reports` (en archivos, compartida entre los
+workers de gunicorn; o Redis si hay REDIS_URL, ver settings.CACHES). Las
+claves de las vistas incluyen la versión de los grupos de los que
+dependen, así que invalidar un grupo es sólo incrementar su versión: las
+entradas viejas dejan de leerse y vencen solas.
+
+Las señales post_save/post_delete de los modelos de MODEL_NAMESPACES
+(alertas y capacitaciones con sus evaluaciones, progresos, intentos y
+certificados) invalidan su grupo; se conectan en DeteccionConfig.ready y,
+dentro de una transacción, invalidan una sola vez al confirmarla.
+bulk_create, update y los delete() de querysets de Alert no emiten
+señales: quien los use debe llamar a `invalidate()`.
+
+Los endpoints JSON y CSV se suman con el decorador:
+
+    @login_required
+    @cached_view('alerts', timeout=15)
+    def alert_list(request): ...
+
+Las páginas HTML no se guardan enteras (base.html lleva el token CSRF de
+la sesión, que no puede servirse a otra): guardan sólo sus datos con
+`cached_value` y se renderizan en cada pedido.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+
+REPORT_CACHE = 'reports'
+
+# Grupos que invalida cada modelo
+MODEL_NAMESPACES = {
+    'Alert': ('alerts',),
+    'Capacitacion': ('capacitaciones',),
+    'Evaluacion': ('capacitaciones',),
+    'ProgresoCapacitacion': ('capacitaciones',),
+    'IntentoEvaluacion': ('capacitaciones',),
+    'Certificado': ('capacitaciones',),
+}
+
+# Sin receptor post_delete: con él, Django ya no borra los querysets de un
+# golpe sino fila por fila. Alert.delete() invalida a mano, igual que quien
+# borra alertas en bloque (reanálisis, loadtest)
+SAVE_ONLY_MODELS = ('Alert',)
+
+# Cabeceras de la respuesta que se guardan junto con el contenido
+CACHED_HEADERS = ('Content-Type', 'Content-Disposition')
+
+
+def report_cache():
+    """Caché compartida de reportes (la default si no está configurada)"""
+    return caches[REPORT_CACHE] if REPORT_CACHE in settings.CACHES else cache
+
+
+def _version_key(namespace):
+    return f'cache_version:{namespace}'
+
+
+def namespace_versions(namespaces):
+    """Versión actual de cada grupo, inicializando las que falten"""
+    almacen = report_cache()
+    claves = {namespace: _version_key(namespace) for namespace in namespaces}
+    guardadas = almacen.get_many(list(claves.values()))
+    versiones = {}
+    for namespace, clave in claves.items():
+        version = guardadas.get(clave)
+        if version is None:
+            # Una versión nueva nunca coincide con una anterior desalojada de la caché
+            almacen.add(clave, time.time_ns(), timeout=None)
+            version = almacen.get(clave)
+        versiones[namespace] = version
+    return versiones
+
+
+def invalidate(*namespaces):
+    """Invalida los grupos: las claves que dependen de ellos dejan de leerse"""
+    almacen = report_cache()
+    for namespace in namespaces:
+        try:
+            almacen.incr(_version_key(namespace))
+        except ValueError:  # No existía (nunca se leyó o fue desalojada)
+            almacen.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def versioned_key(prefix, versions, *parts):
+    """Clave con las versiones de los grupos y un hash de las partes (rutas, usuario...)"""
+    firma = ':'.join(f'{namespace}{version}' for namespace, version in sorted(versions.items()))
+    resumen = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'{prefix}:{firma}:{resumen}'
+
+
+def cached_value(namespaces, parts, builder, timeout=60):
+    """
+    Devuelve `builder()` guardado hasta `timeout` segundos o hasta que se
+    invalide alguno de `namespaces`; `parts` identifica el valor (vista,
+    filtros...). El valor debe poder serializarse con pickle (listas, no querysets)
+    """
+    almacen = report_cache()
+    clave = versioned_key('data', namespace_versions(namespaces), *parts)
+    valor = almacen.get(clave)
+    if valor is None:
+        valor = builder()
+        almacen.set(clave, valor, timeout)
+    return valor
+
+
+def _uses_csrf_token(request, pedido_antes, respuesta):
+    """La vista puso el token CSRF en la respuesta ({% csrf_token %} llama a get_token)"""
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') and not pedido_antes:
+        return True
+    return b'csrfmiddlewaretoken' in respuesta.content
+
+
+def cached_view(*namespaces, timeout=60, per_user=False):
+    """
+    Guarda las respuestas 200 de GET de la vista hasta `timeout` segundos o
+    hasta que se invalide alguno de `namespaces`. La clave incluye la ruta
+    con su query string y, con `per_user`, el usuario. Las respuestas con
+    token CSRF nunca se guardan (para páginas HTML, ver cached_value).
+    Va debajo de login_required/permission_required.
+    """
+    def decorador(view):
+        @wraps(view)
+        def envoltura(request, *args, **kwargs):
+            # Con mensajes pendientes la página los muestra: no se lee ni se guarda
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            almacen = report_cache()
+            partes = [view.__module__, view.__qualname__, request.get_full_path()]
+            if per_user:
+                partes.append(request.user.pk)
+            clave = versioned_key('view', namespace_versions(namespaces), *partes)
+
+            guardada = almacen.get(clave)
+            if guardada is not None:
+                contenido, cabeceras = guardada
+                respuesta = HttpResponse(contenido)
+                for nombre, valor in cabeceras.items():
+                    respuesta[nombre] = valor
+                respuesta['X-Cache'] = 'HIT'
+                return respuesta
+
+            csrf_pedido = request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            respuesta = view(request, *args, **kwargs)
+            if (respuesta.status_code == 200 and not respuesta.streaming
+                    and not _uses_csrf_token(request, csrf_pedido, respuesta)):
+                cabeceras = {nombre: respuesta[nombre] for nombre in CACHED_HEADERS if respuesta.has_header(nombre)}
+                almacen.set(clave, (respuesta.content, cabeceras), timeout)
+                respuesta['X-Cache'] = 'MISS'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+class _PendingInvalidation:
+    """Grupos a invalidar cuando confirme la transacción en curso (una vez, aunque se borren miles de filas)"""
+
+    def __init__(self):
+        self.namespaces = set()
+
+    def __call__(self):
+        invalidate(*self.namespaces)
+
+
+def _invalidate_for_instance(sender, using=None, **kwargs):
+    namespaces = MODEL_NAMESPACES.get(sender.__name__, ())
+    conexion = transaction.get_connection(using)
+    if not conexion.in_atomic_block:
+        invalidate(*namespaces)
+        return
+    pendiente = getattr(conexion, '_cache_invalidation', None)
+    # Si la transacción anterior se revirtió, su callback ya no está en la lista
+    if pendiente is None or not any(funcion is pendiente for _, funcion, _ in conexion.run_on_commit):
+        pendiente = conexion._cache_invalidation = _PendingInvalidation()
+        transaction.on_commit(pendiente, using=using)
+    pendiente.namespaces.update(namespaces)
+
+
+def connect_invalidation_signals():
+    """Conecta post_save/post_delete de los modelos de MODEL_NAMESPACES (DeteccionConfig.ready)"""
+    from django.apps import apps
+
+    for nombre in MODEL_NAMESPACES:
+        modelo = apps.get_model('deteccion', nombre)
+        senales = (post_save,) if nombre in SAVE_ONLY_MODELS else (post_save, post_delete)
+        for senal in senales:
+            senal.connect(_invalidate_for_instance, sender=modelo, dispatch_uid=f'cache_invalidation_{nombre}_{id(senal)}')
@@ -1,18 +1,27 @@
 import cv2
 import numpy as np
 import os
-from ultralytics import YOLO
+from .detections import Detections
+from .encoding import DEFAULT_TIER, RENDITIONS, encode_jpeg
+from .metrics import pipeline_metrics
+from .overlay import OverlayRenderer
+from .preload import load_model
+from .tracking import PersonTracker, track_people
 
 class VideoCamera:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, source=None):
         self.video = None
+        self.source = source  # Índice o URL; None = probar las cámaras locales
         self.is_running = False
         self.out = None
         self.is_recording = False
         self.last_detection_time = None
         self.no_detection_threshold = 5  # segundos sin detección antes de detener la grabación
         self.current_recording_filename = None
-        self.last_alert_time = None
+        self.tracker = PersonTracker()
+        self.alert_cooldown = 10  # Segundos entre alertas de una misma persona
+        self.overlay = OverlayRenderer()  # Dibujo en el mismo frame con textos en caché
+        self.metrics = pipeline_metrics('webcam')  # Tiempos por etapa para /metrics
         
         # Ruta absoluta al modelo
         model_path = r'C:\Users\jonat\Desktop\modelo_entrenado\sistema\epp\Models\best.pt'
@@ -22,7 +31,7 @@ class VideoCamera:
             
         try:
             print(f"Intentando cargar modelo YOLOv8 desde: {model_path}")
-            self.model = YOLO(model_path)  # Carga el modelo YOLOv8
+            self.model = load_model(model_path)  # Carga el modelo YOLOv8 (o clona el precargado)
             print("Modelo YOLOv8 cargado exitosamente")
             
             # Configuramos el modelo para inferencia
@@ -73,7 +82,7 @@ class VideoCamera:
     def start(self):
         if not self.is_running:
             # Intentar diferentes índices de cámara
-            camera_indices = [0, 1, -1]  # Probar índice 0, 1 y el default
+            camera_indices = [self.source] if self.source is not None else [0, 1, -1]  # Probar índice 0, 1 y el default
             
             for idx in camera_indices:
                 print(f"Intentando abrir cámara con índice {idx}")
@@ -124,8 +133,10 @@ class VideoCamera:
             return None
             
         try:
-            success, image = self.video.read()
+            with self.metrics.stage('capture'):
+                success, image = self.video.read()
             if not success:
+                self.metrics.frame_dropped()
                 print("Error al leer frame de la cámara. Verificando estado:")
                 print(f"- Is Opened: {self.video.isOpened()}")
                 print(f"- Frame Width: {self.video.get(cv2.CAP_PROP_FRAME_WIDTH)}")
@@ -133,8 +144,11 @@ class VideoCamera:
                 print(f"- FPS: {self.video.get(cv2.CAP_PROP_FPS)}")
                 return None
             
+            self.metrics.frame_done()
+
             # Realizar predicción con YOLOv8
-            results = self.model.predict(image, conf=0.25, show=False)
+            with self.metrics.stage('inference'):
+                results = self.model.predict(image, conf=0.25, show=False)
             
             # Obtener el primer resultado
             if results and len(results) > 0:
@@ -152,63 +166,69 @@ class VideoCamera:
                     
                     # Grabar el frame si está grabando
                     if self.is_recording:
-                        self.out.write(image)
+                        with self.metrics.stage('record'):
+                            self.out.write(image)
                 
-                # Dibujar las detecciones en la imagen
-                annotated_frame = result.plot()
+                detections = Detections.from_result(result)
                 # Detectar clases y guardar alertas si falta algún elemento
                 try:
-                    detected_classes = [self.model.names[int(cls)] for cls in result.boxes.cls]
                     required_items = ["person", "helmet", "vest", "boots"]
-                    if "person" in detected_classes:
-                        missing = [item for item in required_items[1:] if item not in detected_classes]
-                        import time
-                        now = time.time()
+                    import time
+                    now = time.time()
+                    # Cada persona (track) tiene su propio cooldown de alertas
+                    for track, cumplimiento in track_people(self.tracker, detections,
+                                                            required_items[1:], now):
+                        missing = [item for item, ok in zip(required_items[1:], cumplimiento) if not ok]
+                        track.observe(missing, now)
+                        if not track.cooled_down(now, self.alert_cooldown):
+                            continue
                         if missing:
                             # Crear alerta en DB (si está disponible)
                             try:
                                 from .models import Alert
-                                if not self.last_alert_time or (now - self.last_alert_time) > 10:
+                                with self.metrics.stage('alert_db'):
                                     Alert.objects.create(
                                         message=f"Persona sin {', '.join(missing)}",
                                         missing=', '.join(missing),
                                         level='high',
                                         video=self.current_recording_filename or ''
                                     )
-                                    self.last_alert_time = now
+                                track.mark_alerted(now)
                             except Exception as e:
                                 print(f"No se pudo guardar alerta: {e}")
                         else:
                             # Todos los elementos presentes: alerta positiva (opcional)
                             try:
                                 from .models import Alert
-                                if not self.last_alert_time or (now - self.last_alert_time) > 10:
+                                with self.metrics.stage('alert_db'):
                                     Alert.objects.create(
                                         message="Persona con EPP completo",
                                         missing='',
                                         level='positive',
                                         video=self.current_recording_filename or ''
                                     )
-                                    self.last_alert_time = now
+                                track.mark_alerted(now)
                             except Exception as e:
                                 print(f"No se pudo guardar alerta positiva: {e}")
                 except Exception:
                     pass
                 
-                # Añadir contador de detecciones y estado de grabación
-                cv2.putText(annotated_frame, f"Detecciones: {num_detections}", (10, 30),
-                          cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                if self.is_recording:
-                    cv2.putText(annotated_frame, "REC", (10, 70),
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                # Dibujar las detecciones en la misma imagen (ya se grabó sin anotar)
+                with self.metrics.stage('overlay'):
+                    annotated_frame = self.overlay.draw_detections(image, detections)
+                    # Añadir contador de detecciones y estado de grabación
+                    self.overlay.text(annotated_frame, f"Detecciones: {num_detections}", (10, 30), 1, (0, 255, 0), 2)
+                    if self.is_recording:
+                        self.overlay.text(annotated_frame, "REC", (10, 70), 1, (0, 0, 255), 2)
                 
                 # Convertir a JPEG
-                ret, jpeg = cv2.imencode('.jpg', annotated_frame)
-                if not ret:
+                with self.metrics.stage('encode'):
+                    jpeg = encode_jpeg(annotated_frame, RENDITIONS[DEFAULT_TIER].quality)
+                if jpeg is None:
                     print("Error al codificar imagen a JPEG")
                     return None
                 
-                return jpeg.tobytes()
+                return jpeg
             else:
                 # Si no hay detecciones, verificar si debemos detener la grabación
                 if self.is_recording and self.last_detection_time:
@@ -225,13 +245,11 @@ class VideoCamera:
                 if self.is_recording:
                     cv2.putText(image, "REC", (10, 70),
                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                ret, jpeg = cv2.imencode('.jpg', image)
-                return jpeg.tobytes()
+                return encode_jpeg(image, RENDITIONS[DEFAULT_TIER].quality)
             
         except Exception as e:
             print(f"Error al procesar el frame: {str(e)}")
             if 'image' in locals():
                 # Si hay error pero tenemos la imagen, al menos mostramos la imagen sin procesar
-                ret, jpeg = cv2.imencode('.jpg', image)
-                return jpeg.tobytes()
+                return encode_jpeg(image, RENDITIONS[DEFAULT_TIER].quality)
             return None
\ No newline at end of file
@@ -0,0 +1,37 @@
+# deteccion/dbconn.py
+"""
+Conexiones a la base de datos en los hilos de cámaras.
+
+Django abre una conexión por hilo y, en las peticiones web, la recicla con
+las señales request_started/request_finished: se cierra al vencer
+CONN_MAX_AGE o si quedó inutilizable, y con CONN_HEALTH_CHECKS se verifica
+antes de volver a usarla. Los hilos de captura (CameraWorker, el
+procesamiento del stream) no pasan por esas señales. Con estas funciones
+cada hilo mantiene su propia conexión persistente entre alertas, con el
+mismo ciclo de vida que una petición, y la cierra al terminar.
+"""
+from contextlib import contextmanager
+
+from django.db import close_old_connections, connections
+
+
+def refresh_thread_connection():
+    """
+    Antes de escribir desde un hilo de larga vida: descarta la conexión del
+    hilo si venció o quedó rota (la próxima consulta la verifica o reabre)
+    """
+    close_old_connections()
+
+
+def close_thread_connections():
+    """Cierra las conexiones de este hilo (al salir del hilo)"""
+    connections.close_all()
+
+
+@contextmanager
+def thread_connections():
+    """Bloque de un hilo que usa la base de datos: cierra sus conexiones al salir"""
+    try:
+        yield
+    finally:
+        close_thread_connections()
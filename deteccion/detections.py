@@ -0,0 +1,183 @@
+# deteccion/detections.py
+"""
+Resultados de detección independientes de ultralytics.
+
+`Detections` guarda cajas, clases y confianzas como arreglos NumPy, de modo
+que el pipeline puede trabajar igual con la salida de `model.predict` o con
+resultados precalculados (caché del video de demostración). También
+implementa la detección en dos etapas (personas a baja resolución, EPP sobre
+recortes de cada persona a mayor resolución).
+"""
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .association import class_ids
+from .overlay import default_renderer
+from .tracking import PERSON_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# Videos de prueba que usa el modo demo en Render, en orden de preferencia
+DEMO_VIDEO_CANDIDATES = (
+    os.path.join('media', 'test_video.mp4'),
+    os.path.join('media', 'videos', 'test_video.mp4'),
+    os.path.join('media', 'demo.mp4'),
+)
+
+
+class Detections:
+    """Cajas (xyxy, píxeles), clases y confianzas de un frame"""
+
+    def __init__(self, boxes, classes, confidences, names):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.classes = np.asarray(classes, dtype=np.int16).reshape(-1)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.names = names
+
+    @classmethod
+    def from_result(cls, result):
+        """Convierte un resultado de ultralytics (results[0])"""
+        boxes = result.boxes
+        return cls(
+            boxes.xyxy.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            result.names,
+        )
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def class_names(self):
+        return [self.names[int(c)] for c in self.classes]
+
+    def scaled(self, sx, sy):
+        """Copia con las cajas escaladas (p. ej. tras redimensionar el frame)"""
+        factor = np.array([sx, sy, sx, sy], dtype=np.float32)
+        return Detections(self.boxes * factor, self.classes, self.confidences, self.names)
+
+    def translated(self, dx, dy):
+        """Copia con las cajas desplazadas (p. ej. de un recorte al frame completo)"""
+        offset = np.array([dx, dy, dx, dy], dtype=np.float32)
+        return Detections(self.boxes + offset, self.classes, self.confidences, self.names)
+
+
+def detect_two_stage(model, frame, conf=0.25, person_imgsz=320, crop_imgsz=640, padding=0.1, device=None):
+    """
+    Detección en dos etapas. Primero se buscan personas en el frame completo a
+    `person_imgsz`; si no hay ninguna se devuelve ese resultado (frames vacíos
+    siguen siendo baratos). Si hay personas, se recorta cada una (con un
+    margen `padding` relativo a su caja) del frame original y los recortes se
+    procesan en un solo lote a `crop_imgsz`, donde cascos y botas ocupan
+    muchos más píxeles. El EPP de los recortes se traslada a coordenadas del
+    frame y reemplaza al EPP de la primera etapa. `device` se pasa a ambas
+    inferencias (None = el dispositivo por defecto de ultralytics).
+    """
+    primera = Detections.from_result(model.predict(frame, conf=conf, verbose=False, imgsz=person_imgsz, device=device)[0])
+    person_ids = class_ids(primera.names, PERSON_CLASSES)
+    es_persona = np.isin(primera.classes, person_ids)
+    if not es_persona.any():
+        return primera
+
+    alto, ancho = frame.shape[:2]
+    personas = primera.boxes[es_persona]
+    margen = (personas[:, 2:] - personas[:, :2]) * padding
+    origenes = np.floor(np.maximum(personas[:, :2] - margen, 0)).astype(int)
+    finales = np.ceil(np.minimum(personas[:, 2:] + margen, [ancho, alto])).astype(int)
+    validos = np.all(finales - origenes >= 8, axis=1)
+    origenes, finales = origenes[validos], finales[validos]
+    recortes = [frame[y1:y2, x1:x2] for (x1, y1), (x2, y2) in zip(origenes, finales)]
+
+    boxes = [personas]
+    classes = [primera.classes[es_persona]]
+    confidences = [primera.confidences[es_persona]]
+    if recortes:
+        resultados = model.predict(recortes, conf=conf, verbose=False, imgsz=crop_imgsz, device=device)
+        for (x1, y1), result in zip(origenes, resultados):
+            segunda = Detections.from_result(result)
+            epp = ~np.isin(segunda.classes, person_ids)
+            boxes.append(segunda.boxes[epp] + np.array([x1, y1, x1, y1], dtype=np.float32))
+            classes.append(segunda.classes[epp])
+            confidences.append(segunda.confidences[epp])
+
+    return Detections(np.concatenate(boxes), np.concatenate(classes), np.concatenate(confidences), primera.names)
+
+
+def draw_detections(frame, detections, color=None):
+    """Dibuja cajas y etiquetas sobre el frame (en el mismo arreglo)"""
+    return default_renderer.draw_detections(frame, detections, color=color)
+
+
+def find_demo_video():
+    """Ruta absoluta del video de demostración, o None si no existe"""
+    for relative in DEMO_VIDEO_CANDIDATES:
+        path = os.path.join(settings.BASE_DIR, relative)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def demo_cache_path(video_path):
+    """Archivo .npz con las detecciones precalculadas de un video"""
+    return os.path.splitext(video_path)[0] + '.detections.npz'
+
+
+class DemoDetectionCache:
+    """
+    Detecciones por frame precalculadas con `manage.py precompute_demo_detections`.
+
+    El .npz contiene arreglos planos: `boxes` (N×4), `classes` (N) y
+    `confidences` (N) de todos los frames concatenados, y `offsets` (F+1)
+    con el rango de filas de cada frame: frame i → filas offsets[i]:offsets[i+1].
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.boxes = data['boxes']
+            self.classes = data['classes']
+            self.confidences = data['confidences']
+            self.offsets = data['offsets']
+            self.names = {i: str(name) for i, name in enumerate(data['names'])}
+            self.source_size = tuple(int(v) for v in data['source_size'])
+            self.video_size = int(data['video_size'])
+        self.frame_count = len(self.offsets) - 1
+
+    @classmethod
+    def for_video(cls, video_path):
+        """Carga la caché del video si existe y corresponde al archivo actual"""
+        if not video_path:
+            return None
+        path = demo_cache_path(video_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            cache = cls(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Caché de detecciones inválida ({path}): {e}")
+            return None
+        if cache.video_size != os.path.getsize(video_path):
+            logger.warning(f"⚠️ Caché de detecciones desactualizada para {video_path}, se ignora")
+            return None
+        logger.info(f"✅ Caché de detecciones cargada: {path} ({cache.frame_count} frames)")
+        return cache
+
+    def get(self, frame_index, frame_size=None):
+        """
+        Detecciones del frame `frame_index` (se repite en bucle). Si se indica
+        `frame_size` (ancho, alto) distinto al original, las cajas se escalan.
+        """
+        i = frame_index % self.frame_count
+        start, end = self.offsets[i], self.offsets[i + 1]
+        detections = Detections(self.boxes[start:end], self.classes[start:end],
+                                self.confidences[start:end], self.names)
+        if frame_size and tuple(frame_size) != self.source_size:
+            detections = detections.scaled(frame_size[0] / self.source_size[0],
+                                           frame_size[1] / self.source_size[1])
+        return detections
@@ -1,39 +1,109 @@
 import cv2
 import numpy as np
 import os
+import random
+import threading
 import time
-from ultralytics import YOLO
 import logging
 from django.conf import settings
+from .dbconn import refresh_thread_connection
+from .detections import DemoDetectionCache, Detections, detect_two_stage, find_demo_video
+from .encoding import DEFAULT_TIER, EncodedFrame, encode_jpeg
+from .metrics import pipeline_metrics
+from .overlay import OverlayRenderer
+from .preload import load_model
+from .roi import RegionOfInterest
+from .snapshots import SNAPSHOT_DIR, record_snapshot
+from .thumbnails import get_thumbnail_writer
+from .tracking import PersonTracker, track_people
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUIRED_ITEMS = {
+    "helmet": "Casco",
+    "vest": "Chaleco",
+    "boots": "Botas"
+}
+
+# Reconexión: espera exponencial (1s, 2s, 4s... hasta 30s) con jitter
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+# Límite para abrir/leer streams de red, así un teléfono caído no bloquea el hilo
+STREAM_TIMEOUT_MS = 5000
+
+
+def backoff_delay(attempt, base=RECONNECT_BASE_DELAY, maximum=RECONNECT_MAX_DELAY):
+    """Segundos de espera antes del intento `attempt` (1, 2, ...), entre la mitad y el total del tope"""
+    tope = min(maximum, base * 2 ** (attempt - 1))
+    return random.uniform(tope / 2, tope)
+
+
 class DroidCamera:
-    def __init__(self, model_path=None, ip_address="192.168.1.100", port="4747"):
+    def __init__(self, model_path=None, ip_address="192.168.1.100", port="4747", source=None, camera=None):
         self.video = None
         self.is_running = False
         self.ip_address = ip_address
         self.port = port
+        self.camera = camera  # Registro Camera (ver from_camera)
+        self.source = source  # Origen para cv2.VideoCapture; por defecto la URL de DroidCam
         self.last_alert_time = None
-        self.alert_cooldown = 5
+        self.alert_cooldown = 30  # Segundos entre alertas de una misma persona
         self.last_capture_time = 0
         self.capture_interval = 2
         self.consecutive_errors = 0
         self.max_consecutive_errors = 5
+
+        # ✅ RECONEXIÓN EN SEGUNDO PLANO (get_frame nunca espera)
+        self._reconnect_thread = None
+        self._reconnect_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.reconnect_attempts = 0
+        self.next_retry_at = None
+        self.last_error = None
+        self.last_frame_at = None
+        self.frame_size = (640, 480)
+        self._placeholder = (None, None)
+
+        # ✅ DIBUJO: sprites de texto en caché; viewers=0 (lo fija el supervisor) omite dibujar y codificar
+        self.overlay = OverlayRenderer()
+        self.viewers = None
         
-        # ✅ VARIABLES PARA RETRASO DE 3 SEGUNDOS
-        self.human_detection_time = None
+        # ✅ VARIABLES PARA RETRASO DE 3 SEGUNDOS (por persona, ver tracking.py)
+        self.tracker = PersonTracker()
+        self.human_detection_time = None  # Inicio de la espera más antigua (para el contador en pantalla)
         self.alert_pending = False
-        self.pending_alert_data = None
         self.alert_delay = 3.0
         
-        # ✅ DETECTAR SI ESTAMOS EN RENDER
-        self.is_render = 'RENDER' in os.environ or '.onrender.com' in getattr(settings, 'ALLOWED_HOSTS', [])
+        # ✅ DETECTAR SI ESTAMOS EN RENDER (las cámaras registradas usan siempre su propia fuente)
+        self.is_render = camera is None and (
+            'RENDER' in os.environ or '.onrender.com' in getattr(settings, 'ALLOWED_HOSTS', [])
+        )
+
+        # ✅ MÉTRICAS: tiempos por etapa para /metrics (un pipeline por cámara)
+        if camera is not None:
+            self.metrics = pipeline_metrics(camera.name)
+        else:
+            self.metrics = pipeline_metrics('demo' if self.is_render else f'droidcam {ip_address}:{port}')
         
-        # ✅ CORREGIDO: Usar self.model_path consistentemente
-        self.model_path = settings.MODEL_PATH
+        # ✅ CORREGIDO: Usar self.model_path consistentemente (por defecto, settings.MODEL_PATH)
+        self.model_path = model_path or settings.MODEL_PATH
+        self.model = None
+        self.two_stage = getattr(settings, 'TWO_STAGE_DETECTION', False)
+        self.imgsz = 320  # Tamaño de inferencia (en dos etapas, el de la pasada de personas)
+        self.device = None  # Dispositivo de ultralytics ('cpu', 'cuda:0', ...); None = automático
+        self.roi = RegionOfInterest.for_camera(camera) if camera else self._load_roi()
+        # Los archivos de video se repiten en bucle como el video demo de Render
+        self.loop_video = self.is_render or (camera is not None and camera.source_type == 'file')
+
+        # ✅ EN RENDER: si el video demo tiene detecciones precalculadas
+        # (manage.py precompute_demo_detections) no se necesita el modelo
+        self.demo_cache = DemoDetectionCache.for_video(find_demo_video()) if self.is_render else None
+        self.frame_index = 0
+        if self.demo_cache is not None:
+            logger.info("⚡ Modo demo con detecciones precalculadas: no se carga el modelo YOLO")
+            return
 
         # ✅ CORREGIDO: Verificar self.model_path, no model_path
         if not os.path.exists(self.model_path):
@@ -42,7 +112,8 @@ class DroidCamera:
         try:
             # ✅ CORREGIDO: Usar self.model_path
             logger.info(f"Attempting to load YOLOv8 model from: {self.model_path}")
-            self.model = YOLO(self.model_path)
+            # Clon del modelo precargado en el master de gunicorn, si lo hay (ver preload.py)
+            self.model = load_model(self.model_path)
             logger.info("✅ YOLOv8 model loaded successfully")
 
             # Configuración optimizada
@@ -56,6 +127,16 @@ class DroidCamera:
             logger.error(f"❌ Error loading model: {str(e)}")
             raise
 
+    @classmethod
+    def from_camera(cls, camera):
+        """Crea la cámara a partir de un registro del modelo Camera"""
+        return cls(
+            ip_address=camera.ip_address,
+            port=str(camera.port) if camera.port else None,
+            source=camera.capture_source(),
+            camera=camera,
+        )
+
     def __del__(self):
         self.stop()
 
@@ -69,98 +150,137 @@ class DroidCamera:
             logger.warning(f"Warning during camera release: {e}")
 
     def _reconnect_camera(self):
-        """Reconecta la cámara después de errores"""
-        self.stop()
-        time.sleep(2)  # Esperar antes de reconectar
-        self.start()
-
-    def _check_alert_delay(self, current_time):
-        """Verifica si han pasado 3 segundos desde la detección del humano"""
-        if self.human_detection_time is None:
-            return False
-        
-        elapsed_time = current_time - self.human_detection_time
-        return elapsed_time >= self.alert_delay
-
-    def _process_human_detection(self, frame, detected_classes, current_time):
-        """Procesa la detección de humano con retraso de 3 segundos"""
-        required_items = {
-            "helmet": "Casco",
-            "vest": "Chaleco", 
-            "boots": "Botas"
+        """Programa la reconexión en un hilo aparte; mientras tanto get_frame sirve un placeholder"""
+        with self._reconnect_lock:
+            if self.is_reconnecting:
+                return
+            self.is_running = False
+            self._safe_release_camera()
+            self._stop_event.clear()
+            self._reconnect_thread = threading.Thread(
+                target=self._reconnect_loop, name=f'reconnect-{self.ip_address}:{self.port}', daemon=True
+            )
+            self._reconnect_thread.start()
+
+    @property
+    def is_reconnecting(self):
+        return self._reconnect_thread is not None and self._reconnect_thread.is_alive()
+
+    def _reconnect_loop(self):
+        while not self._stop_event.is_set():
+            self.reconnect_attempts += 1
+            espera = backoff_delay(self.reconnect_attempts)
+            self.next_retry_at = time.time() + espera
+            logger.info(f"🔄 Reintentando conexión en {espera:.1f}s (intento #{self.reconnect_attempts})")
+            if self._stop_event.wait(espera):
+                break
+            if self.start():
+                if self._stop_event.is_set():
+                    # Se detuvo la cámara mientras se conectaba
+                    self.is_running = False
+                    self._safe_release_camera()
+                    break
+                logger.info(f"✅ Cámara reconectada tras {self.reconnect_attempts} intento(s)")
+                self.reconnect_attempts = 0
+                break
+        self.next_retry_at = None
+
+    def _placeholder_frame(self):
+        """JPEG 'Reconectando...' (se regenera sólo al cambiar el intento)"""
+        clave = (self.reconnect_attempts, self.frame_size)
+        if self._placeholder[0] != clave:
+            ancho, alto = self.frame_size
+            imagen = np.full((alto, ancho, 3), 40, dtype=np.uint8)
+            cv2.putText(imagen, "Reconectando camara...", (20, alto // 2 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
+            if self.reconnect_attempts:
+                cv2.putText(imagen, f"Intento #{self.reconnect_attempts}", (20, alto // 2 + 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
+            self._placeholder = (clave, encode_jpeg(imagen, 70))
+        return self._placeholder[1]
+
+    def health(self):
+        """Estado de la conexión de esta cámara"""
+        if self.is_running:
+            estado = 'connected'
+        elif self.is_reconnecting:
+            estado = 'reconnecting'
+        else:
+            estado = 'disconnected'
+        ahora = time.time()
+        return {
+            'state': estado,
+            'reconnect_attempts': self.reconnect_attempts,
+            'next_retry_in': round(max(0.0, self.next_retry_at - ahora), 1) if self.next_retry_at else None,
+            'consecutive_errors': self.consecutive_errors,
+            'last_frame_age': round(ahora - self.last_frame_at, 1) if self.last_frame_at else None,
+            'last_error': self.last_error,
         }
 
-        # Verificar elementos faltantes
-        missing_items = []
-        for item_class, item_label in required_items.items():
-            if item_class not in detected_classes:
-                missing_items.append(item_label)
-
-        # Si hay elementos faltantes
-        if missing_items:
-            if self.human_detection_time is None:
-                # ✅ PRIMERA DETECCIÓN: Iniciar contador de 3 segundos
-                self.human_detection_time = current_time
-                self.alert_pending = True
-                self.pending_alert_data = {
-                    'frame': frame.copy(),
-                    'missing_items': missing_items,
-                    'detection_time': current_time
-                }
-                logger.info(f"🕒 Humano detectado sin EPP. Esperando {self.alert_delay} segundos... Faltan: {', '.join(missing_items)}")
-                return None, None
-            
-            elif self._check_alert_delay(current_time):
-                # ✅ PASARON 3 SEGUNDOS: Generar alerta
+    def _process_people(self, frame, detections, current_time):
+        """
+        Sigue a cada persona entre frames y le asocia el EPP detectado en la
+        franja correspondiente de su caja (cabeza, torso, pies). El retraso de 3 segundos y el cooldown se aplican por persona.
+        Devuelve (mensaje, faltantes, estado EPP) de la alerta generada en este
+        frame, si la hubo.
+        """
+        epp_status = {item_label: None for item_label in REQUIRED_ITEMS.values()}
+        alert_message = None
+        missing_item = None
+        for track, cumplimiento in track_people(self.tracker, detections, list(REQUIRED_ITEMS), current_time):
+            missing_items = [label for label, ok in zip(REQUIRED_ITEMS.values(), cumplimiento) if not ok]
+            if missing_items and track.missing_since is None:
+                logger.info(f"🕒 Persona #{track.track_id} sin EPP. Esperando {self.alert_delay} segundos... "
+                            f"Faltan: {', '.join(missing_items)}")
+            track.observe(missing_items, current_time)
+            for item_label in REQUIRED_ITEMS.values():
+                epp_status[item_label] = (epp_status[item_label] is not False) and item_label not in missing_items
+
+            if track.alert_due(current_time, self.alert_delay, self.alert_cooldown):
+                # ✅ PASARON 3 SEGUNDOS: Generar alerta para esta persona
                 alert_message = f"Persona sin {', '.join(missing_items)}"
                 missing_item = ', '.join(missing_items)
-                
-                logger.info(f"⚠️ ALERTA GENERADA después de {self.alert_delay} segundos: {alert_message}")
-                
-                # Guardar captura y alerta
-                self.save_alert_capture(frame, alert_message, missing_item)
-                
-                # Resetear para la próxima detección
-                self.human_detection_time = None
-                self.alert_pending = False
-                self.pending_alert_data = None
-                
-                return alert_message, missing_item
-            else:
-                # ✅ TODAVÍA EN PERIODO DE ESPERA
-                elapsed = current_time - self.human_detection_time
-                remaining = max(0, self.alert_delay - elapsed)
-                logger.debug(f"⏳ Esperando: {remaining:.1f}s restantes...")
-                return None, None
-        else:
-            # ✅ HUMANO CON TODO EL EPP: Resetear detección
-            if self.human_detection_time is not None:
-                logger.info("✅ Humano detectado con todo el EPP. Resetear contador.")
-                self.human_detection_time = None
-                self.alert_pending = False
-                self.pending_alert_data = None
+                logger.info(f"⚠️ ALERTA GENERADA (persona #{track.track_id}) después de {self.alert_delay} segundos: {alert_message}")
+                self.save_alert_capture(frame, alert_message, missing_item, track_id=track.track_id)
+                track.mark_alerted(current_time)
 
-        return None, None
+        # Contador en pantalla: la persona que lleva más tiempo esperando
+        pendientes = [
+            t.missing_since for t in self.tracker.tracks
+            if t.missed == 0 and t.missing_since is not None and t.cooled_down(current_time, self.alert_cooldown)
+        ]
+        self.alert_pending = bool(pendientes)
+        self.human_detection_time = min(pendientes) if pendientes else None
 
-    def save_alert_capture(self, frame, alert_message, missing_item):
+        return alert_message, missing_item, epp_status
+
+    def save_alert_capture(self, frame, alert_message, missing_item, track_id=None):
         """Guarda captura localmente"""
         current_time = time.time()
 
-        # Verificar cooldown
-        if current_time - self.last_capture_time < self.capture_interval:
+        # Verificar cooldown (las alertas por persona ya lo aplican en su track)
+        if track_id is None and current_time - self.last_capture_time < self.capture_interval:
             return None
 
         try:
-            alertas_dir = 'media/alertas'
+            alertas_dir = os.path.join(settings.MEDIA_ROOT, SNAPSHOT_DIR)
             os.makedirs(alertas_dir, exist_ok=True)
 
             timestamp = time.strftime('%Y%m%d_%H%M%S')
+            if track_id is not None:
+                timestamp = f'{timestamp}_p{track_id}'
             filename = f'alerta_{timestamp}_{missing_item.replace(" ", "_").lower()}.jpg'
             local_path = os.path.join(alertas_dir, filename)
 
             logger.info(f"📸 Guardando imagen de alerta: {local_path}")
 
-            success = cv2.imwrite(local_path, frame)
+            with self.metrics.stage('alert_capture'):
+                # Se codifica en memoria para registrar tamaño y checksum sin releer el archivo
+                success, datos = cv2.imencode('.jpg', frame)
+                if success:
+                    datos = datos.tobytes()
+                    with open(local_path, 'wb') as archivo:
+                        archivo.write(datos)
             if not success:
                 logger.error(f"❌ Error: No se pudo guardar la imagen en {local_path}")
                 return None
@@ -168,15 +288,18 @@ class DroidCamera:
             logger.info(f"✅ Imagen guardada exitosamente: {local_path}")
 
             self.last_capture_time = current_time
-            db_path = f'alertas/{filename}'
+            db_path = f'{SNAPSHOT_DIR}/{filename}'
 
             # Guardar en base de datos
-            alert_obj = self.save_alert_to_db(alert_message, missing_item, db_path, current_time)
+            alert_obj = self.save_alert_to_db(alert_message, missing_item, db_path, current_time, track_id)
 
             if alert_obj:
                 logger.info(f"✅ Alerta guardada en BD con ID: {alert_obj.id}")
+                # Miniaturas para las listas, en otro hilo (ver thumbnails.py)
+                get_thumbnail_writer().submit(alert_obj.id, frame, db_path)
             else:
                 logger.info("⚠️ Alerta no guardada en BD (posible cooldown)")
+            self.save_snapshot_record(db_path, datos, frame, alert_obj)
 
             return db_path
 
@@ -184,21 +307,34 @@ class DroidCamera:
             logger.error(f"❌ Error crítico guardando captura: {e}")
             return None
 
-    def save_alert_to_db(self, alert_message, missing_item, filename, current_time):
+    def save_snapshot_record(self, db_path, datos, frame, alert_obj):
+        """Registra la captura en AlertSnapshot para ubicarla sin recorrer media/alertas"""
+        try:
+            alto, ancho = frame.shape[:2]
+            refresh_thread_connection()
+            record_snapshot(db_path, datos, ancho, alto, alert=alert_obj, camera=self.camera)
+        except Exception as e:
+            # `manage.py reconcile_snapshots` la registra después
+            logger.error(f"❌ Error registrando la captura {db_path}: {e}")
+
+    def save_alert_to_db(self, alert_message, missing_item, filename, current_time, track_id=None):
         """Guarda la alerta en la base de datos Django"""
         try:
             from django.utils import timezone
             from .models import Alert
 
-            # Evitar alertas duplicadas por cooldown
-            if not self.last_alert_time or (current_time - self.last_alert_time) > self.alert_cooldown:
-                alert = Alert.objects.create(
-                    message=alert_message,
-                    missing=missing_item,
-                    level='high',
-                    video=filename,
-                    timestamp=timezone.now()
-                )
+            # Evitar alertas duplicadas por cooldown (global sólo si no viene de un track)
+            if track_id is not None or not self.last_alert_time or (current_time - self.last_alert_time) > self.alert_cooldown:
+                # Conexión persistente del hilo de la cámara, verificada antes de usarla (ver dbconn.py)
+                refresh_thread_connection()
+                with self.metrics.stage('alert_db'):
+                    alert = Alert.objects.create(
+                        message=alert_message,
+                        missing=missing_item,
+                        level='high',
+                        video=filename,
+                        timestamp=timezone.now()
+                    )
 
                 logger.info(f"✅ Alerta guardada en BD: {alert_message} - Imagen: {filename}")
                 self.last_alert_time = current_time
@@ -227,17 +363,7 @@ class DroidCamera:
                 logger.info("🌐 Ejecutando en Render - usando video de prueba")
                 
                 # Buscar videos en la carpeta media/
-                possible_videos = [
-                    os.path.join(settings.BASE_DIR, 'media', 'test_video.mp4'),
-                    os.path.join(settings.BASE_DIR, 'media', 'videos', 'test_video.mp4'),
-                    os.path.join(settings.BASE_DIR, 'media', 'demo.mp4'),
-                ]
-                
-                video_path = None
-                for v_path in possible_videos:
-                    if os.path.exists(v_path):
-                        video_path = v_path
-                        break
+                video_path = find_demo_video()
                 
                 if video_path:
                     self.video = cv2.VideoCapture(video_path)
@@ -248,30 +374,38 @@ class DroidCamera:
                     logger.warning("⚠️ No se encontró video de prueba, usando video negro")
                 
             else:
-                # ✅ CÓDIGO ORIGINAL PARA DROIDCAM LOCAL
-                droidcam_url = f"http://{self.ip_address}:{self.port}/video"
-                logger.info(f"📱 Conectando a DroidCam: {droidcam_url}")
-
-                self.video = cv2.VideoCapture(droidcam_url)
+                # ✅ CÓDIGO ORIGINAL PARA DROIDCAM LOCAL (u otra fuente registrada en Camera)
+                source = self.source if self.source is not None else f"http://{self.ip_address}:{self.port}/video"
+                logger.info(f"📱 Conectando a cámara: {source}")
+
+                if isinstance(source, str):
+                    self.video = cv2.VideoCapture(source, cv2.CAP_ANY, [
+                        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+                        cv2.CAP_PROP_READ_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+                    ])
+                else:
+                    self.video = cv2.VideoCapture(source)
                 
                 # Configuraciones para mejorar la estabilidad
                 self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                self.video.set(cv2.CAP_PROP_FPS, 15)
+                self.video.set(cv2.CAP_PROP_FPS, self.camera.fps_target if self.camera else 15)
                 self.video.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-
-                # Esperar a que la cámara se inicialice
-                time.sleep(2)
+                if self.camera and self.camera.resolution:
+                    self.video.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera.width)
+                    self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera.height)
 
             # Verificar conexión
             if not self.video.isOpened():
                 logger.error("❌ No se pudo abrir el video")
+                self.last_error = "No se pudo abrir el video"
                 self._safe_release_camera()
                 return False
 
-            # Leer frame de prueba
+            # Leer frame de prueba (la lectura espera a que la cámara entregue imagen)
             ret, frame = self.video.read()
             if not ret or frame is None:
                 logger.error("❌ No se pudo leer el primer frame")
+                self.last_error = "No se pudo leer el primer frame"
                 self._safe_release_camera()
                 return False
 
@@ -282,16 +416,105 @@ class DroidCamera:
 
         except Exception as e:
             logger.error(f"❌ Error iniciando cámara: {str(e)}")
+            self.last_error = str(e)
             self.is_running = False
             self._safe_release_camera()
             return False
 
     def stop(self):
-        """Detiene la cámara de forma segura"""
+        """Detiene la cámara de forma segura (y cancela una reconexión en curso)"""
+        self._stop_event.set()
         self.is_running = False
         self._safe_release_camera()
         logger.info("🛑 Cámara detenida")
 
+    def _load_roi(self):
+        """Zona de interés registrada para esta cámara (modelo Camera), si existe"""
+        try:
+            from .models import Camera
+            camera = Camera.objects.filter(ip_address=self.ip_address, port=self.port).first()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer la zona de interés de la cámara: {e}")
+            return None
+        if camera and camera.roi:
+            logger.info(f"📐 Zona de interés de '{camera.name}': {len(camera.roi)} vértices")
+        return RegionOfInterest.for_camera(camera)
+
+    def _detect(self, image):
+        """
+        Devuelve las detecciones del frame, sin dibujar. En modo demo con
+        caché se leen las detecciones precalculadas del frame actual en lugar
+        de inferir. Con zona de interés se infiere sólo sobre su rectángulo y
+        se descartan las personas fuera del polígono.
+        """
+        frame_size = (image.shape[1], image.shape[0])
+        if self.demo_cache is not None:
+            detections = self.demo_cache.get(self.frame_index, frame_size)
+        else:
+            entrada, (ox, oy) = self.roi.crop(image) if self.roi else (image, (0, 0))
+            if self.two_stage:
+                detections = detect_two_stage(self.model, entrada, conf=0.25, person_imgsz=self.imgsz,
+                                              crop_imgsz=getattr(settings, 'TWO_STAGE_CROP_IMGSZ', 640),
+                                              device=self.device)
+            else:
+                results = self.model.predict(entrada, conf=0.25, verbose=False, imgsz=self.imgsz, device=self.device)
+                if not results:
+                    return None
+                detections = Detections.from_result(results[0])
+            detections = detections.translated(ox, oy)
+
+        if self.roi is not None:
+            detections = self.roi.filter(detections, frame_size)
+        return detections
+
+    def _draw_overlay(self, image, detections, current_time, alert_message, missing_item, epp_status):
+        """Dibuja cajas, IDs y el panel de EPP sobre el frame (en el mismo arreglo)"""
+        overlay = self.overlay
+        tracks = [track for track in self.tracker.tracks if track.missed == 0]
+        overlay.draw_detections(image, detections, tracks)
+        if self.roi is not None:
+            self.roi.draw(image)
+
+        y_offset = 40
+
+        # Mostrar estado EPP
+        for item_label in REQUIRED_ITEMS.values():
+            current_status = epp_status.get(item_label, None)
+
+            if current_status is True:
+                color = (0, 255, 0)
+                estado = "OK"
+            elif current_status is False:
+                color = (0, 0, 255)
+                estado = "FALTANTE"
+            else:
+                color = (255, 255, 0)
+                estado = "N/A"
+
+            overlay.text(image, f"{item_label}: {estado}", (10, y_offset), 0.8, color, 2)
+            y_offset += 35
+
+        # ✅ EN RENDER: Mostrar indicador de video de prueba
+        if self.is_render:
+            overlay.text(image, "🎥", (10, y_offset), 0.6, (255, 255, 0), 2)
+            y_offset += 30
+
+        overlay.text(image, f"Detecciones: {len(detections)}", (10, y_offset), 0.7, (255, 255, 255), 2)
+        y_offset += 30
+
+        # Mostrar contador si hay alerta pendiente
+        if self.alert_pending and self.human_detection_time is not None:
+            elapsed = current_time - self.human_detection_time
+            remaining = max(0, self.alert_delay - elapsed)
+            overlay.text(image, f"⏳ Alertando en: {remaining:.1f}s", (10, y_offset), 0.7, (0, 255, 255), 2)
+            y_offset += 30
+
+        if alert_message:
+            overlay.text(image, "⚠️ ALERTA: EPP FALTANTE", (10, y_offset), 0.7, (0, 0, 255), 2)
+            y_offset += 30
+            overlay.text(image, f"Falta: {missing_item}", (10, y_offset), 0.6, (0, 0, 255), 2)
+        return image
+
     def _validate_frame(self, frame):
         """Valida que el frame sea usable"""
         if frame is None:
@@ -302,160 +525,98 @@ class DroidCamera:
             return False
         return True
 
-    def get_frame(self):
-        """Obtiene un frame con manejo robusto de errores"""
+    def get_frame(self, tier=DEFAULT_TIER):
+        """Obtiene el siguiente frame como JPEG del nivel pedido (ver encoding.py)"""
+        frame = self.read_frame()
+        return None if frame is None else frame.jpeg(tier)
+
+    def read_frame(self):
+        """
+        Obtiene un frame procesado con manejo robusto de errores, como
+        EncodedFrame: cada nivel de calidad se codifica sólo si alguien lo pide.
+        """
         if not self.is_running or self.video is None or not self.video.isOpened():
-            logger.warning("Cámara no disponible, intentando reconectar...")
-            if not self.start():
-                return None
+            if not self.is_reconnecting:
+                logger.warning("Cámara no disponible, reconectando en segundo plano...")
+                self._reconnect_camera()
+            return EncodedFrame.from_jpeg(self._placeholder_frame())
 
         try:
             # Leer frame
-            success, image = self.video.read()
-            
-            # ✅ EN RENDER: Si llega al final del video, reiniciar
-            if self.is_render and not success:
-                logger.info("🔄 Fin del video, reiniciando...")
-                self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Volver al inicio
+            with self.metrics.stage('capture'):
                 success, image = self.video.read()
-            
+
+                # ✅ EN RENDER (o fuente de archivo): Si llega al final del video, reiniciar
+                if self.loop_video and not success:
+                    logger.info("🔄 Fin del video, reiniciando...")
+                    self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Volver al inicio
+                    success, image = self.video.read()
+
             if not success or not self._validate_frame(image):
+                self.metrics.frame_dropped()
                 self.consecutive_errors += 1
                 logger.warning(f"Frame inválido o error de lectura (error #{self.consecutive_errors})")
                 
                 if self.consecutive_errors >= self.max_consecutive_errors:
                     logger.error("Máximo de errores consecutivos alcanzado, reconectando...")
+                    self.last_error = "Máximo de errores consecutivos de lectura"
                     self._reconnect_camera()
+                    return EncodedFrame.from_jpeg(self._placeholder_frame())
                 return None
 
             # Resetear contador de errores
             self.consecutive_errors = 0
-            original_image = image.copy()
+            self.last_frame_at = time.time()
+            self.frame_size = (image.shape[1], image.shape[0])
+            if self.demo_cache is not None:
+                self.frame_index = int(self.video.get(cv2.CAP_PROP_POS_FRAMES)) - 1
             current_time = time.time()
+            self.metrics.frame_done()
 
             # YOLOv8 Prediction con manejo de errores
             try:
-                results = self.model.predict(image, conf=0.25, verbose=False, imgsz=320)
-
-                if results and len(results) > 0:
-                    result = results[0]
-                    num_detections = len(result.boxes)
-
-                    detected_classes = [self.model.names[int(cls)] for cls in result.boxes.cls]
-
-                    alert_message = None
-                    missing_item = None
-                    epp_status = {}
-
-                    has_person = "human" in detected_classes
-
-                    # ✅ NUEVA LÓGICA: Solo procesar si hay humano
-                    if has_person:
-                        alert_message, missing_item = self._process_human_detection(
-                            original_image, detected_classes, current_time
-                        )
-                        
-                        # Actualizar estado EPP para visualización
-                        required_items = {"helmet": "Casco", "vest": "Chaleco", "boots": "Botas"}
-                        for item_class, item_label in required_items.items():
-                            epp_status[item_label] = item_class in detected_classes
-                    else:
-                        # ✅ NO HAY HUMANO: Resetear detección
-                        if self.human_detection_time is not None:
-                            logger.info("👤 Humano ya no detectado. Resetear contador.")
-                            self.human_detection_time = None
-                            self.alert_pending = False
-                            self.pending_alert_data = None
-
-                        # Si no hay humano, todos los EPP son None
-                        required_items = {"helmet": "Casco", "vest": "Chaleco", "boots": "Botas"}
-                        for item_label in required_items.values():
-                            epp_status[item_label] = None
-
-                    annotated_frame = result.plot()
-                    y_offset = 40
-
-                    # Mostrar estado EPP
-                    for item_label in required_items.values():
-                        current_status = epp_status.get(item_label, None)
-
-                        if current_status is True:
-                            color = (0, 255, 0)
-                            estado = "OK"
-                        elif current_status is False:
-                            color = (0, 0, 255)
-                            estado = "FALTANTE"
-                        else:
-                            color = (255, 255, 0)
-                            estado = "N/A"
-
-                        cv2.putText(
-                            annotated_frame,
-                            f"{item_label}: {estado}",
-                            (10, y_offset),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.8,
-                            color,
-                            2
+                with self.metrics.stage('inference'):
+                    detections = self._detect(image)
+
+                if detections is not None:
+                    # ✅ Alertas por persona (la captura se guarda antes de dibujar, sin copiar el frame)
+                    with self.metrics.stage('alerts'):
+                        alert_message, missing_item, epp_status = self._process_people(
+                            image, detections, current_time
                         )
-                        y_offset += 35
-
-                    # ✅ EN RENDER: Mostrar indicador de video de prueba
-                    if self.is_render:
-                        cv2.putText(annotated_frame, "🎥", 
-                                   (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                        y_offset += 30
 
-                    cv2.putText(annotated_frame, f"Detecciones: {num_detections}", (10, y_offset),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    y_offset += 30
+                    # ✅ Sin espectadores no se dibuja ni se codifica (las alertas ya se procesaron)
+                    if self.viewers == 0:
+                        return EncodedFrame.from_jpeg(b'')
 
-                    # Mostrar contador si hay alerta pendiente
-                    if self.alert_pending and self.human_detection_time is not None:
-                        elapsed = current_time - self.human_detection_time
-                        remaining = max(0, self.alert_delay - elapsed)
-                        cv2.putText(annotated_frame, f"⏳ Alertando en: {remaining:.1f}s", 
-                                   (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                        y_offset += 30
-
-                    if alert_message:
-                        cv2.putText(annotated_frame, "⚠️ ALERTA: EPP FALTANTE", (10, y_offset),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                        y_offset += 30
-                        cv2.putText(annotated_frame, f"Falta: {missing_item}", (10, y_offset),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-                    ret, jpeg = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                    return jpeg.tobytes()
+                    with self.metrics.stage('overlay'):
+                        self._draw_overlay(image, detections, current_time, alert_message, missing_item, epp_status)
+                    return EncodedFrame(image, self.metrics)
 
                 else:
                     # Sin detecciones - resetear
+                    self.tracker.reset()
                     self.human_detection_time = None
                     self.alert_pending = False
-                    self.pending_alert_data = None
-                    
+
+                    if self.viewers == 0:
+                        return EncodedFrame.from_jpeg(b'')
+
                     # ✅ EN RENDER: Indicar que es video de prueba
+                    y_offset = 30
                     if self.is_render:
-                        cv2.putText(original_image, "🎥 ", (10, 30),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                        cv2.putText(original_image, "Detecciones: 0", (10, 60),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(original_image, "No se detectaron objetos relevantes", (10, 90),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-                    else:
-                        cv2.putText(original_image, "Detecciones: 0", (10, 30),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(original_image, "No se detectaron objetos relevantes", (10, 60),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+                        self.overlay.text(image, "🎥 ", (10, y_offset), 0.6, (255, 255, 0), 2)
+                        y_offset += 30
+                    self.overlay.text(image, "Detecciones: 0", (10, y_offset), 0.7, (255, 255, 255), 2)
+                    self.overlay.text(image, "No se detectaron objetos relevantes", (10, y_offset + 30),
+                                      0.7, (255, 255, 0), 2)
 
-                    ret, jpeg = cv2.imencode('.jpg', original_image, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                    return jpeg.tobytes()
+                    return EncodedFrame(image, self.metrics)
 
             except Exception as e:
                 logger.error(f"Error en procesamiento YOLO: {e}")
-                # Devolver frame original si falla el procesamiento
-                ret, jpeg = cv2.imencode('.jpg', original_image, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                return jpeg.tobytes()
+                # Devolver el frame tal como esté si falla el procesamiento
+                return EncodedFrame(image, self.metrics)
 
         except Exception as e:
             logger.error(f"Error crítico procesando frame: {e}")
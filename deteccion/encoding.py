@@ -0,0 +1,113 @@
+# deteccion/encoding.py
+"""
+Codificación JPEG de los frames procesados, una sola vez por nivel.
+
+Cada frame procesado se envuelve en un `EncodedFrame`. Cada cliente del
+stream pide un nivel de calidad (`?tier=thumb|480p|full`); la primera vez
+que alguien pide un nivel se redimensiona y codifica, y el resto de los
+clientes reciben los mismos bytes. Así un supervisor desde el celular no
+obliga a codificar la resolución completa, y diez clientes en el mismo
+nivel no codifican diez veces.
+
+Si está instalado PyTurboJPEG (libjpeg-turbo) se usa para codificar; si
+no, se usa cv2.imencode.
+"""
+import logging
+import threading
+from collections import namedtuple
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+    _turbo = TurboJPEG()
+except Exception:  # Paquete o biblioteca nativa no disponibles
+    _turbo = None
+
+# Alto máximo en píxeles (None = tamaño original) y calidad JPEG de cada nivel
+Rendition = namedtuple('Rendition', ['max_height', 'quality'])
+
+RENDITIONS = {
+    'thumb': Rendition(240, 60),
+    '480p': Rendition(480, 70),
+    'full': Rendition(None, 80),
+}
+DEFAULT_TIER = 'full'
+TIER_ORDER = list(RENDITIONS)  # De menor a mayor resolución
+
+# Nivel máximo que se sirve (None = sin límite); lo baja el watchdog de memoria (memory.py)
+_max_tier = None
+
+
+def set_max_tier(tier):
+    """Limita los niveles servidos a `tier` (None = sin límite)"""
+    global _max_tier
+    _max_tier = tier if tier in RENDITIONS else None
+
+
+def resolve_tier(tier, default=DEFAULT_TIER):
+    """Nivel válido a partir del parámetro del cliente (los desconocidos usan `default`)"""
+    tier = tier if tier in RENDITIONS else default
+    if _max_tier is not None and TIER_ORDER.index(tier) > TIER_ORDER.index(_max_tier):
+        return _max_tier
+    return tier
+
+
+def encode_jpeg(image, quality):
+    """Codifica un frame BGR a JPEG; devuelve bytes o None si falla"""
+    if _turbo is not None:
+        try:
+            return _turbo.encode(image, quality=quality, pixel_format=TJPF_BGR)
+        except Exception as e:
+            logger.warning(f"⚠️ libjpeg-turbo falló, se usa OpenCV: {e}")
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if ok else None
+
+
+def resize_for(image, rendition):
+    """Reduce el frame al alto del nivel (nunca lo agranda)"""
+    alto, ancho = image.shape[:2]
+    if rendition.max_height is None or alto <= rendition.max_height:
+        return image
+    escala = rendition.max_height / alto
+    return cv2.resize(image, (max(1, round(ancho * escala)), rendition.max_height), interpolation=cv2.INTER_AREA)
+
+
+class EncodedFrame:
+    """Frame procesado con sus JPEG por nivel, cada uno codificado a lo sumo una vez"""
+
+    def __init__(self, image=None, metrics=None):
+        self.image = image
+        self.metrics = metrics  # PipelineMetrics donde se mide la etapa 'encode' (ver metrics.py)
+        self._jpegs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_jpeg(cls, jpeg):
+        """Frame ya codificado (p. ej. el de "Reconectando..."): todos los niveles usan esos bytes"""
+        frame = cls()
+        frame._jpegs = {tier: jpeg for tier in RENDITIONS}
+        return frame
+
+    def __bool__(self):
+        """Falso para el frame vacío (procesado sin espectadores, nada que mostrar)"""
+        return self.image is not None or any(self._jpegs.values())
+
+    def jpeg(self, tier=DEFAULT_TIER):
+        """Bytes JPEG del nivel pedido, codificándolo sólo la primera vez"""
+        tier = resolve_tier(tier)
+        jpeg = self._jpegs.get(tier)
+        if jpeg is None and self.image is not None:
+            with self._lock:
+                jpeg = self._jpegs.get(tier)
+                if jpeg is None:
+                    rendition = RENDITIONS[tier]
+                    if self.metrics is None:
+                        jpeg = encode_jpeg(resize_for(self.image, rendition), rendition.quality)
+                    else:
+                        with self.metrics.stage('encode'):
+                            jpeg = encode_jpeg(resize_for(self.image, rendition), rendition.quality)
+                    self._jpegs[tier] = jpeg
+        return jpeg
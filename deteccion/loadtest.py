@@ -0,0 +1,278 @@
+# deteccion/loadtest.py
+"""
+Prueba de carga de los endpoints más consultados (comando bench_endpoints).
+
+`seed_load_data` carga volúmenes realistas (100k alertas en los últimos
+30 días, 5k trabajadores con su progreso, 200 capacitaciones) en la base
+configurada. Todo lo sembrado lleva el prefijo LOADTEST_PREFIX en el
+mensaje, el usuario o el título, para poder borrarlo con `clear_load_data`
+sin tocar los datos reales.
+
+`measure_endpoint` pide un endpoint con el cliente de pruebas de Django
+(sesión de un superusuario) y mide la cantidad de consultas SQL y la
+latencia de cada petición, con la caché desactivada (el costo real de
+la primera petición después de cada invalidación) y con la caché ya
+cargada; el resultado sin caché se compara con ENDPOINT_BUDGETS.
+"""
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (EPP_ITEMS, Alert, AlertDailySummary, Capacitacion, Certificado, Evaluacion,
+                     IntentoEvaluacion, ProgresoCapacitacion, User, missing_mask_from_text)
+from .caching import invalidate
+from .rollup import rebuild_daily_summary
+from .trends import bucket_floor, invalidate_alert_trends
+
+LOADTEST_PREFIX = 'loadtest'
+LOADTEST_ADMIN = f'{LOADTEST_PREFIX}_admin'
+
+# Cachés desactivadas para medir sin cached_view/cached_value (sin vaciar las reales)
+NO_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'reports': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+# Presupuesto por endpoint: consultas SQL por petición y p95 de latencia (ms).
+# Las consultas no deben crecer con el volumen de datos; la latencia se
+# fija con holgura para SQLite en una máquina de desarrollo.
+ENDPOINT_BUDGETS = {
+    'latest_alerts': {'queries': 4, 'p95_ms': 100},
+    'alert_data': {'queries': 4, 'p95_ms': 1000},
+    'alert_statistics': {'queries': 6, 'p95_ms': 250},
+    'alert_trends': {'queries': 6, 'p95_ms': 500},
+    'inicio': {'queries': 20, 'p95_ms': 250},
+    'dashboard_admin_capacitaciones': {'queries': 15, 'p95_ms': 500},
+    'reporte_progreso_general': {'queries': 15, 'p95_ms': 3000},
+    'reporte_capacitacion_detalle': {'queries': 10, 'p95_ms': 2000},
+}
+
+
+def _log(log, mensaje):
+    if log:
+        log(mensaje)
+
+
+def clear_load_data(log=None):
+    """Borra todo lo sembrado por seed_load_data y recalcula el resumen diario"""
+    with transaction.atomic():
+        alertas = Alert.objects.filter(message__startswith=f'[{LOADTEST_PREFIX}]')
+        fechas = alertas.dates('timestamp', 'day')
+        inicio, fin = (fechas.first(), fechas.last()) if fechas.exists() else (None, None)
+        borradas, _ = alertas.delete()
+        # Capacitaciones, evaluaciones, progresos, intentos y certificados caen en cascada
+        usuarios, _ = User.objects.filter(username__startswith=f'{LOADTEST_PREFIX}_').delete()
+    if inicio:
+        rebuild_daily_summary(Alert, AlertDailySummary, start=inicio, end=fin)
+    invalidate('alerts', 'capacitaciones')
+    _log(log, f"🧹 {borradas} alertas y {usuarios} filas de usuarios de prueba eliminadas")
+
+
+def _seed_alerts(total, days, rng, log=None, batch_size=1000):
+    """Alertas repartidas uniformemente en los últimos `days` días"""
+    ahora = timezone.now()
+    combinaciones = [
+        ', '.join(etiqueta for j, (_, etiqueta) in enumerate(EPP_ITEMS) if mascara & (1 << j))
+        for mascara in range(1, 1 << len(EPP_ITEMS))
+    ]
+    estados = ['resolved', 'false_positive', 'non_compliant', 'system_error']
+    horas = set()
+    for desde in range(0, total, batch_size):
+        lote, tiempos = [], []
+        for _ in range(min(batch_size, total - desde)):
+            missing = rng.choice(combinaciones)
+            resuelta = rng.random() < 0.6
+            lote.append(Alert(
+                message=f"[{LOADTEST_PREFIX}] Persona sin {missing}",
+                missing=missing,
+                missing_mask=missing_mask_from_text(missing),
+                level=rng.choice(('high', 'high', 'medium', 'low')),
+                resolved=resuelta,
+                resolution_status=rng.choice(estados) if resuelta else 'pending',
+            ))
+            tiempos.append(ahora - timedelta(seconds=rng.uniform(0, days * 86400)))
+        with transaction.atomic():
+            creadas = Alert.objects.bulk_create(lote)
+            # auto_now_add pisa la hora en bulk_create: se corrige con un UPDATE por lote
+            por_pk = {alerta.pk: hora for alerta, hora in zip(creadas, tiempos)}
+            Alert.objects.filter(pk__in=por_pk).update(timestamp=Case(
+                *[When(pk=pk, then=Value(hora)) for pk, hora in por_pk.items()],
+                output_field=DateTimeField(),
+            ))
+        horas.update(bucket_floor('hour', hora) for hora in tiempos)
+        _log(log, f"   alertas: {desde + len(lote)}/{total}")
+
+    # bulk_create no pasa por Alert.save(): resumen diario y caché de tendencias a mano
+    rebuild_daily_summary(Alert, AlertDailySummary, start=timezone.localdate(ahora - timedelta(days=days)))
+    for hora in horas:
+        invalidate_alert_trends(hora)
+    invalidate('alerts')
+
+
+def _seed_capacitaciones(workers, trainings, rng, log=None, progress_per_worker=20, batch_size=2000):
+    """Trabajadores del grupo 'trabajador', capacitaciones con evaluación y su progreso"""
+    grupo, _ = Group.objects.get_or_create(name='trabajador')
+    admin = User.objects.get(username=LOADTEST_ADMIN)
+    clave = make_password(None)  # Sin contraseña utilizable (y sin el costo del hash)
+
+    trabajadores = User.objects.bulk_create([
+        User(username=f'{LOADTEST_PREFIX}_trabajador_{i}', email=f'{LOADTEST_PREFIX}_trabajador_{i}@example.com',
+             first_name='Trabajador', last_name=str(i), password=clave)
+        for i in range(workers)
+    ], batch_size=batch_size)
+    User.groups.through.objects.bulk_create(
+        [User.groups.through(user_id=t.pk, group_id=grupo.pk) for t in trabajadores],
+        batch_size=batch_size,
+    )
+    _log(log, f"   trabajadores: {len(trabajadores)}")
+
+    capacitaciones = Capacitacion.objects.bulk_create([
+        Capacitacion(titulo=f'[{LOADTEST_PREFIX}] Capacitación {i}', descripcion='Capacitación de prueba de carga',
+                     tipo_contenido='texto', contenido_texto='...', creado_por=admin,
+                     estado='publicada' if i % 5 else rng.choice(('borrador', 'archivada')))
+        for i in range(trainings)
+    ])
+    publicadas = [c for c in capacitaciones if c.estado == 'publicada']
+    evaluaciones = Evaluacion.objects.bulk_create([
+        Evaluacion(capacitacion=c, titulo=f'Evaluación de {c.titulo}', creada_por=admin) for c in publicadas
+    ])
+    evaluacion_de = {e.capacitacion_id: e for e in evaluaciones}
+    _log(log, f"   capacitaciones: {len(capacitaciones)} ({len(publicadas)} publicadas)")
+
+    progresos, intentos, certificados = [], [], []
+    ahora = timezone.now()
+    for trabajador in trabajadores:
+        for capacitacion in rng.sample(publicadas, min(len(publicadas), rng.randint(0, progress_per_worker))):
+            completada = rng.random() < 0.6
+            progresos.append(ProgresoCapacitacion(
+                usuario=trabajador, capacitacion=capacitacion, completada=completada,
+                progreso_porcentaje=100 if completada else rng.randint(0, 90),
+                fecha_completacion=ahora if completada else None,
+            ))
+            if completada:
+                evaluacion = evaluacion_de[capacitacion.pk]
+                puntaje = rng.randint(50, 100)
+                intentos.append(IntentoEvaluacion(usuario=trabajador, evaluacion=evaluacion, puntaje_obtenido=puntaje,
+                                                  aprobado=puntaje >= capacitacion.puntaje_minimo))
+                if puntaje >= capacitacion.puntaje_minimo:
+                    certificados.append(Certificado(
+                        usuario=trabajador, capacitacion=capacitacion, evaluacion=evaluacion, puntaje_final=puntaje,
+                        codigo_certificado=f'{LOADTEST_PREFIX.upper()}-{trabajador.pk}-{capacitacion.pk}',
+                    ))
+    for modelo, filas in ((ProgresoCapacitacion, progresos), (IntentoEvaluacion, intentos),
+                          (Certificado, certificados)):
+        modelo.objects.bulk_create(filas, batch_size=batch_size)
+        _log(log, f"   {modelo._meta.verbose_name_plural.lower()}: {len(filas)}")
+    invalidate('capacitaciones')
+
+
+def seed_load_data(alerts=100_000, workers=5_000, trainings=200, days=30, seed=0, log=None):
+    """Reemplaza los datos de prueba anteriores por un set nuevo (determinista según `seed`)"""
+    clear_load_data(log)
+    rng = random.Random(seed)
+    User.objects.create_superuser(username=LOADTEST_ADMIN, email=f'{LOADTEST_ADMIN}@example.com',
+                                  password=None, first_name='Load', last_name='Test')
+    _log(log, f"🌱 Sembrando {alerts} alertas, {workers} trabajadores y {trainings} capacitaciones...")
+    _seed_alerts(alerts, days, rng, log)
+    _seed_capacitaciones(workers, trainings, rng, log)
+
+
+def loadtest_endpoints():
+    """[(nombre, url)] de los endpoints con presupuesto; la capacitación es una publicada sembrada"""
+    endpoints = [(nombre, reverse(f'deteccion:{nombre}')) for nombre in ENDPOINT_BUDGETS
+                 if nombre != 'reporte_capacitacion_detalle']
+    capacitacion = (Capacitacion.objects.filter(titulo__startswith=f'[{LOADTEST_PREFIX}]', estado='publicada')
+                    .order_by('pk').first())
+    if capacitacion:
+        endpoints.append(('reporte_capacitacion_detalle',
+                          reverse('deteccion:reporte_capacitacion_detalle', args=[capacitacion.pk])))
+    return endpoints
+
+
+def loadtest_client():
+    """Cliente de pruebas con la sesión del superusuario sembrado (None si no se sembró)"""
+    admin = User.objects.filter(username=LOADTEST_ADMIN).first()
+    if admin is None:
+        return None
+    client = Client()
+    client.force_login(admin)
+    return client
+
+
+class _QueryCounter:
+    """execute_wrapper que cuenta consultas (CaptureQueriesContext se corta en 9000)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _measure(client, url, repeat):
+    latencias, consultas, estado = [], [], None
+    for _ in range(repeat):
+        contador = _QueryCounter()
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            respuesta = client.get(url)
+            latencias.append(time.perf_counter() - inicio)
+        consultas.append(contador.count)
+        estado = respuesta.status_code
+    return estado, consultas, latencias
+
+
+def _summary(estado, consultas, latencias):
+    latencias_ms = np.asarray(latencias) * 1000
+    p50, p95 = np.quantile(latencias_ms, (0.5, 0.95))
+    return {
+        'status': estado,
+        'queries': max(consultas),
+        'p50_ms': round(float(p50), 1),
+        'p95_ms': round(float(p95), 1),
+        'max_ms': round(float(latencias_ms.max()), 1),
+    }
+
+
+def measure_endpoint(client, url, repeat=10, warmup=1):
+    """
+    Pide `url` `warmup` veces sin medir y luego `repeat` veces sin caché;
+    devuelve el estado HTTP, las consultas SQL (máximo por petición) y las
+    latencias, y en 'warm' lo mismo con la caché cargada.
+    """
+    # El cliente de pruebas usa el host 'testserver'
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        with override_settings(CACHES=NO_CACHES):
+            for _ in range(warmup):
+                client.get(url)
+            estado, consultas, latencias = _measure(client, url, repeat)
+        client.get(url)  # Carga la caché
+        _, consultas_warm, latencias_warm = _measure(client, url, repeat)
+
+    resultado = _summary(estado, consultas, latencias)
+    resultado['warm'] = _summary(estado, consultas_warm, latencias_warm)
+    return resultado
+
+
+def check_budget(nombre, resultado, budgets=ENDPOINT_BUDGETS):
+    """Lista de incumplimientos del presupuesto del endpoint (vacía si cumple)"""
+    presupuesto = budgets.get(nombre, {})
+    fallas = []
+    if resultado['status'] != 200:
+        fallas.append(f"HTTP {resultado['status']}")
+    if 'queries' in presupuesto and resultado['queries'] > presupuesto['queries']:
+        fallas.append(f"{resultado['queries']} consultas > {presupuesto['queries']}")
+    if 'p95_ms' in presupuesto and resultado['p95_ms'] > presupuesto['p95_ms']:
+        fallas.append(f"p95 {resultado['p95_ms']} ms > {presupuesto['p95_ms']} ms")
+    return fallas
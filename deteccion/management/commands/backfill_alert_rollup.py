@@ -0,0 +1,32 @@
+# deteccion/management/commands/backfill_alert_rollup.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.models import Alert, AlertDailySummary
+from deteccion.rollup import rebuild_daily_summary
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen diario de alertas (AlertDailySummary) desde la tabla Alert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Fecha inicial YYYY-MM-DD (por defecto, la primera alerta)')
+        parser.add_argument('--end', help='Fecha final YYYY-MM-DD (por defecto, la última alerta)')
+
+    def _parse_date(self, valor, nombre):
+        if not valor:
+            return None
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise CommandError(f'--{nombre} debe tener el formato YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        start = self._parse_date(options['start'], 'start')
+        end = self._parse_date(options['end'], 'end')
+        if start and end and start > end:
+            raise CommandError('--start no puede ser posterior a --end')
+
+        dias = rebuild_daily_summary(Alert, AlertDailySummary, start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f'✅ Resumen diario recalculado: {dias} días'))
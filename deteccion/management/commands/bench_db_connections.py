@@ -0,0 +1,112 @@
+# deteccion/management/commands/bench_db_connections.py
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from deteccion.dbconn import close_thread_connections, refresh_thread_connection
+from deteccion.models import Alert
+
+
+class Command(BaseCommand):
+    help = ('Compara una conexión por petición (CONN_MAX_AGE=0) con conexiones persistentes y verificadas, '
+            'en peticiones web simuladas y en inserciones de alertas desde un hilo de cámara')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones simuladas por modo')
+        parser.add_argument('--alerts', type=int, default=100, help='Alertas insertadas por modo (con rollback)')
+        parser.add_argument('--max-age', type=int, default=600, help='CONN_MAX_AGE del modo persistente')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['alerts'] < 1:
+            raise CommandError('--requests y --alerts deben ser mayores que 0')
+        alias = options['database']
+        original = dict(connections[alias].settings_dict)
+        modos = (('por petición', 0, False), ('persistente', options['max_age'], True))
+        self.stdout.write(f"Base: {original['ENGINE'].rsplit('.', 1)[-1]} {original.get('HOST') or original['NAME']}")
+        self.stdout.write(f"{'escenario':<22} {'modo':<14} {'conexiones':>10} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+        try:
+            for nombre, max_age, health in modos:
+                self._configure(alias, max_age, health)
+                self._report('peticiones web', nombre, *self._web_requests(alias, options['requests']))
+            for nombre, max_age, health in modos:
+                self._configure(alias, max_age, health)
+                self._report('alertas (hilo)', nombre,
+                             *self._writer_thread(alias, options['alerts'], persistente=max_age != 0))
+        finally:
+            connections[alias].close()
+            connections[alias].settings_dict.update(original)
+
+    def _configure(self, alias, max_age, health):
+        connections[alias].close()
+        connections[alias].settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health)
+
+    def _counting_connections(self):
+        conteo = [0]
+
+        def contar(sender, connection, **kwargs):
+            conteo[0] += 1
+        connection_created.connect(contar, weak=False, dispatch_uid='bench_db_connections')
+        return conteo
+
+    def _web_requests(self, alias, cantidad):
+        """Ciclo de petición de Django (señales incluidas) con las consultas de latest_alerts"""
+        conteo = self._counting_connections()
+        latencias = []
+        inicio_total = time.perf_counter()
+        try:
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                list(Alert.objects.using(alias).order_by('-timestamp')[:10])
+                Alert.objects.using(alias).filter(resolved=False).count()
+                request_finished.send(sender=self.__class__)
+                latencias.append(time.perf_counter() - inicio)
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_db_connections')
+        return conteo[0], latencias, time.perf_counter() - inicio_total
+
+    def _writer_thread(self, alias, cantidad, persistente):
+        """
+        Inserciones desde otro hilo, como DroidCamera.save_alert_to_db. Antes, cada
+        alerta en un hilo nuevo o tras cerrar la conexión; ahora, la conexión del hilo
+        se verifica y se reutiliza. Cada inserción se revierte (no quedan datos).
+        """
+        conteo = self._counting_connections()
+        latencias = []
+
+        def escribir():
+            try:
+                for _ in range(cantidad):
+                    inicio = time.perf_counter()
+                    if persistente:
+                        refresh_thread_connection()
+                    with transaction.atomic(using=alias):
+                        Alert.objects.using(alias).create(message='bench_db_connections', missing='Casco',
+                                                          timestamp=timezone.now())
+                        transaction.set_rollback(True, using=alias)
+                    if not persistente:
+                        close_thread_connections()
+                    latencias.append(time.perf_counter() - inicio)
+            finally:
+                close_thread_connections()
+
+        inicio_total = time.perf_counter()
+        hilo = threading.Thread(target=escribir, name='bench-alert-writer')
+        hilo.start()
+        hilo.join()
+        total = time.perf_counter() - inicio_total
+        connection_created.disconnect(dispatch_uid='bench_db_connections')
+        return conteo[0], latencias, total
+
+    def _report(self, escenario, modo, conexiones, latencias, total):
+        if not latencias:
+            raise CommandError(f'{escenario} ({modo}): no se completó ninguna operación')
+        p50, p95 = np.quantile(np.asarray(latencias) * 1000, (0.5, 0.95))
+        self.stdout.write(f"{escenario:<22} {modo:<14} {conexiones:>10} {p50:>8.2f} {p95:>8.2f} {total:>8.2f}")
@@ -0,0 +1,81 @@
+# deteccion/management/commands/bench_endpoints.py
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.loadtest import (ENDPOINT_BUDGETS, check_budget, clear_load_data, loadtest_client,
+                                loadtest_endpoints, measure_endpoint, seed_load_data)
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga de los endpoints más consultados con el cliente de pruebas de Django: '
+            'mide consultas SQL y p95 por endpoint y falla si se excede el presupuesto (ENDPOINT_BUDGETS)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='Siembra (o re-siembra) los datos de prueba antes de medir')
+        parser.add_argument('--clear', action='store_true', help='Borra los datos de prueba y termina')
+        parser.add_argument('--alerts', type=int, default=100_000)
+        parser.add_argument('--workers', type=int, default=5_000)
+        parser.add_argument('--trainings', type=int, default=200)
+        parser.add_argument('--days', type=int, default=30, help='Días en los que se reparten las alertas')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINT_BUDGETS),
+                            help='Endpoints a medir (por defecto, todos)')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Peticiones medidas por endpoint (sin caché y con caché)')
+        parser.add_argument('--warmup', type=int, default=1, help='Peticiones de calentamiento (no se miden)')
+        parser.add_argument('--latency-factor', type=float, default=1.0,
+                            help='Multiplica los presupuestos de p95 (máquinas más lentas o CI)')
+        parser.add_argument('--output', help='Archivo JSON donde guardar el resultado')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_load_data(log=self.stdout.write)
+            return
+        if options['repeat'] < 1:
+            raise CommandError('--repeat debe ser mayor que 0')
+        if options['seed']:
+            seed_load_data(alerts=options['alerts'], workers=options['workers'], trainings=options['trainings'],
+                           days=options['days'], seed=options['random_seed'], log=self.stdout.write)
+
+        client = loadtest_client()
+        if client is None:
+            raise CommandError('No hay datos de prueba: ejecute primero con --seed')
+
+        budgets = {
+            nombre: {**presupuesto, 'p95_ms': presupuesto['p95_ms'] * options['latency_factor']}
+            for nombre, presupuesto in ENDPOINT_BUDGETS.items()
+        }
+        seleccion = set(options['endpoints'] or ENDPOINT_BUDGETS)
+
+        # Sin caché (lo que se compara con el presupuesto) y, entre paréntesis, con la caché cargada
+        self.stdout.write(f"{'endpoint':<32} {'HTTP':>4} {'consultas':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'(caché)':>14}  presupuesto")
+        resultados, fallidos = {}, []
+        for nombre, url in loadtest_endpoints():
+            if nombre not in seleccion:
+                continue
+            resultado = measure_endpoint(client, url, repeat=options['repeat'], warmup=options['warmup'])
+            fallas = check_budget(nombre, resultado, budgets)
+            resultados[nombre] = {'url': url, **resultado, 'budget': budgets[nombre], 'failures': fallas}
+            caliente = f"({resultado['warm']['queries']} / {resultado['warm']['p95_ms']:g} ms)"
+            linea = (f"{nombre:<32} {resultado['status']:>4} {resultado['queries']:>9} {resultado['p50_ms']:>8} "
+                     f"{resultado['p95_ms']:>8} {caliente:>14}  "
+                     f"{budgets[nombre]['queries']} / {budgets[nombre]['p95_ms']:g} ms")
+            if fallas:
+                fallidos.append(nombre)
+                self.stdout.write(self.style.ERROR(f"{linea}  ❌ {'; '.join(fallas)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{linea}  ✅"))
+
+        if options['output']:
+            directorio = os.path.dirname(options['output'])
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(options['output'], 'w', encoding='utf-8') as archivo:
+                archivo.write(json.dumps(resultados, indent=2, ensure_ascii=False) + '\n')
+
+        if fallidos:
+            raise CommandError(f"Presupuesto excedido en: {', '.join(fallidos)}")
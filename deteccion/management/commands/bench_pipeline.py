@@ -0,0 +1,91 @@
+# deteccion/management/commands/bench_pipeline.py
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.benchmark import load_video_frames, run_pipeline_benchmark, synthetic_frames
+from deteccion.detections import find_demo_video
+from deteccion.encoding import RENDITIONS
+
+
+class Command(BaseCommand):
+    help = ('Benchmark del pipeline de detección (DroidCamera sin base de datos) sobre un video fijo o '
+            'frames sintéticos; imprime o guarda un JSON para comparar entre commits, imgsz y backends')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', help='Video a reproducir (por defecto, el video demo de media/)')
+        parser.add_argument('--synthetic', type=int, metavar='N',
+                            help='Usa N frames sintéticos deterministas en lugar de un video')
+        parser.add_argument('--size', default='640x480', help='Tamaño de los frames, ANCHOxALTO')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los frames sintéticos')
+        parser.add_argument('--frames', type=int, default=200, help='Frames medidos')
+        parser.add_argument('--warmup', type=int, default=10, help='Frames de calentamiento (no se miden)')
+        parser.add_argument('--model', help='Modelo (.pt, .onnx, .engine...; por defecto, settings.MODEL_PATH)')
+        parser.add_argument('--imgsz', type=int, default=320)
+        parser.add_argument('--device', help="Dispositivo de ultralytics ('cpu', 'cuda:0', 'mps')")
+        parser.add_argument('--two-stage', action='store_true', help='Detección en dos etapas (personas + recortes)')
+        parser.add_argument('--tier', choices=sorted(RENDITIONS), default='full', help='Nivel JPEG a codificar')
+        parser.add_argument('--viewers', type=int, default=1,
+                            help='0 = sin espectadores (no se dibuja ni se codifica)')
+        parser.add_argument('--alloc-frames', type=int, default=20,
+                            help='Frames extra medidos con tracemalloc (0 = no medir asignaciones)')
+        parser.add_argument('--output', help='Archivo JSON donde guardar el resultado')
+
+    def handle(self, *args, **options):
+        try:
+            ancho, alto = (int(v) for v in options['size'].lower().split('x'))
+        except ValueError:
+            raise CommandError('--size debe tener el formato ANCHOxALTO, p. ej. 640x480')
+        if options['frames'] < 1:
+            raise CommandError('--frames debe ser mayor que 0')
+        model_path = options['model'] or settings.MODEL_PATH
+        if not os.path.exists(model_path):
+            raise CommandError(f'Modelo no encontrado: {model_path}')
+
+        if options['synthetic']:
+            frames = synthetic_frames(options['synthetic'], (ancho, alto), options['seed'])
+            source = f"synthetic:{options['synthetic']}:seed={options['seed']}"
+        else:
+            video = options['video'] or find_demo_video()
+            if not video or not os.path.exists(video):
+                raise CommandError('No se encontró el video (use --video o --synthetic N)')
+            # Se decodifica de antemano (a lo sumo los frames que se van a usar)
+            limite = options['warmup'] + options['frames'] + options['alloc_frames']
+            frames = load_video_frames(video, limit=limite, size=(ancho, alto))
+            if not frames:
+                raise CommandError(f'No se pudo leer el video: {video}')
+            base = os.path.abspath(settings.BASE_DIR)
+            source = os.path.relpath(video, base) if os.path.abspath(video).startswith(base + os.sep) else video
+
+        self.stderr.write(f"⏱️ {options['frames']} frames de {source} "
+                          f"(imgsz={options['imgsz']}, device={options['device'] or 'auto'})...")
+        reporte = run_pipeline_benchmark(
+            frames,
+            model_path=model_path,
+            frame_count=options['frames'],
+            warmup=options['warmup'],
+            imgsz=options['imgsz'],
+            device=options['device'],
+            two_stage=options['two_stage'],
+            tier=options['tier'],
+            viewers=options['viewers'],
+            alloc_frames=options['alloc_frames'],
+            source=source,
+        )
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['output']:
+            directorio = os.path.dirname(options['output'])
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(options['output'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            latencia = reporte['latency']
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {reporte['throughput_fps']} FPS, p50 {latencia['p50_ms']} ms, p95 {latencia['p95_ms']} ms, "
+                f"RSS pico {reporte['memory']['rss_peak_mb']} MB → {options['output']}"
+            ))
+        else:
+            self.stdout.write(texto)
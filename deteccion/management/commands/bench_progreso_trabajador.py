@@ -0,0 +1,55 @@
+# deteccion/management/commands/bench_progreso_trabajador.py
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from deteccion.views import combinar_capacitaciones_con_progreso
+
+
+def _union_anterior(capacitaciones, progresos):
+    """Implementación previa: recorre todos los progresos por cada capacitación"""
+    return [
+        {
+            'capacitacion': capacitacion,
+            'progreso': next((p for p in progresos if p.capacitacion.id == capacitacion.id), None),
+        }
+        for capacitacion in capacitaciones
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark de la unión capacitación → progreso del panel del trabajador'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[100, 1000, 5000, 10000],
+                            help='Cantidades de capacitaciones a medir')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--incluir-anterior', action='store_true',
+                            help='Mide también la implementación O(N×M) anterior')
+
+    def _medir(self, funcion, capacitaciones, progresos, repeticiones):
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(capacitaciones, progresos)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'N':>8} {'nuevo (ms)':>12} {'µs/item':>9} {'anterior (ms)':>14}")
+        for n in options['tamanos']:
+            capacitaciones = [SimpleNamespace(id=i) for i in range(n)]
+            # El trabajador tiene progreso en la mitad de las capacitaciones
+            progresos = [
+                SimpleNamespace(capacitacion_id=c.id, capacitacion=c, completada=bool(c.id % 3))
+                for c in capacitaciones[::2]
+            ]
+
+            nuevo = self._medir(combinar_capacitaciones_con_progreso, capacitaciones, progresos,
+                                options['repeticiones'])
+            anterior = ''
+            if options['incluir_anterior']:
+                anterior = f"{self._medir(_union_anterior, capacitaciones, progresos, 1) * 1000:14.1f}"
+
+            self.stdout.write(f"{n:>8} {nuevo * 1000:12.3f} {nuevo / n * 1e6:9.3f} {anterior}")
@@ -0,0 +1,41 @@
+# deteccion/management/commands/generate_thumbnails.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from deteccion.models import Alert
+from deteccion.thumbnails import ThumbnailWriter
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class Command(BaseCommand):
+    help = ('Genera las miniaturas (JPEG y WebP) de las capturas de alertas que no las tienen: '
+            'alertas anteriores o descartadas por la cola del generador')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenera también las que ya existen')
+        parser.add_argument('--limit', type=int, help='Máximo de alertas a procesar')
+
+    def handle(self, *args, **options):
+        alertas = Alert.objects.exclude(video='').exclude(video__isnull=True)
+        if not options['force']:
+            alertas = alertas.filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+        # Sólo capturas: las alertas del re-análisis apuntan a la grabación
+        filtro = Q()
+        for extension in IMAGE_EXTENSIONS:
+            filtro |= Q(video__iendswith=extension)
+        alertas = alertas.filter(filtro).order_by('-timestamp').values_list('pk', 'video')
+        if options['limit']:
+            alertas = alertas[:options['limit']]
+
+        generador = ThumbnailWriter.from_settings()
+        fallidas = 0
+        for pk, video in alertas.iterator():
+            try:
+                generador.generate(pk, video)
+            except Exception as e:
+                fallidas += 1
+                self.stderr.write(f'⚠️ Alerta {pk}: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {generador.generated} miniaturas generadas' + (f', {fallidas} capturas no disponibles' if fallidas else '')
+        ))
@@ -0,0 +1,112 @@
+# deteccion/management/commands/measure_worker_memory.py
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import psutil
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from deteccion.preload import freeze_heap, load_model, memory_breakdown, preload_models
+
+
+def _simulated_worker(model_path, frames, imgsz, ready, stop):
+    """Worker simulado: obtiene el modelo como lo haría una cámara e infiere `frames` veces"""
+    modelo = load_model(model_path)
+    imagen = np.random.default_rng(os.getpid()).integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+    for _ in range(frames):
+        modelo.predict(imagen, imgsz=imgsz, conf=0.25, verbose=False)
+    ready.set()
+    stop.wait(600)
+
+
+class Command(BaseCommand):
+    help = ('Memoria compartida vs privada de cada worker: de un master de gunicorn en ejecución (--pid) '
+            'o de N workers simulados con fork (--simulate N), con o sin precarga y gc.freeze()')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, help='PID del master de gunicorn (por defecto, se busca)')
+        parser.add_argument('--simulate', type=int, metavar='N', help='Hace fork de N workers en este proceso')
+        parser.add_argument('--no-preload', action='store_true',
+                            help='Con --simulate: cada worker carga su propio modelo después del fork')
+        parser.add_argument('--no-freeze', action='store_true', help='Con --simulate: sin gc.freeze() antes del fork')
+        parser.add_argument('--model', help='Modelo (por defecto, settings.MODEL_PATH)')
+        parser.add_argument('--frames', type=int, default=5, help='Inferencias de cada worker simulado')
+        parser.add_argument('--imgsz', type=int, default=320)
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado en JSON')
+
+    def handle(self, *args, **options):
+        if options['simulate']:
+            master, workers = self._simulate(options)
+        else:
+            master, workers = self._gunicorn(options['pid'])
+
+        resumen = {
+            'master': master,
+            'workers': workers,
+            'workers_private_mb': round(sum(w['private_mb'] for w in workers), 1),
+            'workers_pss_mb': round(sum(w['pss_mb'] for w in workers), 1),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(resumen, indent=2))
+            return
+
+        self.stdout.write(f"{'proceso':<10} {'pid':>8} {'rss MB':>8} {'pss MB':>8} {'privada MB':>11} {'compartida MB':>14}")
+        for nombre, datos in [('master', master)] + [(f'worker {i}', w) for i, w in enumerate(workers, 1)]:
+            self.stdout.write(f"{nombre:<10} {datos['pid']:>8} {datos['rss_mb']:>8} {datos['pss_mb']:>8} "
+                              f"{datos['private_mb']:>11} {datos['shared_mb']:>14}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(workers)} workers: {resumen['workers_private_mb']} MB privados en total, "
+            f"PSS {resumen['workers_pss_mb']} MB (más {master['pss_mb']} MB del master)"
+        ))
+
+    def _gunicorn(self, pid):
+        if pid is None:
+            candidatos = [
+                p for p in psutil.process_iter(['pid', 'cmdline'])
+                if any('gunicorn' in parte for parte in (p.info['cmdline'] or []))
+                and not any('gunicorn' in ' '.join(padre.cmdline()) for padre in p.parents())
+            ]
+            if not candidatos:
+                raise CommandError('No se encontró un master de gunicorn (use --pid o --simulate N)')
+            pid = candidatos[0].info['pid']
+        try:
+            master = psutil.Process(pid)
+            return memory_breakdown(pid), [memory_breakdown(hijo.pid) for hijo in master.children()]
+        except psutil.Error as e:
+            raise CommandError(f'No se pudo leer la memoria del proceso {pid}: {e}')
+
+    def _simulate(self, options):
+        model_path = options['model'] or settings.MODEL_PATH
+        if not os.path.exists(model_path):
+            raise CommandError(f'Modelo no encontrado: {model_path}')
+        if not options['no_preload']:
+            preload_models([model_path], imgsz=options['imgsz'])
+        connections.close_all()  # Los hijos no deben heredar conexiones abiertas
+        if not options['no_freeze']:
+            freeze_heap()
+
+        contexto = multiprocessing.get_context('fork')
+        detener = contexto.Event()
+        procesos = []
+        try:
+            for _ in range(options['simulate']):
+                listo = contexto.Event()
+                proceso = contexto.Process(target=_simulated_worker, daemon=True, args=(
+                    model_path, options['frames'], options['imgsz'], listo, detener))
+                proceso.start()
+                procesos.append((proceso, listo))
+            for proceso, listo in procesos:
+                if not listo.wait(300):
+                    raise CommandError(f'El worker {proceso.pid} no terminó de inferir')
+            time.sleep(0.5)  # Que se asiente el RSS antes de medir
+            return memory_breakdown(os.getpid()), [memory_breakdown(p.pid) for p, _ in procesos]
+        finally:
+            detener.set()
+            for proceso, _ in procesos:
+                proceso.join(5)
+                if proceso.is_alive():
+                    proceso.terminate()
@@ -0,0 +1,88 @@
+# deteccion/management/commands/precompute_demo_detections.py
+import os
+import time
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.detections import Detections, demo_cache_path, detect_two_stage, find_demo_video
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta YOLO una sola vez sobre el video de demostración y guarda las '
+            'detecciones por frame en <video>.detections.npz para el modo demo')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', help='Video a procesar (por defecto, el video demo de media/)')
+        parser.add_argument('--model', help='Modelo YOLO (por defecto, settings.MODEL_PATH)')
+        parser.add_argument('--conf', type=float, default=0.25)
+        parser.add_argument('--imgsz', type=int, default=320)
+        parser.add_argument('--two-stage', action='store_true',
+                            help='Detecta EPP sobre recortes de cada persona (ver TWO_STAGE_DETECTION)')
+
+    def handle(self, *args, **options):
+        video_path = options['video'] or find_demo_video()
+        if not video_path or not os.path.exists(video_path):
+            raise CommandError('No se encontró el video de demostración (use --video)')
+        model_path = options['model'] or settings.MODEL_PATH
+        if not os.path.exists(model_path):
+            raise CommandError(f'Modelo no encontrado: {model_path}')
+
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise CommandError(f'No se puede abrir el video: {video_path}')
+
+        boxes, classes, confidences = [], [], []
+        offsets = [0]
+        source_size = None
+        inicio = time.perf_counter()
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if source_size is None:
+                    source_size = (frame.shape[1], frame.shape[0])
+
+                if options['two_stage']:
+                    detections = detect_two_stage(model, frame, conf=options['conf'], person_imgsz=options['imgsz'],
+                                                  crop_imgsz=settings.TWO_STAGE_CROP_IMGSZ)
+                else:
+                    result = model.predict(frame, conf=options['conf'], verbose=False, imgsz=options['imgsz'])[0]
+                    detections = Detections.from_result(result)
+                boxes.append(detections.boxes)
+                classes.append(detections.classes)
+                confidences.append(detections.confidences)
+                offsets.append(offsets[-1] + len(detections))
+
+                if len(offsets) % 100 == 1:
+                    self.stdout.write(f'  {len(offsets) - 1} frames procesados...')
+        finally:
+            cap.release()
+
+        if source_size is None:
+            raise CommandError(f'El video no tiene frames legibles: {video_path}')
+
+        names = [model.names[i] for i in range(len(model.names))]
+        destino = demo_cache_path(video_path)
+        np.savez_compressed(
+            destino,
+            boxes=np.concatenate(boxes).astype(np.float32),
+            classes=np.concatenate(classes).astype(np.int16),
+            confidences=np.concatenate(confidences).astype(np.float32),
+            offsets=np.asarray(offsets, dtype=np.int32),
+            names=np.asarray(names, dtype=str),
+            source_size=np.asarray(source_size, dtype=np.int32),
+            video_size=np.int64(os.path.getsize(video_path)),
+        )
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(offsets) - 1} frames, {offsets[-1]} detecciones en {duracion:.1f}s → {destino} '
+            f'({os.path.getsize(destino) / 1024:.1f} KB)'
+        ))
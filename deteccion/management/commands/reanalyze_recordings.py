@@ -0,0 +1,60 @@
+# deteccion/management/commands/reanalyze_recordings.py
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.reanalysis import RecordingReanalyzer
+
+
+class Command(BaseCommand):
+    help = ('Re-analiza las grabaciones (grabaciones/*.avi) con el modelo actual usando varios procesos, '
+            'y guarda detecciones y alertas. Se puede interrumpir y retomar: sólo procesa los tramos pendientes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Grabaciones a procesar (por defecto, grabaciones/*.avi)')
+        parser.add_argument('--model', help='Modelo YOLO (por defecto, settings.MODEL_PATH)')
+        parser.add_argument('--workers', type=int, help='Procesos en paralelo (por defecto, la mitad de los núcleos)')
+        parser.add_argument('--chunk-seconds', type=int, default=60, help='Duración de cada tramo en segundos')
+        parser.add_argument('--stride', type=int, default=1, help='Analizar uno de cada N frames')
+        parser.add_argument('--batch', type=int, default=8, help='Frames por llamada al modelo')
+        parser.add_argument('--conf', type=float, default=0.25)
+        parser.add_argument('--imgsz', type=int, default=640)
+        parser.add_argument('--force', action='store_true',
+                            help='Descarta los resultados previos de este modelo y procesa todo de nuevo')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or sorted(glob.glob(os.path.join(settings.RECORDINGS_ROOT, '*.avi')))
+        if not paths:
+            raise CommandError('No hay grabaciones para procesar')
+        faltantes = [path for path in paths if not os.path.exists(path)]
+        if faltantes:
+            raise CommandError(f"No existe: {', '.join(faltantes)}")
+        model_path = options['model'] or settings.MODEL_PATH
+        if not os.path.exists(model_path):
+            raise CommandError(f'Modelo no encontrado: {model_path}')
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers debe ser mayor que 0')
+        if options['stride'] < 1 or options['batch'] < 1 or options['chunk_seconds'] < 1:
+            raise CommandError('--stride, --batch y --chunk-seconds deben ser mayores que 0')
+
+        reanalyzer = RecordingReanalyzer(
+            model_path,
+            workers=options['workers'],
+            chunk_seconds=options['chunk_seconds'],
+            conf=options['conf'],
+            imgsz=options['imgsz'],
+            stride=options['stride'],
+            batch=options['batch'],
+            log=self.stdout.write,
+        )
+        analyses = reanalyzer.run([os.path.abspath(path) for path in paths], force=options['force'])
+
+        for analysis in analyses:
+            estilo = self.style.SUCCESS if analysis.status == 'done' else self.style.WARNING
+            self.stdout.write(estilo(
+                f"{'✅' if analysis.status == 'done' else '⚠️'} {os.path.basename(analysis.path)}: "
+                f"{analysis.get_status_display()} ({analysis.progress}%), "
+                f"{analysis.detections_count} detecciones, {analysis.alerts_count} alertas"
+            ))
@@ -0,0 +1,60 @@
+# deteccion/management/commands/reconcile_snapshots.py
+from django.core.management.base import BaseCommand
+
+from deteccion.models import Alert, AlertSnapshot
+from deteccion.snapshots import SNAPSHOT_DIR, scan_snapshot_files, snapshot_from_file
+
+
+class Command(BaseCommand):
+    help = ('Sincroniza AlertSnapshot con las capturas de media/alertas: registra las que faltan, '
+            'actualiza las modificadas, las asocia a su alerta e informa (o borra) las que ya no existen')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Borra los registros cuyo archivo ya no existe')
+        parser.add_argument('--no-checksum', action='store_true',
+                            help='No calcula el SHA-256 de las capturas nuevas (no lee cada archivo)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        archivos = scan_snapshot_files()
+        registradas = {path: (pk, size, alert_id) for pk, path, size, alert_id in
+                       AlertSnapshot.objects.values_list('pk', 'path', 'size', 'alert_id').iterator()}
+        # Alert.video guarda la misma ruta relativa que la captura
+        alerta_de = dict(Alert.objects.filter(video__startswith=f'{SNAPSHOT_DIR}/')
+                         .values_list('video', 'pk').iterator())
+        checksum = not options['no_checksum']
+
+        nuevas = []
+        modificadas = []
+        asociadas = []
+        for path, stat in archivos.items():
+            if path not in registradas:
+                nuevas.append(snapshot_from_file(path, stat, alerta_de.get(path), checksum))
+                continue
+            pk, size, alert_id = registradas[path]
+            if size != stat.st_size:
+                snapshot = snapshot_from_file(path, stat, alert_id or alerta_de.get(path), checksum)
+                snapshot.pk = pk
+                modificadas.append(snapshot)
+            elif alert_id is None and path in alerta_de:
+                asociadas.append(AlertSnapshot(pk=pk, alert_id=alerta_de[path]))
+
+        AlertSnapshot.objects.bulk_create(nuevas, batch_size=options['batch_size'])
+        AlertSnapshot.objects.bulk_update(
+            modificadas, ['alert', 'size', 'width', 'height', 'checksum', 'created_at'],
+            batch_size=options['batch_size'],
+        )
+        AlertSnapshot.objects.bulk_update(asociadas, ['alert'], batch_size=options['batch_size'])
+
+        faltantes = [pk for path, (pk, _, _) in registradas.items() if path not in archivos]
+        if faltantes and options['prune']:
+            for desde in range(0, len(faltantes), options['batch_size']):
+                AlertSnapshot.objects.filter(pk__in=faltantes[desde:desde + options['batch_size']]).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(archivos)} capturas: {len(nuevas)} registradas, {len(modificadas)} actualizadas, "
+            f"{len(asociadas)} asociadas a su alerta"
+        ))
+        if faltantes:
+            accion = 'borrados' if options['prune'] else 'sin archivo (use --prune para borrarlos)'
+            self.stdout.write(self.style.WARNING(f"⚠️ {len(faltantes)} registros {accion}"))
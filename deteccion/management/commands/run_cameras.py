@@ -0,0 +1,72 @@
+# deteccion/management/commands/run_cameras.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deteccion.dbconn import refresh_thread_connection
+from deteccion.memory import get_memory_watchdog
+from deteccion.metrics import registry
+from deteccion.supervisor import CameraSupervisor
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Sirve /metrics (formato Prometheus) de las cámaras de este proceso"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass  # Prometheus consulta seguido: no ensuciar la salida
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta el supervisor de cámaras (un hilo por cada Camera habilitada) fuera del servidor web'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-interval', type=float, default=30,
+                            help='Segundos entre sincronizaciones con la tabla Camera')
+        parser.add_argument('--max-restarts', type=int, default=None,
+                            help='Reinicios permitidos por cámara antes de marcarla como fallida')
+        parser.add_argument('--restart-delay', type=float, default=5.0)
+        parser.add_argument('--metrics-port', type=int, default=None,
+                            help='Puerto para exponer /metrics de estas cámaras (Prometheus)')
+
+    def handle(self, *args, **options):
+        supervisor = CameraSupervisor(max_restarts=options['max_restarts'],
+                                      restart_delay=options['restart_delay'])
+        self.stdout.write(self.style.SUCCESS('✅ Supervisor de cámaras iniciado (Ctrl+C para salir)'))
+        # Reciclado por memoria: se detienen las cámaras y se sale con error para que el
+        # gestor de procesos (systemd, Render...) vuelva a lanzar el comando
+        reciclar = threading.Event()
+        get_memory_watchdog().on_recycle = reciclar.set
+        servidor = None
+        if options['metrics_port']:
+            servidor = ThreadingHTTPServer(('', options['metrics_port']), MetricsHandler)
+            threading.Thread(target=servidor.serve_forever, name='metrics', daemon=True).start()
+            self.stdout.write(f"📈 Métricas en http://0.0.0.0:{options['metrics_port']}/metrics")
+        try:
+            while True:
+                refresh_thread_connection()  # Este loop no pasa por el ciclo de peticiones de Django
+                supervisor.sync()
+                for estado in supervisor.health():
+                    self.stdout.write(json.dumps(estado, ensure_ascii=False))
+                if reciclar.wait(options['sync_interval']):
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write('🛑 Deteniendo cámaras...')
+        finally:
+            supervisor.stop_all()
+            if servidor is not None:
+                servidor.shutdown()
+        if reciclar.is_set():
+            raise CommandError('♻️ Proceso reciclado por uso de memoria (ver MEMORY_RECYCLE_MB)')
@@ -0,0 +1,161 @@
+# deteccion/media.py
+"""
+Entrega de archivos de media y grabaciones con soporte de Range y GET condicional.
+
+- Range (un solo rango, "bytes=a-b", "bytes=a-" o "bytes=-n"): responde 206
+  con sólo ese tramo, así el reproductor puede saltar dentro de un video de
+  cientos de MB sin descargarlo entero. Varios rangos se ignoran (200 con el
+  archivo completo, permitido por RFC 9110) y uno fuera del archivo da 416.
+- ETag/Last-Modified: If-None-Match / If-Modified-Since dan 304 e If-Range
+  descarta el rango si el archivo cambió.
+- El cuerpo se entrega con FileResponse desde la posición del rango: gunicorn
+  lo envía con sendfile() (sin copiar a Python) limitado por Content-Length.
+- Con MEDIA_ACCEL_REDIRECT (p. ej. "/protected/") la vista sólo verifica
+  permisos y delega el envío al proxy con X-Accel-Redirect (nginx); con
+  MEDIA_ACCEL_HEADER = "X-Sendfile" se envía la ruta absoluta (Apache/lighttpd).
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Archivo abierto en `start` que sólo deja leer `length` bytes (FileResponse/wsgi.file_wrapper)"""
+
+    def __init__(self, archivo, start, length):
+        self.archivo = archivo
+        self.restante = length
+        archivo.seek(start)
+
+    def read(self, size=-1):
+        if self.restante <= 0:
+            return b''
+        size = self.restante if size is None or size < 0 else min(size, self.restante)
+        datos = self.archivo.read(size)
+        self.restante -= len(datos)
+        return datos
+
+    def fileno(self):
+        # gunicorn hace sendfile() desde la posición actual hasta Content-Length
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+def parse_range(header, size):
+    """
+    (inicio, fin) inclusivo del rango pedido; None si no hay rango utilizable
+    (ausente, mal formado o varios rangos) y ValueError si no se puede satisfacer
+    """
+    coincidencia = RANGE_RE.match(header.strip()) if header else None
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin:
+            return None
+        # Sufijo: los últimos `fin` bytes
+        largo = int(fin)
+        if largo == 0:
+            raise ValueError('rango vacío')
+        return max(0, size - largo), size - 1
+    inicio = int(inicio)
+    fin = min(int(fin), size - 1) if fin else size - 1
+    if inicio >= size or fin < inicio:
+        raise ValueError('rango fuera del archivo')
+    return inicio, fin
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _if_range_matches(request, etag, mtime):
+    """If-Range: el rango sólo vale si el archivo es el mismo que el cliente ya tiene"""
+    valor = request.headers.get('If-Range')
+    if not valor:
+        return True
+    if valor.startswith(('"', 'W/')):
+        return valor == etag
+    fecha = parse_http_date_safe(valor)
+    return fecha is not None and int(mtime) <= fecha
+
+
+def resolve_media_path(root, path):
+    """Ruta absoluta de `path` dentro de `root` (404 si sale de root o no es un archivo)"""
+    try:
+        ruta = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404('Ruta no permitida')
+    if not os.path.isfile(ruta):
+        raise Http404('Archivo no encontrado')
+    return ruta
+
+
+def serve_file(request, root, path, accel_location=''):
+    """
+    Respuesta para `path` dentro de `root` (Range, GET condicional, sendfile o
+    X-Accel). `accel_location` es el prefijo interno del proxy para `root`.
+    """
+    ruta = resolve_media_path(root, path)
+    stat = os.stat(ruta)
+    etag = _etag(stat)
+    tipo, encoding = mimetypes.guess_type(ruta)
+    tipo = tipo or 'application/octet-stream'
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if respuesta is not None:
+        return respuesta
+
+    cabecera_accel = getattr(settings, 'MEDIA_ACCEL_HEADER', 'X-Accel-Redirect')
+    prefijo_accel = getattr(settings, 'MEDIA_ACCEL_REDIRECT', '')
+    if prefijo_accel:
+        # El proxy resuelve Range, condicionales y el envío del archivo
+        respuesta = HttpResponse(content_type=tipo)
+        if cabecera_accel.lower() == 'x-sendfile':
+            respuesta[cabecera_accel] = ruta
+        else:
+            interna = '/'.join(parte.strip('/') for parte in (prefijo_accel, accel_location, path) if parte.strip('/'))
+            respuesta[cabecera_accel] = quote(f'/{interna}')
+    elif request.method == 'HEAD':
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta['Content-Length'] = stat.st_size
+    else:
+        rango = None
+        if request.method == 'GET' and _if_range_matches(request, etag, stat.st_mtime):
+            try:
+                rango = parse_range(request.headers.get('Range'), stat.st_size)
+            except ValueError:
+                respuesta = HttpResponse(status=416)
+                respuesta['Content-Range'] = f'bytes */{stat.st_size}'
+                respuesta['Accept-Ranges'] = 'bytes'
+                return respuesta
+
+        archivo = open(ruta, 'rb')
+        if rango is None:
+            respuesta = FileResponse(archivo, content_type=tipo)
+        else:
+            inicio, fin = rango
+            respuesta = FileResponse(RangeFile(archivo, inicio, fin - inicio + 1), status=206, content_type=tipo)
+            respuesta['Content-Length'] = fin - inicio + 1
+            respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{stat.st_size}'
+
+    if encoding:
+        respuesta['Content-Encoding'] = encoding
+    respuesta['Accept-Ranges'] = 'bytes'
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(stat.st_mtime)
+    # Archivos detrás de login: que no los guarden caches compartidas
+    patch_cache_control(respuesta, private=True, max_age=getattr(settings, 'MEDIA_MAX_AGE', 3600))
+    return respuesta
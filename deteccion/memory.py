@@ -0,0 +1,314 @@
+# deteccion/memory.py
+"""
+Watchdog de memoria del proceso (reemplaza a check_memory_usage).
+
+Un hilo en segundo plano toma una muestra cada MEMORY_WATCHDOG_INTERVAL
+segundos: memoria privada (USS) y RSS del proceso, bloques asignados por
+Python, conteos del recolector de basura y, si torch ya está importado y
+hay CUDA, la memoria del dispositivo. Los umbrales se comparan con la USS:
+el RSS de un worker incluye las páginas del modelo precargado en el master
+(torch + YOLO, compartidas por copy-on-write) y superaría los umbrales
+apenas arranca. Si la plataforma no da la USS se usa el RSS. Con las
+últimas muestras calcula la tendencia (MB por minuto) y, según los
+umbrales de settings, aplica acciones graduales que se deshacen al bajar
+del umbral (con histéresis):
+
+    warn     gc.collect() y aviso en el log
+    shed     los streams se sirven como mucho en 480p (encoding.set_max_tier)
+    degrade  además, sólo miniaturas y las fuentes registradas infieren a
+             MEMORY_DEGRADED_IMGSZ en lugar de su imgsz normal
+    recycle  reciclado ordenado del proceso (una sola vez): bajo gunicorn,
+             SIGTERM al propio worker para que el master lo reemplace
+
+El detalle de asignaciones (tracemalloc top-N, incluidas las de numpy) se
+activa a pedido con start_tracing(), porque tracemalloc agrega costo a
+cada asignación. Todo se expone en /metrics (ver metrics.py).
+"""
+import gc
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+
+import numpy as np
+import psutil
+from django.conf import settings
+
+from .encoding import set_max_tier
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('ok', 'warn', 'shed', 'degrade', 'recycle')
+RECOVERY_RATIO = 0.9  # Se vuelve al nivel anterior por debajo del 90 % del umbral
+TREND_SAMPLES = 40
+NUMPY_DOMAIN = getattr(np.lib, 'tracemalloc_domain', 389047)  # Dominio de tracemalloc de numpy
+
+
+def _torch_cuda_bytes():
+    """Memoria CUDA asignada por torch (None si torch no se importó o no hay GPU)"""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return None
+    try:
+        return torch.cuda.memory_allocated() if torch.cuda.is_available() else None
+    except Exception:
+        return None
+
+
+def _recycle_process():
+    """Acción de reciclado por defecto: SIGTERM al propio worker de gunicorn (el master lo reemplaza)"""
+    if 'gunicorn.arbiter' not in sys.modules:
+        # runserver, comandos de manage.py...: nadie reemplazaría el proceso
+        logger.error(f"♻️ Memoria crítica en el proceso {os.getpid()}: reciclado omitido (no es un worker de gunicorn)")
+        return
+    logger.error(f"♻️ Reciclando el worker {os.getpid()} por uso de memoria")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class MemoryWatchdog:
+    """Muestrea la memoria del proceso y degrada el servicio por niveles"""
+
+    def __init__(self, interval=15.0, warn_mb=400, shed_mb=430, degrade_mb=460, recycle_mb=490,
+                 degraded_imgsz=224, on_recycle=_recycle_process):
+        self.interval = interval
+        # Umbral de cada nivel (0 o None = acción desactivada)
+        self.thresholds = {'warn': warn_mb, 'shed': shed_mb, 'degrade': degrade_mb, 'recycle': recycle_mb}
+        self.degraded_imgsz = degraded_imgsz
+        self.on_recycle = on_recycle
+        self.level = 'ok'
+        self.samples = deque(maxlen=TREND_SAMPLES)  # (monotonic, uss_mb)
+        self.last_sample = {}
+        self.actions = {accion: 0 for accion in LEVELS[1:]}
+        self.recycled = False
+        self._sources = weakref.WeakSet()
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            interval=getattr(settings, 'MEMORY_WATCHDOG_INTERVAL', 15.0),
+            warn_mb=getattr(settings, 'MEMORY_WARN_MB', 400),
+            shed_mb=getattr(settings, 'MEMORY_SHED_MB', 430),
+            degrade_mb=getattr(settings, 'MEMORY_DEGRADE_MB', 460),
+            recycle_mb=getattr(settings, 'MEMORY_RECYCLE_MB', 490),
+            degraded_imgsz=getattr(settings, 'MEMORY_DEGRADED_IMGSZ', 224),
+        )
+
+    # --- Ciclo de muestreo ---------------------------------------------------
+
+    def start(self):
+        if self.interval and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self.sample()
+            self._thread = threading.Thread(target=self._run, name='memory-watchdog', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Watchdog de memoria: {e}")
+
+    def _memory_mb(self):
+        """(USS, RSS) en MB; USS = RSS si memory_full_info no está disponible"""
+        try:
+            info = self._process.memory_full_info()
+            return info.uss / 2 ** 20, info.rss / 2 ** 20
+        except (psutil.AccessDenied, AttributeError, NotImplementedError):
+            rss_mb = self._process.memory_info().rss / 2 ** 20
+            return rss_mb, rss_mb
+
+    def sample(self):
+        """Toma una muestra y la agrega a la tendencia"""
+        uss_mb, rss_mb = self._memory_mb()
+        muestra = {
+            'uss_mb': round(uss_mb, 1),
+            'rss_mb': round(rss_mb, 1),
+            'python_blocks': sys.getallocatedblocks(),
+            'gc_counts': gc.get_count(),
+            'torch_cuda_bytes': _torch_cuda_bytes(),
+            'tracing': tracemalloc.is_tracing(),
+        }
+        if muestra['tracing']:
+            muestra['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            self.samples.append((time.monotonic(), uss_mb))
+            self.last_sample = muestra
+        return muestra
+
+    @property
+    def trend_mb_per_min(self):
+        """Pendiente de la USS en las últimas muestras (MB/min); 0 con menos de 3 muestras"""
+        with self._lock:
+            muestras = list(self.samples)
+        if len(muestras) < 3:
+            return 0.0
+        tiempos = np.array([t for t, _ in muestras]) - muestras[0][0]
+        if tiempos[-1] <= 0:
+            return 0.0
+        pendiente = np.polyfit(tiempos, [uss for _, uss in muestras], 1)[0]
+        return float(pendiente * 60)
+
+    def check(self):
+        """Muestrea y aplica el nivel que corresponde a la USS actual; devuelve el nivel"""
+        uss_mb = self.sample()['uss_mb']
+        nivel = self._level_for(uss_mb)
+        if nivel != self.level:
+            anterior, self.level = self.level, nivel
+            logger.warning(f"⚠️ Memoria privada {uss_mb:.0f} MB: nivel {anterior} → {nivel}")
+            self._apply(nivel)
+        if nivel == 'recycle':
+            self.actions[nivel] += 1
+            if not self.recycled and self.on_recycle:
+                self.recycled = True
+                self.on_recycle()
+        elif nivel != 'ok':
+            self.actions[nivel] += 1
+            gc.collect()
+        return nivel
+
+    def _level_for(self, uss_mb):
+        """Nivel más alto cuyo umbral se superó; para bajar de nivel hay que quedar bajo el 90 % del umbral"""
+        actual = LEVELS.index(self.level)
+        nivel = 0
+        for indice, nombre in enumerate(LEVELS[1:], start=1):
+            umbral = self.thresholds.get(nombre)
+            if not umbral:
+                continue
+            if uss_mb >= umbral or (indice <= actual and uss_mb >= umbral * RECOVERY_RATIO):
+                nivel = indice
+        return LEVELS[nivel]
+
+    def _apply(self, nivel):
+        """Ajusta los niveles de stream y el imgsz de las fuentes al nivel actual"""
+        indice = LEVELS.index(nivel)
+        if indice >= LEVELS.index('degrade'):
+            set_max_tier('thumb')
+        elif indice >= LEVELS.index('shed'):
+            set_max_tier('480p')
+        else:
+            set_max_tier(None)
+
+        degradar = indice >= LEVELS.index('degrade')
+        for fuente in list(self._sources):
+            normal = getattr(fuente, '_imgsz_normal', None)
+            if degradar and normal is None:
+                fuente._imgsz_normal = fuente.imgsz
+                fuente.imgsz = min(fuente.imgsz, self.degraded_imgsz)
+            elif not degradar and normal is not None:
+                fuente.imgsz = normal
+                fuente._imgsz_normal = None
+
+    # --- Fuentes de video ------------------------------------------------------
+
+    def register_source(self, fuente):
+        """Registra una fuente con atributo `imgsz` (DroidCamera, VideoProcessor...) para degradarla"""
+        self._sources.add(fuente)
+        if LEVELS.index(self.level) >= LEVELS.index('degrade'):
+            self._apply(self.level)
+        return fuente
+
+    # --- tracemalloc a pedido ------------------------------------------------
+
+    def start_tracing(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info("🔍 tracemalloc activado")
+
+    def stop_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🔍 tracemalloc desactivado")
+
+    def top_allocations(self, limit=10):
+        """Top-N de asignaciones vivas por línea y totales de numpy (None si no se está trazando)"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        numpy_traces = snapshot.filter_traces([tracemalloc.DomainFilter(True, NUMPY_DOMAIN)]).traces
+        python = snapshot.filter_traces([
+            tracemalloc.DomainFilter(False, NUMPY_DOMAIN),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        return {
+            'numpy': {'count': len(numpy_traces), 'bytes': sum(t.size for t in numpy_traces)},
+            'top': [
+                {'location': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                for stat in python.statistics('lineno')[:limit]
+            ],
+        }
+
+    # --- Estado y métricas ---------------------------------------------------
+
+    def status(self, top=0):
+        estado = {
+            'level': self.level,
+            'thresholds_mb': self.thresholds,
+            'trend_mb_per_min': round(self.trend_mb_per_min, 2),
+            'actions': dict(self.actions),
+            'sources': len(self._sources),
+            **self.last_sample,
+        }
+        if top:
+            estado['allocations'] = self.top_allocations(top)
+        return estado
+
+    def prometheus_lines(self):
+        muestra = self.last_sample
+        if not muestra:
+            return []
+        lineas = []
+        for nombre, tipo, ayuda, valor in (
+            ('epp_memory_uss_bytes', 'gauge', 'Memoria privada (USS) del proceso, la que miden los umbrales',
+             int(muestra['uss_mb'] * 2 ** 20)),
+            ('epp_memory_rss_bytes', 'gauge', 'RSS del proceso (incluye páginas compartidas con el master)',
+             int(muestra['rss_mb'] * 2 ** 20)),
+            ('epp_memory_python_blocks', 'gauge', 'Bloques asignados por Python', muestra['python_blocks']),
+            ('epp_memory_trend_bytes_per_minute', 'gauge', 'Tendencia de la USS',
+             int(self.trend_mb_per_min * 2 ** 20)),
+            ('epp_memory_level', 'gauge', f"Nivel del watchdog ({', '.join(f'{i}={n}' for i, n in enumerate(LEVELS))})",
+             LEVELS.index(self.level)),
+            ('epp_memory_torch_cuda_bytes', 'gauge', 'Memoria CUDA asignada por torch',
+             muestra['torch_cuda_bytes']),
+            ('epp_memory_traced_bytes', 'gauge', 'Memoria trazada por tracemalloc (si está activo)',
+             muestra.get('traced_bytes')),
+        ):
+            if valor is None:
+                continue
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}', f'{nombre} {valor}']
+        lineas += ['# HELP epp_memory_gc_pending Objetos pendientes por generación del recolector',
+                   '# TYPE epp_memory_gc_pending gauge']
+        lineas += [f'epp_memory_gc_pending{{generation="{g}"}} {n}' for g, n in enumerate(muestra['gc_counts'])]
+        lineas += ['# HELP epp_memory_actions_total Muestras en cada nivel de acción del watchdog',
+                   '# TYPE epp_memory_actions_total counter']
+        lineas += [f'epp_memory_actions_total{{action="{a}"}} {n}' for a, n in self.actions.items()]
+        return lineas
+
+
+# Singleton del watchdog (igual que el supervisor de cámaras)
+memory_watchdog = None
+memory_watchdog_lock = threading.Lock()
+
+
+def get_memory_watchdog():
+    """Obtiene o crea (y arranca) el watchdog de memoria del proceso"""
+    global memory_watchdog
+    with memory_watchdog_lock:
+        if memory_watchdog is None:
+            memory_watchdog = MemoryWatchdog.from_settings().start()
+            registry.add_collector(memory_watchdog.prometheus_lines)
+        return memory_watchdog
@@ -0,0 +1,169 @@
+# deteccion/metrics.py
+"""
+Tiempos por etapa del pipeline de detección, expuestos en formato de texto
+de Prometheus (vista /metrics).
+
+Cada fuente de video (DroidCamera, VideoCamera, VideoProcessor) tiene un
+`PipelineMetrics` con su nombre (el de la cámara). Las etapas se miden con
+
+    with self.metrics.stage('inference'):
+        ...
+
+que sólo agrega la duración a una ventana circular (deque) de la etapa; los
+percentiles p50/p95/p99 se calculan al momento de leer /metrics, no en el
+loop de captura. También se cuentan los frames procesados, los descartados
+(lecturas fallidas o salteadas) y los FPS reales de las últimas muestras.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 512  # Muestras por etapa para los percentiles
+
+
+class _Stage:
+    """Cronómetro de una etapa (context manager)"""
+    __slots__ = ('samples', 'totals', 'start')
+
+    def __init__(self, samples, totals):
+        self.samples = samples
+        self.totals = totals
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracion = time.perf_counter() - self.start
+        self.samples.append(duracion)
+        self.totals[0] += 1
+        self.totals[1] += duracion
+        return False
+
+
+class PipelineMetrics:
+    """Histogramas móviles de las etapas de un pipeline, FPS y frames descartados"""
+
+    def __init__(self, name, window=WINDOW):
+        self.name = name
+        self.window = window
+        self.frames = 0
+        self.dropped = 0
+        self._frame_times = deque(maxlen=64)
+        self._samples = {}
+        self._totals = {}  # etapa -> [cantidad, suma de segundos]
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        samples = self._samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(name, deque(maxlen=self.window))
+                self._totals.setdefault(name, [0, 0.0])
+        return _Stage(samples, self._totals[name])
+
+    def frame_done(self):
+        self.frames += 1
+        self._frame_times.append(time.monotonic())
+
+    def frame_dropped(self):
+        self.dropped += 1
+
+    @property
+    def fps(self):
+        tiempos = list(self._frame_times)
+        if len(tiempos) < 2 or tiempos[-1] <= tiempos[0]:
+            return 0.0
+        # Si el pipeline se detuvo, la última muestra envejece y los FPS van bajando
+        return (len(tiempos) - 1) / (max(time.monotonic(), tiempos[-1]) - tiempos[0])
+
+    def snapshot(self):
+        """{etapa: {'p50': s, 'p95': s, 'p99': s, 'count': n, 'sum': s}}"""
+        resultado = {}
+        with self._lock:
+            etapas = list(self._samples.items())
+        for nombre, samples in etapas:
+            valores = np.fromiter(tuple(samples), dtype=np.float64)
+            if not valores.size:
+                continue
+            cuantiles = np.quantile(valores, QUANTILES)
+            cantidad, suma = self._totals[nombre]
+            resultado[nombre] = {
+                **{f'p{round(q * 100)}': float(v) for q, v in zip(QUANTILES, cuantiles)},
+                'count': cantidad,
+                'sum': suma,
+            }
+        return resultado
+
+
+class MetricsRegistry:
+    """Pipelines por nombre; una cámara recreada (reinicio) sigue sumando al mismo"""
+
+    def __init__(self):
+        self._pipelines = {}
+        self._collectors = []  # Funciones que devuelven líneas extra (p. ej. el watchdog de memoria)
+        self._lock = threading.Lock()
+
+    def pipeline(self, name):
+        with self._lock:
+            metrics = self._pipelines.get(name)
+            if metrics is None:
+                metrics = self._pipelines[name] = PipelineMetrics(name)
+            return metrics
+
+    def add_collector(self, collector):
+        """Agrega `collector()` (lista de líneas en formato Prometheus) a la exposición"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def all(self):
+        with self._lock:
+            return sorted(self._pipelines.values(), key=lambda m: m.name)
+
+    def render_prometheus(self):
+        """Texto de exposición de Prometheus (version 0.0.4)"""
+        lineas = [
+            '# HELP epp_stage_seconds Duración de cada etapa del pipeline de detección',
+            '# TYPE epp_stage_seconds summary',
+        ]
+        pipelines = self.all()
+        for metrics in pipelines:
+            for etapa, datos in metrics.snapshot().items():
+                etiquetas = f'pipeline="{_escape(metrics.name)}",stage="{_escape(etapa)}"'
+                for q in QUANTILES:
+                    lineas.append(f'epp_stage_seconds{{{etiquetas},quantile="{q}"}} {datos[f"p{round(q * 100)}"]:.6f}')
+                lineas.append(f'epp_stage_seconds_sum{{{etiquetas}}} {datos["sum"]:.6f}')
+                lineas.append(f'epp_stage_seconds_count{{{etiquetas}}} {datos["count"]}')
+
+        for nombre, tipo, ayuda, valor in (
+            ('epp_pipeline_fps', 'gauge', 'FPS reales de las últimas muestras', lambda m: f'{m.fps:.2f}'),
+            ('epp_frames_total', 'counter', 'Frames procesados', lambda m: m.frames),
+            ('epp_frames_dropped_total', 'counter', 'Frames descartados (lectura fallida o salteados)',
+             lambda m: m.dropped),
+        ):
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for metrics in pipelines:
+                lineas.append(f'{nombre}{{pipeline="{_escape(metrics.name)}"}} {valor(metrics)}')
+
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            lineas.extend(collector())
+        return '\n'.join(lineas) + '\n'
+
+
+def _escape(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def pipeline_metrics(name):
+    """PipelineMetrics compartido del pipeline `name`"""
+    return registry.pipeline(name)
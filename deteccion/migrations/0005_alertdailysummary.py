@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:33
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+# Copia congelada de la lógica de deteccion/rollup.py al crear la tabla: la
+# migración no debe cambiar si cambian los helpers o los elementos de EPP
+EPP_ITEMS = (('helmet', 'Casco'), ('vest', 'Chaleco'), ('boots', 'Botas'))
+LEVELS = ('high', 'medium', 'low', 'positive')
+STATUSES = ('pending', 'resolved', 'false_positive', 'non_compliant', 'system_error')
+
+
+def backfill_alert_daily_summary(apps, schema_editor):
+    Alert = apps.get_model('deteccion', 'Alert')
+    AlertDailySummary = apps.get_model('deteccion', 'AlertDailySummary')
+
+    conteos = {'total': Count('id'), 'resolved': Count('id', filter=Q(resolved=True))}
+    for nivel in LEVELS:
+        conteos[f'level_{nivel}'] = Count('id', filter=Q(level=nivel))
+    for estado in STATUSES:
+        conteos[f'status_{estado}'] = Count('id', filter=Q(resolution_status=estado))
+    for clave, etiqueta in EPP_ITEMS:
+        # Todavía no existe missing_mask (0006): se busca en el texto
+        faltante = Q(missing__icontains=clave) | Q(missing__icontains=etiqueta)
+        conteos[f'missing_{clave}'] = Count('id', filter=faltante)
+        conteos[f'non_compliant_{clave}'] = Count('id', filter=faltante & Q(resolution_status='non_compliant'))
+
+    filas = Alert.objects.annotate(date=TruncDate('timestamp')).order_by().values('date').annotate(**conteos)
+    AlertDailySummary.objects.bulk_create([AlertDailySummary(**fila) for fila in filas], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0004_capacitacion_evaluacion_certificado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Fecha')),
+                ('total', models.IntegerField(default=0)),
+                ('level_high', models.IntegerField(default=0)),
+                ('level_medium', models.IntegerField(default=0)),
+                ('level_low', models.IntegerField(default=0)),
+                ('level_positive', models.IntegerField(default=0)),
+                ('resolved', models.IntegerField(default=0)),
+                ('status_pending', models.IntegerField(default=0)),
+                ('status_resolved', models.IntegerField(default=0)),
+                ('status_false_positive', models.IntegerField(default=0)),
+                ('status_non_compliant', models.IntegerField(default=0)),
+                ('status_system_error', models.IntegerField(default=0)),
+                ('missing_helmet', models.IntegerField(default=0)),
+                ('missing_vest', models.IntegerField(default=0)),
+                ('missing_boots', models.IntegerField(default=0)),
+                ('non_compliant_helmet', models.IntegerField(default=0)),
+                ('non_compliant_vest', models.IntegerField(default=0)),
+                ('non_compliant_boots', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de alertas',
+                'verbose_name_plural': 'Resúmenes diarios de alertas',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.RunPython(backfill_alert_daily_summary, migrations.RunPython.noop),
+    ]
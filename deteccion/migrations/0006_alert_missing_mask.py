@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:35
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.db.models.lookups import GreaterThan
+
+# Copia congelada de missing_mask_from_text y de deteccion/rollup.py al
+# agregar la máscara: la migración no debe cambiar si cambian los helpers
+EPP_ITEMS = (('helmet', 'Casco'), ('vest', 'Chaleco'), ('boots', 'Botas'))
+EPP_ITEM_BITS = {'helmet': 1, 'vest': 2, 'boots': 4}
+LEVELS = ('high', 'medium', 'low', 'positive')
+STATUSES = ('pending', 'resolved', 'false_positive', 'non_compliant', 'system_error')
+
+
+def missing_mask_from_text(missing):
+    nombres = {elemento.strip().lower() for elemento in missing.split(',')}
+    mask = 0
+    for clave, etiqueta in EPP_ITEMS:
+        if clave in nombres or etiqueta.lower() in nombres:
+            mask |= EPP_ITEM_BITS[clave]
+    return mask
+
+
+def backfill_missing_mask(apps, schema_editor):
+    Alert = apps.get_model('deteccion', 'Alert')
+    AlertDailySummary = apps.get_model('deteccion', 'AlertDailySummary')
+    # Pocas combinaciones distintas: una actualización por texto de `missing`
+    for missing in Alert.objects.exclude(missing='').order_by().values_list('missing', flat=True).distinct():
+        Alert.objects.filter(missing=missing).update(missing_mask=missing_mask_from_text(missing))
+
+    # El resumen pasa a contar por máscara (igual que Alert.save())
+    conteos = {'total': Count('id'), 'resolved': Count('id', filter=Q(resolved=True))}
+    for nivel in LEVELS:
+        conteos[f'level_{nivel}'] = Count('id', filter=Q(level=nivel))
+    for estado in STATUSES:
+        conteos[f'status_{estado}'] = Count('id', filter=Q(resolution_status=estado))
+    for clave, bit in EPP_ITEM_BITS.items():
+        faltante = Q(GreaterThan(F('missing_mask').bitand(bit), 0))
+        conteos[f'missing_{clave}'] = Count('id', filter=faltante)
+        conteos[f'non_compliant_{clave}'] = Count('id', filter=faltante & Q(resolution_status='non_compliant'))
+
+    filas = Alert.objects.annotate(date=TruncDate('timestamp')).order_by().values('date').annotate(**conteos)
+    AlertDailySummary.objects.all().delete()
+    AlertDailySummary.objects.bulk_create([AlertDailySummary(**fila) for fila in filas], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0005_alertdailysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='missing_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['resolution_status', 'missing_mask'], name='alert_status_mask_idx'),
+        ),
+        migrations.RunPython(backfill_missing_mask, migrations.RunPython.noop),
+    ]
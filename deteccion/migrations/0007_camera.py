@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:46
+
+import deteccion.util
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0006_alert_missing_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Camera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('ip_address', models.GenericIPAddressField(verbose_name='Dirección IP')),
+                ('port', models.PositiveIntegerField(default=4747, verbose_name='Puerto')),
+                ('roi', models.JSONField(blank=True, default=list, help_text='Polígono [[x, y], ...] con coordenadas relativas (0 a 1) al ancho y alto del frame. Vacío = todo el frame.', validators=[deteccion.util.valida_poligono_roi], verbose_name='Zona de interés')),
+            ],
+            options={
+                'verbose_name': 'Cámara',
+                'verbose_name_plural': 'Cámaras',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(fields=('ip_address', 'port'), name='camera_unique_address')],
+            },
+        ),
+    ]
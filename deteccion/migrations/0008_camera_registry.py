@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0007_camera'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='enabled',
+            field=models.BooleanField(default=True, verbose_name='Habilitada'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='fps_target',
+            field=models.PositiveSmallIntegerField(default=15, verbose_name='FPS objetivo'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='height',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Alto'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='source_type',
+            field=models.CharField(choices=[('droidcam', 'DroidCam (IP)'), ('stream', 'RTSP / HTTP'), ('usb', 'Cámara local (índice)'), ('file', 'Archivo de video')], default='droidcam', max_length=10, verbose_name='Tipo'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='url',
+            field=models.CharField(blank=True, help_text='URL RTSP/HTTP, ruta del archivo o índice de la cámara local. Para DroidCam puede dejarse vacío y se usa la IP y el puerto.', max_length=255, verbose_name='URL / origen'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='width',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ancho'),
+        ),
+        migrations.AlterField(
+            model_name='camera',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True, verbose_name='Dirección IP'),
+        ),
+        migrations.AlterField(
+            model_name='camera',
+            name='port',
+            field=models.PositiveIntegerField(blank=True, default=4747, null=True, verbose_name='Puerto'),
+        ),
+    ]
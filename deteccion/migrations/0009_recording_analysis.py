@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0008_camera_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordingAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, verbose_name='Grabación')),
+                ('model_version', models.CharField(max_length=255, verbose_name='Modelo')),
+                ('fps', models.FloatField(default=20.0)),
+                ('frame_count', models.PositiveIntegerField(default=0)),
+                ('chunk_size', models.PositiveIntegerField(default=0)),
+                ('chunks_done', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Terminado'), ('failed', 'Con errores')], default='pending', max_length=10)),
+                ('detections_count', models.PositiveIntegerField(default=0)),
+                ('alerts_count', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Re-análisis de grabación',
+                'verbose_name_plural': 'Re-análisis de grabaciones',
+                'ordering': ['-started_at'],
+                'constraints': [models.UniqueConstraint(fields=('path', 'model_version'), name='recording_analysis_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='analysis',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='deteccion.recordinganalysis'),
+        ),
+        migrations.CreateModel(
+            name='RecordedDetection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frame', models.PositiveIntegerField()),
+                ('label', models.CharField(max_length=50)),
+                ('confidence', models.FloatField()),
+                ('x1', models.FloatField()),
+                ('y1', models.FloatField()),
+                ('x2', models.FloatField()),
+                ('y2', models.FloatField()),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detections', to='deteccion.recordinganalysis')),
+            ],
+            options={
+                'verbose_name': 'Detección grabada',
+                'verbose_name_plural': 'Detecciones grabadas',
+                'ordering': ['analysis', 'frame'],
+                'indexes': [models.Index(fields=['analysis', 'frame'], name='recorded_detection_frame_idx')],
+            },
+        ),
+    ]
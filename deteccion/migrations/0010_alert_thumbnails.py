@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0009_recording_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='thumbnail_webp',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0010_alert_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('alert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots', to='deteccion.alert')),
+                ('camera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots', to='deteccion.camera')),
+            ],
+            options={
+                'verbose_name': 'Captura de alerta',
+                'verbose_name_plural': 'Capturas de alertas',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
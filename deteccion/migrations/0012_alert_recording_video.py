@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:10
+
+import os
+
+from django.conf import settings
+from django.db import migrations
+
+
+def relative_recording_paths(apps, schema_editor):
+    """El re-análisis guardaba en Alert.video la ruta absoluta de la grabación"""
+    Alert = apps.get_model('deteccion', 'Alert')
+    raiz = os.path.abspath(settings.RECORDINGS_ROOT)
+    absolutas = (Alert.objects.filter(analysis__isnull=False, video__startswith=os.sep)
+                 .order_by().values_list('video', flat=True).distinct())
+    for video in list(absolutas):
+        relativa = os.path.relpath(video, raiz)
+        fuera = relativa == os.pardir or relativa.startswith(os.pardir + os.sep)
+        nuevo = '' if fuera else 'grabaciones/' + relativa.replace(os.sep, '/')
+        Alert.objects.filter(video=video).update(video=nuevo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deteccion', '0011_alert_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(relative_recording_paths, migrations.RunPython.noop),
+    ]
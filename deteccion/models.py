@@ -3,8 +3,12 @@ from django.contrib.auth.models import AbstractUser, Group, Permission, Permissi
 from django.db import models
 from django.db.models import UniqueConstraint
 from django.core.validators import RegexValidator
+from django.core.exceptions import ValidationError
 from django.db import models
-from .util import valida_cedula
+from django.db import transaction
+from django.db.models import F
+from collections import Counter, defaultdict
+from .util import valida_cedula, valida_poligono_roi
 from django.utils import timezone
 
 
@@ -142,6 +146,49 @@ class User(AbstractUser, PermissionsMixin):
 
 
 
+# Elementos de EPP requeridos: (clase del modelo YOLO, etiqueta en español).
+# DroidCamera guarda las etiquetas y VideoCamera las clases, se aceptan ambas.
+EPP_ITEMS = (
+    ('helmet', 'Casco'),
+    ('vest', 'Chaleco'),
+    ('boots', 'Botas'),
+)
+
+
+# Bit de cada elemento en Alert.missing_mask (helmet=1, vest=2, boots=4)
+EPP_ITEM_BITS = {clave: 1 << posicion for posicion, (clave, _) in enumerate(EPP_ITEMS)}
+
+
+# Prefijo de Alert.video cuando la evidencia es una grabación (camera.py, re-análisis):
+# el resto de la ruta es relativo a settings.RECORDINGS_ROOT y se sirve en recording_file
+RECORDINGS_PREFIX = 'grabaciones/'
+
+
+def missing_item_keys(missing):
+    """Convierte el texto 'Casco, Chaleco' del campo missing en claves ['helmet', 'vest']"""
+    if not missing:
+        return []
+    nombres = {elemento.strip().lower() for elemento in missing.split(',')}
+    return [clave for clave, etiqueta in EPP_ITEMS if clave in nombres or etiqueta.lower() in nombres]
+
+
+def missing_mask_from_text(missing):
+    """Máscara de bits equivalente al texto del campo missing"""
+    mask = 0
+    for clave in missing_item_keys(missing):
+        mask |= EPP_ITEM_BITS[clave]
+    return mask
+
+
+def missing_item_keys_from_mask(mask):
+    return [clave for clave, _ in EPP_ITEMS if mask & EPP_ITEM_BITS[clave]]
+
+
+def missing_labels_from_mask(mask):
+    """Etiquetas en español de los elementos presentes en la máscara"""
+    return [etiqueta for clave, etiqueta in EPP_ITEMS if mask & EPP_ITEM_BITS[clave]]
+
+
 class Alert(models.Model):
     LEVEL_CHOICES = (
         ('high', 'Alta'),
@@ -160,8 +207,13 @@ class Alert(models.Model):
 
     message = models.CharField(max_length=255)
     missing = models.CharField(max_length=255, blank=True)
+    # Forma normalizada de `missing` (ver EPP_ITEM_BITS); se calcula en save()
+    missing_mask = models.PositiveSmallIntegerField(default=0, db_index=True)
     level = models.CharField(max_length=10, choices=LEVEL_CHOICES, default='high')
     video = models.FileField(upload_to='', blank=True, null=True)
+    # Miniaturas de la captura para las listas; las genera un hilo aparte (ver thumbnails.py)
+    thumbnail = models.FileField(upload_to='', max_length=255, blank=True, null=True)
+    thumbnail_webp = models.FileField(upload_to='', max_length=255, blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     resolved = models.BooleanField(default=False)
     
@@ -180,11 +232,22 @@ class Alert(models.Model):
         related_name='resolved_alerts'
     )
     resolved_at = models.DateTimeField(null=True, blank=True)
+    # Re-análisis offline que generó la alerta (None = alerta en vivo)
+    analysis = models.ForeignKey(
+        'RecordingAnalysis',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alerts'
+    )
 
     class Meta:
         verbose_name = 'Alerta'
         verbose_name_plural = 'Alertas'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['resolution_status', 'missing_mask'], name='alert_status_mask_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_level_display()} - {self.message} ({self.timestamp:%Y-%m-%d %H:%M:%S})"
@@ -198,6 +261,325 @@ class Alert(models.Model):
         self.resolved_at = timezone.now()
         self.save()
 
+    @property
+    def recording_path(self):
+        """Ruta relativa a RECORDINGS_ROOT si la evidencia es una grabación"""
+        if self.video and self.video.name.startswith(RECORDINGS_PREFIX):
+            return self.video.name[len(RECORDINGS_PREFIX):]
+        return None
+
+    @property
+    def evidence_url(self):
+        """URL de la evidencia: la captura en media/ o la grabación (con Range, ver media.py)"""
+        if not self.video:
+            return None
+        if self.recording_path:
+            from django.urls import reverse
+            return reverse('deteccion:recording_file', args=[self.recording_path])
+        return self.video.url
+
+    @property
+    def thumbnail_url(self):
+        """Miniatura para listas (None mientras no se genere: las listas no cargan la original)"""
+        return self.thumbnail.url if self.thumbnail else None
+
+    @property
+    def missing_elements(self):
+        """Elementos faltantes decodificados desde missing_mask"""
+        return missing_labels_from_mask(self.missing_mask)
+
+    # --- Mantenimiento incremental del resumen diario (AlertDailySummary) ---
+    ROLLUP_FIELDS = ('timestamp', 'level', 'resolution_status', 'resolved', 'missing_mask')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Foto de lo que la alerta aporta al resumen, para calcular la diferencia al guardar
+        if all(f in field_names for f in ('id',) + cls.ROLLUP_FIELDS):
+            instance._rollup_snapshot = instance.rollup_contribution()
+        return instance
+
+    def rollup_contribution(self):
+        """Día y columnas de AlertDailySummary que esta alerta incrementa"""
+        columnas = ['total', f'level_{self.level}', f'status_{self.resolution_status}']
+        if self.resolved:
+            columnas.append('resolved')
+        for clave in missing_item_keys_from_mask(self.missing_mask):
+            columnas.append(f'missing_{clave}')
+            if self.resolution_status == 'non_compliant':
+                columnas.append(f'non_compliant_{clave}')
+        return timezone.localdate(self.timestamp), columnas
+
+    def _previous_rollup_contribution(self):
+        if self._state.adding:
+            return None
+        if hasattr(self, '_rollup_snapshot'):
+            return self._rollup_snapshot
+        # Instancia cargada con campos diferidos: leer el estado guardado
+        guardada = Alert.objects.filter(pk=self.pk).only(*self.ROLLUP_FIELDS).first()
+        return guardada.rollup_contribution() if guardada else None
+
+    def save(self, *args, **kwargs):
+        self.missing_mask = missing_mask_from_text(self.missing)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'missing' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'missing_mask'}
+        anterior = self._previous_rollup_contribution()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            actual = self.rollup_contribution()
+            AlertDailySummary.apply_change(anterior, actual)
+        self._rollup_snapshot = actual
+        if anterior != actual:
+            from .trends import invalidate_alert_trends
+            invalidate_alert_trends(self.timestamp)
+
+    def delete(self, *args, **kwargs):
+        anterior = self._previous_rollup_contribution()
+        with transaction.atomic():
+            timestamp = self.timestamp
+            resultado = super().delete(*args, **kwargs)
+            AlertDailySummary.apply_change(anterior, None)
+        from .caching import invalidate
+        from .trends import invalidate_alert_trends
+        invalidate_alert_trends(timestamp)
+        invalidate('alerts')
+        return resultado
+
+
+class AlertDailySummary(models.Model):
+    """
+    Resumen materializado de alertas por día: conteos por nivel, estado de
+    resolución y elemento faltante. Alert.save()/delete() lo mantienen al día;
+    las actualizaciones masivas (queryset.update/delete) no pasan por ahí y se
+    corrigen con `python manage.py backfill_alert_rollup`.
+    """
+    date = models.DateField(unique=True, verbose_name='Fecha')
+    total = models.IntegerField(default=0)
+
+    level_high = models.IntegerField(default=0)
+    level_medium = models.IntegerField(default=0)
+    level_low = models.IntegerField(default=0)
+    level_positive = models.IntegerField(default=0)
+
+    resolved = models.IntegerField(default=0)
+    status_pending = models.IntegerField(default=0)
+    status_resolved = models.IntegerField(default=0)
+    status_false_positive = models.IntegerField(default=0)
+    status_non_compliant = models.IntegerField(default=0)
+    status_system_error = models.IntegerField(default=0)
+
+    missing_helmet = models.IntegerField(default=0)
+    missing_vest = models.IntegerField(default=0)
+    missing_boots = models.IntegerField(default=0)
+    non_compliant_helmet = models.IntegerField(default=0)
+    non_compliant_vest = models.IntegerField(default=0)
+    non_compliant_boots = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Resumen diario de alertas'
+        verbose_name_plural = 'Resúmenes diarios de alertas'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date:%Y-%m-%d}: {self.total} alertas"
+
+    @classmethod
+    def counter_fields(cls):
+        return [f.name for f in cls._meta.concrete_fields if f.name not in ('id', 'date')]
+
+    @classmethod
+    def apply_change(cls, anterior, actual):
+        """Resta la contribución anterior de una alerta y suma la actual"""
+        validas = set(cls.counter_fields())
+        deltas = defaultdict(Counter)
+        if anterior:
+            dia, columnas = anterior
+            deltas[dia].subtract(c for c in columnas if c in validas)
+        if actual:
+            dia, columnas = actual
+            deltas[dia].update(c for c in columnas if c in validas)
+
+        for dia, delta in deltas.items():
+            cambios = {columna: F(columna) + n for columna, n in delta.items() if n}
+            if not cambios:
+                continue
+            cls.objects.get_or_create(date=dia)
+            cls.objects.filter(date=dia).update(**cambios)
+
+
+class Camera(models.Model):
+    """
+    Fuente de video registrada. El supervisor de cámaras (supervisor.py)
+    levanta un hilo de captura e inferencia por cada cámara habilitada.
+    """
+    SOURCE_TYPES = (
+        ('droidcam', 'DroidCam (IP)'),
+        ('stream', 'RTSP / HTTP'),
+        ('usb', 'Cámara local (índice)'),
+        ('file', 'Archivo de video'),
+    )
+
+    name = models.CharField(verbose_name='Nombre', max_length=100, unique=True)
+    source_type = models.CharField(verbose_name='Tipo', max_length=10, choices=SOURCE_TYPES, default='droidcam')
+    url = models.CharField(
+        verbose_name='URL / origen',
+        max_length=255,
+        blank=True,
+        help_text='URL RTSP/HTTP, ruta del archivo o índice de la cámara local. '
+                  'Para DroidCam puede dejarse vacío y se usa la IP y el puerto.'
+    )
+    ip_address = models.GenericIPAddressField(verbose_name='Dirección IP', null=True, blank=True)
+    port = models.PositiveIntegerField(verbose_name='Puerto', default=4747, null=True, blank=True)
+    fps_target = models.PositiveSmallIntegerField(verbose_name='FPS objetivo', default=15)
+    width = models.PositiveSmallIntegerField(verbose_name='Ancho', null=True, blank=True)
+    height = models.PositiveSmallIntegerField(verbose_name='Alto', null=True, blank=True)
+    enabled = models.BooleanField(verbose_name='Habilitada', default=True)
+    roi = models.JSONField(
+        verbose_name='Zona de interés',
+        default=list,
+        blank=True,
+        validators=[valida_poligono_roi],
+        help_text='Polígono [[x, y], ...] con coordenadas relativas (0 a 1) al ancho y alto del frame. '
+                  'Vacío = todo el frame.'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Cámara'
+        verbose_name_plural = 'Cámaras'
+        ordering = ['name']
+        constraints = [
+            UniqueConstraint(fields=['ip_address', 'port'], name='camera_unique_address'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        super().clean()
+        if self.source_type == 'droidcam' and not (self.url or self.ip_address):
+            raise ValidationError({'ip_address': 'Indique la IP de la DroidCam o una URL.'})
+        if self.source_type in ('stream', 'file') and not self.url:
+            raise ValidationError({'url': 'Este tipo de cámara requiere una URL o ruta.'})
+        if self.source_type == 'usb' and self.url and not self.url.lstrip('-').isdigit():
+            raise ValidationError({'url': 'Para una cámara local indique el índice (0, 1, ...).'})
+        if bool(self.width) != bool(self.height):
+            raise ValidationError('Indique ancho y alto, o ninguno de los dos.')
+
+    def capture_source(self):
+        """Argumento para cv2.VideoCapture"""
+        if self.source_type == 'usb':
+            return int(self.url or 0)
+        if self.source_type == 'droidcam' and not self.url:
+            return f"http://{self.ip_address}:{self.port}/video"
+        return self.url
+
+    @property
+    def resolution(self):
+        return (self.width, self.height) if self.width and self.height else None
+
+
+class RecordingAnalysis(models.Model):
+    """
+    Re-análisis offline de una grabación con una versión del modelo
+    (comando reanalyze_recordings). La grabación se divide en tramos de
+    frames; `chunks_done` guarda los tramos ya escritos para poder retomar.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done', 'Terminado'),
+        ('failed', 'Con errores'),
+    )
+
+    path = models.CharField(verbose_name='Grabación', max_length=255)
+    model_version = models.CharField(verbose_name='Modelo', max_length=255)
+    fps = models.FloatField(default=20.0)
+    frame_count = models.PositiveIntegerField(default=0)
+    chunk_size = models.PositiveIntegerField(default=0)
+    chunks_done = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    detections_count = models.PositiveIntegerField(default=0)
+    alerts_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Re-análisis de grabación'
+        verbose_name_plural = 'Re-análisis de grabaciones'
+        ordering = ['-started_at']
+        constraints = [
+            UniqueConstraint(fields=['path', 'model_version'], name='recording_analysis_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} ({self.model_version})"
+
+    @property
+    def total_chunks(self):
+        if not self.chunk_size:
+            return 0
+        return -(-self.frame_count // self.chunk_size)
+
+    @property
+    def progress(self):
+        """Porcentaje de tramos terminados"""
+        total = self.total_chunks
+        return round(100 * len(self.chunks_done) / total, 1) if total else 0.0
+
+
+class RecordedDetection(models.Model):
+    """Detección del modelo en un frame de una grabación re-analizada"""
+    analysis = models.ForeignKey(RecordingAnalysis, on_delete=models.CASCADE, related_name='detections')
+    frame = models.PositiveIntegerField()
+    label = models.CharField(max_length=50)
+    confidence = models.FloatField()
+    x1 = models.FloatField()
+    y1 = models.FloatField()
+    x2 = models.FloatField()
+    y2 = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Detección grabada'
+        verbose_name_plural = 'Detecciones grabadas'
+        ordering = ['analysis', 'frame']
+        indexes = [
+            models.Index(fields=['analysis', 'frame'], name='recorded_detection_frame_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.label} {self.confidence:.2f} (frame {self.frame})"
+
+
+class AlertSnapshot(models.Model):
+    """
+    Captura de una alerta en MEDIA_ROOT, registrada al escribirla (droidcam.py)
+    o con `manage.py reconcile_snapshots`. Ubicar la imagen de una alerta es
+    una consulta por índice en lugar de recorrer media/alertas (ver snapshots.py).
+    """
+    path = models.CharField(max_length=255, unique=True)  # Relativa a MEDIA_ROOT (como Alert.video)
+    alert = models.ForeignKey(Alert, on_delete=models.SET_NULL, null=True, blank=True, related_name='snapshots')
+    camera = models.ForeignKey(Camera, on_delete=models.SET_NULL, null=True, blank=True, related_name='snapshots')
+    size = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)  # SHA-256 del archivo
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Captura de alerta'
+        verbose_name_plural = 'Capturas de alertas'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def url(self):
+        return f'{settings.MEDIA_URL}{self.path}'
+
 
 class Cargo(models.Model):
     # Nombre del cargo (ej. administrador, supervisor, obrero, etc.)
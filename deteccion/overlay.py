@@ -0,0 +1,96 @@
+# deteccion/overlay.py
+"""
+Dibujo liviano de anotaciones sobre los frames.
+
+Reemplaza a `result.plot()` de ultralytics: dibuja cajas y textos directo
+sobre el frame (sin copiarlo) y guarda cada texto ya rasterizado como un
+"sprite" (canal alfa + color), de modo que etiquetas repetidas como
+"Casco: OK" o los nombres de clase se dibujan copiando píxeles en lugar de
+volver a rasterizar la fuente en cada frame.
+"""
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Colores BGR por ID de clase (se repiten si hay más clases)
+CLASS_COLORS = (
+    (0, 255, 0),
+    (255, 128, 0),
+    (0, 200, 255),
+    (255, 0, 255),
+    (0, 128, 255),
+    (255, 255, 0),
+)
+
+
+class TextSprite:
+    """Texto rasterizado una vez con cv2.putText, listo para mezclar sobre el frame"""
+
+    def __init__(self, text, scale, color, thickness):
+        (ancho, alto), base = cv2.getTextSize(text, FONT, scale, thickness)
+        margen = 2 * thickness + 4  # Los trazos pueden salir un poco de getTextSize
+        lienzo = np.zeros((alto + base + 2 * margen, ancho + 2 * margen), dtype=np.uint8)
+        cv2.putText(lienzo, text, (margen, margen + alto), FONT, scale, 255, thickness, cv2.LINE_AA)
+
+        # Se guarda sólo el rectángulo con tinta y su posición respecto al origen de putText
+        filas, columnas = np.nonzero(lienzo)
+        if not len(filas):
+            # Texto vacío o sólo espacios: un píxel transparente (cv2.merge no acepta matrices vacías)
+            lienzo, self.dx, self.dy = np.zeros((1, 1), dtype=np.uint8), 0, 0
+        else:
+            lienzo = lienzo[filas.min():filas.max() + 1, columnas.min():columnas.max() + 1]
+            self.dx, self.dy = columnas.min() - margen, filas.min() - margen - alto
+        alfa = cv2.merge([lienzo] * 3)
+        # Mezcla precalculada: frame * (1 - alfa) + color * alfa, igual que el antialiasing de putText
+        self.inverse = 255 - alfa
+        self.premultiplied = cv2.multiply(alfa, np.full_like(alfa, color), scale=1 / 255)
+
+    def blit(self, frame, x, y):
+        """Dibuja con el origen (x, y) en la línea base, como cv2.putText"""
+        alto_s, ancho_s = self.inverse.shape[:2]
+        top, left = y + self.dy, x + self.dx
+        y1, x1 = max(top, 0), max(left, 0)
+        y2, x2 = min(top + alto_s, frame.shape[0]), min(left + ancho_s, frame.shape[1])
+        if y1 >= y2 or x1 >= x2:
+            return
+        recorte = (slice(y1 - top, y2 - top), slice(x1 - left, x2 - left))
+        region = frame[y1:y2, x1:x2]
+        cv2.add(cv2.multiply(region, self.inverse[recorte], scale=1 / 255), self.premultiplied[recorte], dst=region)
+
+
+class OverlayRenderer:
+    """Dibuja detecciones y textos sobre el frame, con caché de sprites de texto"""
+
+    def __init__(self, max_sprites=512):
+        self.max_sprites = max_sprites
+        self._sprites = {}
+
+    def text(self, frame, text, org, scale, color, thickness=2):
+        clave = (text, scale, tuple(color), thickness)
+        sprite = self._sprites.get(clave)
+        if sprite is None:
+            if len(self._sprites) >= self.max_sprites:
+                self._sprites.clear()  # Textos muy variables (p. ej. contadores): se reconstruye
+            sprite = self._sprites[clave] = TextSprite(text, scale, color, thickness)
+        sprite.blit(frame, int(org[0]), int(org[1]))
+        return frame
+
+    def draw_detections(self, frame, detections, tracks=(), color=None):
+        """
+        Cajas con clase y confianza (a un decimal, para que la etiqueta se repita
+        y salga de la caché); `tracks` agrega el ID de cada persona seguida.
+        Sin `color` se usa uno por clase.
+        """
+        cajas = detections.boxes.astype(int)
+        for (x1, y1, x2, y2), cls, conf in zip(cajas, detections.classes, detections.confidences):
+            tono = color or CLASS_COLORS[int(cls) % len(CLASS_COLORS)]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), tono, 2)
+            self.text(frame, f"{detections.names[int(cls)]} {conf:.1f}", (x1, max(y1 - 5, 12)), 0.5, tono, 1)
+        for track in tracks:
+            self.text(frame, f"#{track.track_id}", (track.box[0], track.box[1] + 20), 0.6, (0, 255, 255), 2)
+        return frame
+
+
+# Renderer compartido para los llamados sin estado (detections.draw_detections)
+default_renderer = OverlayRenderer()
@@ -0,0 +1,153 @@
+# deteccion/preload.py
+"""
+Precarga del modelo YOLO en el master de gunicorn (preload_app = True).
+
+Con varios workers, cada uno importaba torch y cargaba su propio modelo
+después del fork. Con la precarga, el master carga y calienta el modelo
+(la primera inferencia reserva los buffers de torch y fusiona Conv+BN)
+antes del fork, y los workers comparten esas páginas por copy-on-write.
+Para que el recolector de basura no las "ensucie" al escribir los
+contadores de referencias de los objetos del master, se llama a
+gc.freeze() justo antes del fork (hook when_ready de gunicorn.conf.py).
+
+ultralytics copia el modelo dentro de cada predictor (setup_model hace
+deepcopy), así que `load_model` no devuelve un YOLO nuevo sino un clon
+liviano del precargado que comparte su AutoBackend (los pesos ya
+fusionados) y tiene su propio estado por inferencia y su propio lock.
+
+`recommended_workers` calcula los workers según la memoria disponible
+(límite del cgroup si lo hay) y los núcleos; no importa Django para
+poder usarse desde gunicorn.conf.py. Por ahora gunicorn corre un solo
+worker: las cámaras y VideoProcessor viven en el proceso web.
+"""
+import copy
+import gc
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_preloaded = {}  # ruta absoluta -> YOLO precargado y calentado
+
+
+def _cgroup_memory_limit():
+    """Límite de memoria del contenedor en bytes (None si no hay límite)"""
+    for ruta in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(ruta) as archivo:
+                valor = archivo.read().strip()
+        except OSError:
+            continue
+        if valor.isdigit() and int(valor) < 1 << 60:  # cgroup v1 usa un número enorme como "sin límite"
+            return int(valor)
+    return None
+
+
+def _cgroup_cpus():
+    """Núcleos disponibles según la cuota del cgroup y la afinidad del proceso"""
+    try:
+        nucleos = len(os.sched_getaffinity(0))
+    except AttributeError:
+        nucleos = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as archivo:
+            cuota, periodo = archivo.read().split()
+        if cuota != 'max':
+            nucleos = min(nucleos, max(1, int(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return nucleos
+
+
+def available_memory_mb():
+    """Memoria utilizable por la aplicación: el límite del cgroup o la memoria total"""
+    limite = _cgroup_memory_limit()
+    if limite is None:
+        import psutil
+        limite = psutil.virtual_memory().total
+    return limite / 2 ** 20
+
+
+def recommended_workers(shared_mb=350, per_worker_mb=120, reserve_mb=50, max_workers=None):
+    """
+    Workers que caben en memoria: el master con el modelo (`shared_mb`, que
+    los workers comparten) más `per_worker_mb` privados por worker, dejando
+    `reserve_mb` libres; nunca más de 2 × núcleos + 1 ni menos de 1.
+    WEB_CONCURRENCY, si está definida, tiene prioridad.
+    """
+    if os.environ.get('WEB_CONCURRENCY'):
+        return max(1, int(os.environ['WEB_CONCURRENCY']))
+    por_memoria = int((available_memory_mb() - shared_mb - reserve_mb) // per_worker_mb)
+    workers = max(1, min(por_memoria, 2 * _cgroup_cpus() + 1))
+    return min(workers, max_workers) if max_workers else workers
+
+
+def preload_models(paths=None, imgsz=320):
+    """Carga y calienta cada modelo (por defecto, settings.PRELOAD_MODELS); devuelve las rutas cargadas"""
+    from django.conf import settings
+    import numpy as np
+    from ultralytics import YOLO
+
+    cargadas = []
+    for ruta in paths if paths is not None else getattr(settings, 'PRELOAD_MODELS', [settings.MODEL_PATH]):
+        ruta = os.path.abspath(ruta)
+        if ruta in _preloaded:
+            cargadas.append(ruta)
+            continue
+        if not os.path.exists(ruta):
+            logger.warning(f"⚠️ Modelo a precargar no encontrado: {ruta}")
+            continue
+        modelo = YOLO(ruta)
+        # Primera inferencia: crea el predictor, fusiona capas y reserva los buffers de torch
+        modelo.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, conf=0.25, verbose=False)
+        _preloaded[ruta] = modelo
+        cargadas.append(ruta)
+        logger.info(f"✅ Modelo precargado: {ruta}")
+    return cargadas
+
+
+def _clone(base):
+    """YOLO que comparte pesos y AutoBackend con `base`, con estado propio por inferencia"""
+    modelo = copy.copy(base)
+    modelo.overrides = dict(base.overrides)
+    modelo.callbacks = {evento: list(funciones) for evento, funciones in base.callbacks.items()}
+    if base.predictor is not None:
+        predictor = copy.copy(base.predictor)
+        predictor.callbacks = modelo.callbacks
+        predictor._lock = threading.Lock()
+        predictor.vid_writer = {}
+        predictor.windows = []
+        predictor.dataset = predictor.batch = predictor.results = None
+        modelo.predictor = predictor
+    return modelo
+
+
+def load_model(path):
+    """Modelo YOLO para `path`: clon del precargado si existe, si no una carga normal"""
+    base = _preloaded.get(os.path.abspath(path))
+    if base is not None:
+        return _clone(base)
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+def freeze_heap():
+    """Mueve los objetos actuales a la generación permanente del GC (llamar justo antes del fork)"""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def memory_breakdown(pid):
+    """Memoria de un proceso en MB: rss, pss, privada (uss) y compartida (rss - uss)"""
+    import psutil
+    info = psutil.Process(pid).memory_full_info()
+    mb = 2 ** 20
+    return {
+        'pid': pid,
+        'rss_mb': round(info.rss / mb, 1),
+        'pss_mb': round(getattr(info, 'pss', 0) / mb, 1),
+        'private_mb': round(info.uss / mb, 1),
+        'shared_mb': round((info.rss - info.uss) / mb, 1),
+    }
@@ -0,0 +1,270 @@
+# deteccion/reanalysis.py
+"""
+Re-análisis offline de las grabaciones (grabaciones/*.avi) con el modelo
+actual, por ejemplo después de re-entrenarlo.
+
+Cada grabación se divide en tramos de frames que se reparten en un
+ProcessPoolExecutor; cada proceso carga el modelo una sola vez (initializer)
+y devuelve las detecciones y alertas de su tramo. El proceso principal
+escribe cada tramo en una transacción (bulk_create de RecordedDetection y
+Alert) y lo anota en RecordingAnalysis.chunks_done: si el proceso se
+interrumpe, la siguiente ejecución sólo procesa los tramos que faltan.
+
+Las alertas se derivan igual que en vivo (seguimiento por persona, retraso
+de 3 segundos y cooldown), usando el tiempo del video. El seguimiento
+empieza de cero en cada tramo. La hora de cada alerta es la de la
+grabación (inicio tomado del nombre recording_YYYYmmdd_HHMMSS.avi o, si no
+coincide, de la fecha del archivo).
+"""
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .detections import Detections
+from .droidcam import REQUIRED_ITEMS
+from .models import (RECORDINGS_PREFIX, Alert, AlertDailySummary, RecordedDetection, RecordingAnalysis,
+                     missing_mask_from_text)
+from .rollup import rebuild_daily_summary
+from .tracking import PersonTracker, track_people
+from .caching import invalidate
+from .trends import invalidate_alert_trends
+
+logger = logging.getLogger(__name__)
+
+RECORDING_NAME = re.compile(r'recording_(\d{8}_\d{6})')
+
+# Modelo del proceso worker (uno por proceso, cargado en _init_worker)
+_worker_model = None
+
+
+def _init_worker(model_path, threads):
+    global _worker_model
+    import torch
+    from ultralytics import YOLO
+
+    # Varios procesos en paralelo: cada uno con pocos hilos para no competir por los núcleos
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    _worker_model = YOLO(model_path)
+
+
+def analyze_chunk(path, index, start, end, fps, conf=0.25, imgsz=640, stride=1, batch=8,
+                  alert_delay=3.0, alert_cooldown=30.0):
+    """
+    Corre en un proceso worker. Analiza los frames [start, end) de la
+    grabación y devuelve (index, detecciones, alertas): las detecciones como
+    tuplas (frame, clase, confianza, x1, y1, x2, y2) y las alertas como
+    (frame, [elementos faltantes]).
+    """
+    tracker = PersonTracker()
+    detecciones, alertas = [], []
+
+    def procesar(lote):
+        results = _worker_model.predict([imagen for _, imagen in lote], conf=conf, imgsz=imgsz, verbose=False)
+        for (n, _), result in zip(lote, results):
+            detections = Detections.from_result(result)
+            for box, cls, confianza in zip(detections.boxes.tolist(), detections.classes, detections.confidences):
+                detecciones.append((n, detections.names[int(cls)], float(confianza), *box))
+            ahora = n / fps
+            for track, cumplimiento in track_people(tracker, detections, list(REQUIRED_ITEMS), ahora):
+                faltantes = [label for label, ok in zip(REQUIRED_ITEMS.values(), cumplimiento) if not ok]
+                track.observe(faltantes, ahora)
+                if track.alert_due(ahora, alert_delay, alert_cooldown):
+                    alertas.append((n, faltantes))
+                    track.mark_alerted(ahora)
+
+    video = cv2.VideoCapture(path)
+    try:
+        video.set(cv2.CAP_PROP_POS_FRAMES, start)
+        lote = []
+        for n in range(start, end):
+            if not video.grab():
+                break
+            if (n - start) % stride:
+                continue  # Frame salteado: no se decodifica
+            ok, imagen = video.retrieve()
+            if ok:
+                lote.append((n, imagen))
+            if len(lote) >= batch:
+                procesar(lote)
+                lote = []
+        if lote:
+            procesar(lote)
+    finally:
+        video.release()
+    return index, detecciones, alertas
+
+
+def model_version(model_path):
+    """Identifica el modelo por nombre y fecha del archivo (re-entrenar = nueva versión)"""
+    modificado = datetime.fromtimestamp(os.path.getmtime(model_path))
+    return f"{os.path.basename(model_path)}@{modificado:%Y%m%d%H%M%S}"
+
+
+def recording_start(path, duration):
+    """Hora de inicio de la grabación (aware)"""
+    coincidencia = RECORDING_NAME.search(os.path.basename(path))
+    if coincidencia:
+        inicio = datetime.strptime(coincidencia.group(1), '%Y%m%d_%H%M%S')
+    else:
+        inicio = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+    return timezone.make_aware(inicio)
+
+
+def recording_alert_video(path):
+    """
+    Alert.video de una grabación: 'grabaciones/<ruta relativa a RECORDINGS_ROOT>'
+    como en camera.py, servida por recording_file; '' si está fuera de RECORDINGS_ROOT
+    """
+    relativa = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.RECORDINGS_ROOT))
+    if relativa == os.pardir or relativa.startswith(os.pardir + os.sep):
+        return ''
+    return RECORDINGS_PREFIX + relativa.replace(os.sep, '/')
+
+
+class RecordingReanalyzer:
+    """Reparte los tramos pendientes de las grabaciones entre procesos y guarda los resultados"""
+
+    def __init__(self, model_path, workers=None, chunk_seconds=60, conf=0.25, imgsz=640, stride=1,
+                 batch=8, log=None):
+        self.model_path = model_path
+        self.version = model_version(model_path)
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.chunk_seconds = chunk_seconds
+        self.options = {'conf': conf, 'imgsz': imgsz, 'stride': stride, 'batch': batch}
+        self.log = log or logger.info
+        self._alert_dates = set()
+
+    def prepare(self, path, force=False):
+        """RecordingAnalysis de la grabación para esta versión del modelo (None si no se puede leer)"""
+        video = cv2.VideoCapture(path)
+        try:
+            if not video.isOpened():
+                self.log(f"⚠️ No se pudo abrir {path}")
+                return None
+            fps = video.get(cv2.CAP_PROP_FPS) or 20.0
+            frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            video.release()
+
+        analysis, _ = RecordingAnalysis.objects.get_or_create(
+            path=path, model_version=self.version,
+            defaults={'fps': fps, 'frame_count': frames, 'chunk_size': max(1, round(fps * self.chunk_seconds))},
+        )
+        if force and (analysis.chunks_done or analysis.status != 'pending'):
+            self._discard_results(analysis)
+        return analysis
+
+    def _discard_results(self, analysis):
+        alertas = Alert.objects.filter(analysis=analysis)
+        for hora in alertas.values_list('timestamp', flat=True):
+            self._alert_dates.add(timezone.localdate(hora))
+            invalidate_alert_trends(hora)
+        with transaction.atomic():
+            alertas.delete()
+            analysis.detections.all().delete()
+            analysis.chunks_done = []
+            analysis.detections_count = analysis.alerts_count = 0
+            analysis.status = 'pending'
+            analysis.last_error = ''
+            analysis.finished_at = None
+            analysis.save()
+        invalidate('alerts')
+
+    def pending_chunks(self, analysis):
+        hechos = set(analysis.chunks_done)
+        for index in range(analysis.total_chunks):
+            if index not in hechos:
+                inicio = index * analysis.chunk_size
+                yield index, inicio, min(inicio + analysis.chunk_size, analysis.frame_count)
+
+    def run(self, paths, force=False):
+        """Procesa las grabaciones; devuelve la lista de RecordingAnalysis"""
+        analyses = [a for a in (self.prepare(path, force) for path in paths) if a is not None]
+        tareas = [(a, chunk) for a in analyses for chunk in self.pending_chunks(a)]
+        for analysis in analyses:
+            if analysis.status == 'done':
+                continue
+            analysis.status = 'running' if any(a is analysis for a, _ in tareas) else 'done'
+            analysis.started_at = analysis.started_at or timezone.now()
+            analysis.save(update_fields=['status', 'started_at'])
+        self.log(f"🎞️ {len(analyses)} grabaciones, {len(tareas)} tramos pendientes, {self.workers} procesos")
+
+        if tareas:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.model_path, self.threads)) as pool:
+                futuros = {
+                    pool.submit(analyze_chunk, a.path, index, inicio, fin, a.fps, **self.options): a
+                    for a, (index, inicio, fin) in tareas
+                }
+                for futuro in as_completed(futuros):
+                    analysis = futuros[futuro]
+                    try:
+                        index, detecciones, alertas = futuro.result()
+                    except Exception as e:
+                        logger.error(f"❌ Tramo de {analysis.path}: {e}")
+                        analysis.last_error = str(e)
+                        analysis.save(update_fields=['last_error'])
+                        continue
+                    self._save_chunk(analysis, index, detecciones, alertas)
+                    self.log(f"✅ {os.path.basename(analysis.path)} tramo {index + 1}/{analysis.total_chunks} "
+                             f"({len(detecciones)} detecciones, {len(alertas)} alertas) - {analysis.progress}%")
+
+        for analysis in analyses:
+            if analysis.status == 'running':
+                analysis.status = 'done' if len(analysis.chunks_done) == analysis.total_chunks else 'failed'
+                analysis.finished_at = timezone.now()
+                analysis.save(update_fields=['status', 'finished_at'])
+        self._refresh_rollup()
+        return analyses
+
+    def _save_chunk(self, analysis, index, detecciones, alertas):
+        """Escribe un tramo completo en una transacción y lo marca como hecho"""
+        inicio = recording_start(analysis.path, analysis.frame_count / analysis.fps)
+        with transaction.atomic():
+            RecordedDetection.objects.bulk_create(
+                [RecordedDetection(analysis=analysis, frame=n, label=label, confidence=confianza,
+                                   x1=x1, y1=y1, x2=x2, y2=y2)
+                 for n, label, confianza, x1, y1, x2, y2 in detecciones],
+                batch_size=1000,
+            )
+            nuevas = []
+            for n, faltantes in alertas:
+                missing = ', '.join(faltantes)
+                nuevas.append(Alert(message=f"Persona sin {missing}", missing=missing,
+                                    missing_mask=missing_mask_from_text(missing), level='high',
+                                    video=recording_alert_video(analysis.path), analysis=analysis))
+            creadas = Alert.objects.bulk_create(nuevas)
+            if creadas:
+                # auto_now_add pisa la hora en bulk_create: se corrige con un solo UPDATE
+                horas = {alerta.pk: inicio + timedelta(seconds=n / analysis.fps)
+                         for alerta, (n, _) in zip(creadas, alertas)}
+                Alert.objects.filter(pk__in=horas).update(timestamp=Case(
+                    *[When(pk=pk, then=Value(hora)) for pk, hora in horas.items()],
+                    output_field=DateTimeField(),
+                ))
+                for hora in horas.values():
+                    self._alert_dates.add(timezone.localdate(hora))
+                    invalidate_alert_trends(hora)
+
+            analysis.chunks_done = sorted(set(analysis.chunks_done) | {index})
+            analysis.detections_count += len(detecciones)
+            analysis.alerts_count += len(creadas)
+            analysis.save(update_fields=['chunks_done', 'detections_count', 'alerts_count'])
+        if creadas:
+            invalidate('alerts')
+
+    def _refresh_rollup(self):
+        """bulk_create no pasa por Alert.save(): se recalcula el resumen de los días tocados"""
+        if self._alert_dates:
+            rebuild_daily_summary(Alert, AlertDailySummary, start=min(self._alert_dates), end=max(self._alert_dates))
+            self._alert_dates.clear()
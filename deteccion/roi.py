@@ -0,0 +1,76 @@
+# deteccion/roi.py
+"""
+Zona de interés (ROI) de cada cámara.
+
+El polígono se guarda en Camera.roi con coordenadas relativas (0 a 1) al
+ancho y alto del frame, así no depende de la resolución. Antes de inferir se
+recorta el frame al rectángulo que contiene el polígono, y después se
+descartan las personas cuyo punto de apoyo (centro inferior de la caja) cae
+fuera del polígono. El EPP no se filtra: un casco puede quedar fuera de una
+zona dibujada sobre el piso; si no pertenece a ninguna persona de la zona,
+la asociación (association.py) simplemente lo ignora.
+"""
+import cv2
+import numpy as np
+
+from .association import class_ids
+from .detections import Detections
+from .tracking import PERSON_CLASSES
+
+
+def points_in_polygon(points, polygon):
+    """Máscara booleana de los puntos (N×2) dentro del polígono (V×2), por paridad de cruces"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    cruza = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cruce = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(cruza & (x < x_cruce), axis=1) % 2 == 1
+
+
+class RegionOfInterest:
+    """Polígono relativo de una cámara, con su versión en píxeles por tamaño de frame"""
+
+    def __init__(self, polygon):
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self._size = None
+
+    @classmethod
+    def for_camera(cls, camera):
+        """ROI de un registro Camera, o None si no tiene (todo el frame)"""
+        if camera is None or not camera.roi:
+            return None
+        return cls(camera.roi)
+
+    def _pixels(self, ancho, alto):
+        if self._size != (ancho, alto):
+            self._size = (ancho, alto)
+            self.pixel_polygon = self.polygon * np.array([ancho, alto], dtype=np.float32)
+            x1, y1 = np.floor(self.pixel_polygon.min(axis=0)).astype(int)
+            x2, y2 = np.ceil(self.pixel_polygon.max(axis=0)).astype(int)
+            self.rect = (max(x1, 0), max(y1, 0), min(x2, ancho), min(y2, alto))
+        return self.pixel_polygon, self.rect
+
+    def crop(self, frame):
+        """Recorta el frame al rectángulo de la ROI; devuelve (recorte, (x, y) del origen)"""
+        _, (x1, y1, x2, y2) = self._pixels(frame.shape[1], frame.shape[0])
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def filter(self, detections, frame_size):
+        """Quita las personas cuyo punto de apoyo queda fuera del polígono"""
+        poligono, _ = self._pixels(*frame_size)
+        es_persona = np.isin(detections.classes, class_ids(detections.names, PERSON_CLASSES))
+        if not es_persona.any():
+            return detections
+        apoyo = np.stack([(detections.boxes[:, 0] + detections.boxes[:, 2]) / 2, detections.boxes[:, 3]], axis=1)
+        conservar = ~es_persona | points_in_polygon(apoyo, poligono)
+        return Detections(detections.boxes[conservar], detections.classes[conservar],
+                          detections.confidences[conservar], detections.names)
+
+    def draw(self, frame, color=(255, 128, 0)):
+        poligono, _ = self._pixels(frame.shape[1], frame.shape[0])
+        cv2.polylines(frame, [poligono.astype(np.int32)], True, color, 2)
+        return frame
@@ -0,0 +1,61 @@
+# deteccion/rollup.py
+"""
+Reconstrucción del resumen diario de alertas (AlertDailySummary) a partir
+de la tabla Alert (comando backfill_alert_rollup, re-análisis, loadtest).
+Las migraciones 0005/0006 tienen su propia copia congelada de esta lógica.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.db.models.lookups import GreaterThan
+
+from .models import EPP_ITEMS, EPP_ITEM_BITS
+
+
+def missing_item_filter(clave):
+    """Condición 'falta el elemento `clave`' sobre Alert.missing_mask"""
+    return GreaterThan(F('missing_mask').bitand(EPP_ITEM_BITS[clave]), 0)
+
+
+def daily_count_expressions():
+    """Agregados equivalentes a las columnas de AlertDailySummary"""
+    expresiones = {
+        'total': Count('id'),
+        'resolved': Count('id', filter=Q(resolved=True)),
+    }
+    for nivel in ('high', 'medium', 'low', 'positive'):
+        expresiones[f'level_{nivel}'] = Count('id', filter=Q(level=nivel))
+    for estado in ('pending', 'resolved', 'false_positive', 'non_compliant', 'system_error'):
+        expresiones[f'status_{estado}'] = Count('id', filter=Q(resolution_status=estado))
+    for clave, _ in EPP_ITEMS:
+        faltante = Q(missing_item_filter(clave))
+        expresiones[f'missing_{clave}'] = Count('id', filter=faltante)
+        expresiones[f'non_compliant_{clave}'] = Count(
+            'id', filter=faltante & Q(resolution_status='non_compliant')
+        )
+    return expresiones
+
+
+def rebuild_daily_summary(alert_model, summary_model, start=None, end=None):
+    """
+    Recalcula las filas del resumen entre `start` y `end` (fechas locales,
+    inclusivas; None = sin límite). Devuelve la cantidad de días escritos.
+    """
+    alertas = alert_model.objects.annotate(date=TruncDate('timestamp'))
+    resumenes = summary_model.objects.all()
+    if start:
+        alertas = alertas.filter(date__gte=start)
+        resumenes = resumenes.filter(date__gte=start)
+    if end:
+        alertas = alertas.filter(date__lte=end)
+        resumenes = resumenes.filter(date__lte=end)
+
+    filas = list(alertas.order_by().values('date').annotate(**daily_count_expressions()))
+
+    with transaction.atomic():
+        resumenes.delete()
+        summary_model.objects.bulk_create(
+            [summary_model(**fila) for fila in filas],
+            batch_size=500,
+        )
+    return len(filas)
@@ -0,0 +1,109 @@
+# deteccion/snapshots.py
+"""
+Registro de las capturas de alertas (AlertSnapshot).
+
+ver_incumplimiento buscaba la imagen con os.path.exists sobre una ruta
+relativa al directorio de trabajo y, si no estaba, listaba media/alertas
+entera buscando el id de la alerta en los nombres: segundos por clic con
+100k capturas. Ahora la cámara registra cada captura al escribirla (ruta,
+tamaño, dimensiones, SHA-256 y cámara) y la vista la encuentra con una
+consulta por índice (comprobando que el archivo siga en el storage; si
+no, borra el registro). `manage.py reconcile_snapshots` registra las
+capturas anteriores o escritas por otros medios y detecta las que ya no existen.
+"""
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = 'alertas'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def record_snapshot(path, datos, ancho, alto, alert=None, camera=None):
+    """Registra la captura recién escrita en `path` con el contenido `datos` (bytes codificados)"""
+    from .models import AlertSnapshot
+
+    snapshot, _ = AlertSnapshot.objects.update_or_create(path=path, defaults={
+        'alert': alert,
+        'camera': camera,
+        'size': len(datos),
+        'width': ancho,
+        'height': alto,
+        'checksum': hashlib.sha256(datos).hexdigest(),
+    })
+    return snapshot
+
+
+def file_checksum(ruta, bloque=1 << 20):
+    digest = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for parte in iter(lambda: archivo.read(bloque), b''):
+            digest.update(parte)
+    return digest.hexdigest()
+
+
+def image_size(ruta):
+    """(ancho, alto) leyendo sólo la cabecera de la imagen; (0, 0) si no se puede"""
+    from PIL import Image
+
+    try:
+        with Image.open(ruta) as imagen:
+            return imagen.size
+    except OSError:
+        return 0, 0
+
+
+def scan_snapshot_files():
+    """Capturas en MEDIA_ROOT/alertas (sin las miniaturas): {ruta relativa: os.stat_result}"""
+    carpeta = os.path.join(settings.MEDIA_ROOT, SNAPSHOT_DIR)
+    if not os.path.isdir(carpeta):
+        return {}
+    with os.scandir(carpeta) as entradas:
+        return {
+            f'{SNAPSHOT_DIR}/{entrada.name}': entrada.stat()
+            for entrada in entradas
+            if entrada.is_file() and entrada.name.lower().endswith(IMAGE_EXTENSIONS)
+        }
+
+
+def snapshot_from_file(path, stat, alert_id=None, checksum=True):
+    """AlertSnapshot (sin guardar) de un archivo existente"""
+    from .models import AlertSnapshot
+
+    ruta = os.path.join(settings.MEDIA_ROOT, path)
+    ancho, alto = image_size(ruta)
+    return AlertSnapshot(
+        path=path, alert_id=alert_id, size=stat.st_size, width=ancho, height=alto,
+        checksum=file_checksum(ruta) if checksum else '',
+        created_at=datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc),
+    )
+
+
+def _existing(snapshot):
+    """La captura si su archivo existe; si no, borra el registro (quedó obsoleto) y devuelve None"""
+    if snapshot is None or default_storage.exists(snapshot.path):
+        return snapshot
+    logger.warning(f"⚠️ Captura registrada sin archivo, se borra el registro: {snapshot.path}")
+    snapshot.delete()
+    return None
+
+
+def find_alert_snapshot(alert):
+    """Captura registrada (y existente) de la alerta: por la ruta guardada en Alert.video o por la alerta"""
+    from .models import AlertSnapshot
+
+    if alert.video:
+        snapshot = _existing(AlertSnapshot.objects.filter(path=alert.video.name).first())
+        if snapshot is not None:
+            return snapshot
+    # La más reciente registrada para la alerta (p. ej. si cambió Alert.video)
+    for snapshot in AlertSnapshot.objects.filter(alert=alert):
+        if _existing(snapshot) is not None:
+            return snapshot
+    return None
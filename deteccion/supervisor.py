@@ -0,0 +1,262 @@
+# deteccion/supervisor.py
+"""
+Supervisor de cámaras: un hilo de captura e inferencia por cada Camera
+habilitada en la base de datos.
+
+Cada `CameraWorker` abre su fuente (DroidCamera.from_camera), procesa frames
+al ritmo de `fps_target` y guarda el último frame para los clientes del
+stream (cada nivel de calidad se codifica una vez, ver encoding.py). Si la cámara no responde, la propia fuente reconecta en segundo
+plano con espera exponencial (mientras tanto publica un frame
+"Reconectando..."). Si la fuente falla de otra forma (excepción o demasiados
+frames nulos) el worker la recrea, también con espera exponencial desde
+`restart_delay` segundos, hasta `max_restarts` veces (None = siempre).
+`CameraSupervisor.sync()` compara los workers con la tabla Camera: arranca
+las cámaras nuevas, detiene las deshabilitadas o borradas y reinicia las
+que cambiaron de configuración. Agregar capacidad = agregar filas.
+
+Los clientes del stream se registran con `subscribe()`; mientras ninguno
+mire la cámara la fuente sigue detectando y generando alertas, pero no
+dibuja ni codifica JPEG.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from .dbconn import thread_connections
+from .droidcam import RECONNECT_MAX_DELAY, DroidCamera, backoff_delay
+from .encoding import DEFAULT_TIER
+from .memory import get_memory_watchdog
+from .models import Camera
+
+logger = logging.getLogger(__name__)
+
+
+class CameraWorker:
+    """Hilo de una cámara con su estado de salud"""
+
+    def __init__(self, camera, camera_factory=None, max_restarts=None, restart_delay=5.0, max_null_frames=30):
+        self.camera = camera
+        self.camera_factory = camera_factory or DroidCamera.from_camera
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.max_null_frames = max_null_frames
+        self._failures = 0  # Fallos seguidos, para la espera exponencial
+
+        self.state = 'starting'
+        self.restarts = 0
+        self.frames = 0
+        self.errors = 0
+        self.fps = 0.0
+        self.last_frame_at = None
+        self.last_error = None
+        self.viewers = 0
+
+        self._source = None
+        self._viewers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._frame_ready = threading.Condition()
+        self._latest_frame = None
+        self._frame_seq = 0
+        self._thread = threading.Thread(target=self._run, name=f'camera-{camera.pk}', daemon=True)
+
+    @property
+    def version(self):
+        """Cambia cuando se edita la cámara (para reiniciar el worker)"""
+        return self.camera.updated_at
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self.state = 'stopped'
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    @contextmanager
+    def subscribe(self):
+        """Registra a un espectador del stream mientras dure el bloque"""
+        with self._viewers_lock:
+            self.viewers += 1
+        try:
+            yield self
+        finally:
+            with self._viewers_lock:
+                self.viewers -= 1
+
+    def _run(self):
+        with thread_connections():  # La conexión del hilo (alertas) se cierra al terminar
+            self._run_until_stopped()
+
+    def _run_until_stopped(self):
+        while not self._stop.is_set():
+            try:
+                self._capture_loop()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"❌ Cámara '{self.camera.name}': {e}")
+            finally:
+                if self._source is not None:
+                    self._source.stop()
+                    self._source = None
+
+            if self._stop.is_set():
+                break
+            self.restarts += 1
+            if self.max_restarts is not None and self.restarts > self.max_restarts:
+                self.state = 'failed'
+                logger.error(f"🛑 Cámara '{self.camera.name}' detenida tras {self.max_restarts} reinicios")
+                return
+            self.state = 'restarting'
+            self._failures += 1
+            espera = backoff_delay(self._failures, base=self.restart_delay, maximum=RECONNECT_MAX_DELAY * 4)
+            logger.info(f"🔄 Reiniciando cámara '{self.camera.name}' en {espera:.1f}s (reinicio #{self.restarts})")
+            self._stop.wait(espera)
+
+    def _capture_loop(self):
+        self.state = 'starting'
+        self._source = self.camera_factory(self.camera)
+        if hasattr(self._source, 'imgsz'):
+            get_memory_watchdog().register_source(self._source)  # Baja su imgsz si falta memoria
+        if self._source.start():
+            logger.info(f"✅ Cámara '{self.camera.name}' en ejecución")
+        else:
+            # No se recrea la fuente (recargaría el modelo): get_frame reconecta en segundo plano
+            logger.warning(f"⚠️ Cámara '{self.camera.name}' sin conexión, reconectando en segundo plano")
+        self.state = 'running'
+
+        intervalo = 1.0 / max(self.camera.fps_target, 1)
+        nulos = 0
+        while not self._stop.is_set():
+            inicio = time.monotonic()
+            self._source.viewers = self.viewers
+            frame = self._source.read_frame()
+            if frame is None:
+                nulos += 1
+                if nulos >= self.max_null_frames:
+                    raise RuntimeError(f'{nulos} frames nulos consecutivos')
+            else:
+                nulos = 0
+                self._failures = 0
+                self._publish(frame)
+            self._stop.wait(max(0.0, intervalo - (time.monotonic() - inicio)))
+
+    def _publish(self, frame):
+        """Actualiza las estadísticas; un frame vacío (sin espectadores) no se publica"""
+        ahora = time.monotonic()
+        if self.last_frame_at is not None:
+            # Media móvil exponencial de los FPS reales
+            instantaneo = 1.0 / max(ahora - self.last_frame_at, 1e-6)
+            self.fps = instantaneo if not self.fps else 0.9 * self.fps + 0.1 * instantaneo
+        self.last_frame_at = ahora
+        self.frames += 1
+        if not frame:
+            return
+        with self._frame_ready:
+            self._latest_frame = frame
+            self._frame_seq += 1
+            self._frame_ready.notify_all()
+
+    def wait_frame(self, last_seq=0, timeout=5.0, tier=DEFAULT_TIER):
+        """Espera un frame más nuevo que `last_seq`; devuelve (seq, jpeg del nivel) o (last_seq, None)"""
+        with self._frame_ready:
+            self._frame_ready.wait_for(lambda: self._frame_seq != last_seq or self._stop.is_set(), timeout)
+            if self._frame_seq == last_seq:
+                return last_seq, None
+            seq, frame = self._frame_seq, self._latest_frame
+        # Se codifica fuera del lock; los demás clientes del mismo nivel reutilizan los bytes
+        return seq, frame.jpeg(tier)
+
+    def health(self):
+        edad = time.monotonic() - self.last_frame_at if self.last_frame_at is not None else None
+        return {
+            'id': self.camera.pk,
+            'name': self.camera.name,
+            'state': self.state,
+            'viewers': self.viewers,
+            'fps': round(self.fps, 1),
+            'fps_target': self.camera.fps_target,
+            'frames': self.frames,
+            'errors': self.errors,
+            'restarts': self.restarts,
+            'last_frame_age': round(edad, 1) if edad is not None else None,
+            'last_error': self.last_error,
+            'source': self._source.health() if self._source is not None and hasattr(self._source, 'health') else None,
+        }
+
+
+class CameraSupervisor:
+    """Mantiene un CameraWorker por cada cámara habilitada"""
+
+    def __init__(self, camera_factory=None, **worker_options):
+        self.camera_factory = camera_factory
+        self.worker_options = worker_options
+        self.workers = {}
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Sincroniza los workers con la tabla Camera"""
+        camaras = {c.pk: c for c in Camera.objects.filter(enabled=True)}
+        with self._lock:
+            for pk, worker in list(self.workers.items()):
+                camara = camaras.get(pk)
+                if camara is None or camara.updated_at != worker.version:
+                    logger.info(f"🛑 Deteniendo cámara '{worker.camera.name}'")
+                    worker.stop()
+                    del self.workers[pk]
+            for pk, camara in camaras.items():
+                if pk not in self.workers:
+                    logger.info(f"🎥 Iniciando cámara '{camara.name}'")
+                    self.workers[pk] = CameraWorker(camara, self.camera_factory, **self.worker_options).start()
+        return self
+
+    def get(self, camera_id):
+        return self.workers.get(camera_id)
+
+    def health(self):
+        return [worker.health() for worker in list(self.workers.values())]
+
+    def stop_all(self):
+        with self._lock:
+            for worker in self.workers.values():
+                worker.stop()
+            self.workers = {}
+
+
+# Singleton del supervisor (igual que el procesador de video en views.py)
+camera_supervisor = None
+camera_supervisor_lock = threading.Lock()
+
+
+def get_camera_supervisor():
+    """Obtiene o crea el supervisor de cámaras y lo sincroniza la primera vez"""
+    global camera_supervisor
+    with camera_supervisor_lock:
+        if camera_supervisor is None:
+            camera_supervisor = CameraSupervisor().sync()
+        return camera_supervisor
+
+
+def camera_health():
+    """
+    Salud de las cámaras sin arrancar ni detener workers: las habilitadas que
+    no corren en este proceso aparecen como 'not_running'
+    """
+    supervisor = camera_supervisor
+    estados = {h['id']: h for h in supervisor.health()} if supervisor is not None else {}
+    for camara in Camera.objects.filter(enabled=True).only('pk', 'name', 'fps_target'):
+        estados.setdefault(camara.pk, {
+            'id': camara.pk,
+            'name': camara.name,
+            'state': 'not_running',
+            'fps_target': camara.fps_target,
+        })
+    return [estados[pk] for pk in sorted(estados)]
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .caching import cached_value, invalidate, namespace_versions
+from .media import parse_range
+from .models import Alert, AlertDailySummary, User
+from .rollup import rebuild_daily_summary
+
+
+class ParseRangeTests(TestCase):
+    def test_sin_rango_o_mal_formado(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('', 100))
+        self.assertIsNone(parse_range('bytes=-', 100))
+        self.assertIsNone(parse_range('items=0-10', 100))
+        # Varios rangos: se ignoran (archivo completo)
+        self.assertIsNone(parse_range('bytes=0-10,20-30', 100))
+
+    def test_rango_cerrado_y_abierto(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        # El fin se recorta al tamaño del archivo
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+
+    def test_rango_sufijo(self):
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        # Sufijo mayor que el archivo: el archivo completo
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_rango_insatisfacible(self):
+        for cabecera in ('bytes=100-', 'bytes=150-200', 'bytes=20-10', 'bytes=-0'):
+            with self.subTest(cabecera=cabecera), self.assertRaises(ValueError):
+                parse_range(cabecera, 100)
+
+
+class ServeFileTests(TestCase):
+    CONTENIDO = bytes(range(256)) * 4  # 1024 bytes
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='media', email='media@example.com', password='x')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, 'alertas'))
+        with open(os.path.join(self.media_root, 'alertas', 'captura.bin'), 'wb') as archivo:
+            archivo.write(self.CONTENIDO)
+        ajustes = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_REDIRECT='',
+                                    ALLOWED_HOSTS=['testserver'])
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client.force_login(self.usuario)
+        self.url = reverse('deteccion:media_file', args=['alertas/captura.bin'])
+
+    def test_requiere_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_archivo_completo(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(b''.join(respuesta.streaming_content), self.CONTENIDO)
+        self.assertEqual(respuesta['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', respuesta)
+
+    def test_rango_206(self):
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(respuesta['Content-Length'], '10')
+        self.assertEqual(b''.join(respuesta.streaming_content), self.CONTENIDO[10:20])
+
+    def test_rango_sufijo_206(self):
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(b''.join(respuesta.streaming_content), self.CONTENIDO[-4:])
+
+    def test_rango_fuera_del_archivo_416(self):
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(respuesta.status_code, 416)
+        self.assertEqual(respuesta['Content-Range'], 'bytes */1024')
+
+    def test_if_none_match_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_if_modified_since_304(self):
+        ultima = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+
+    def test_if_range_con_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        vigente = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(vigente.status_code, 206)
+        # Otro ETag: el archivo cambió, se entrega completo
+        cambiado = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(cambiado.status_code, 200)
+        self.assertEqual(b''.join(cambiado.streaming_content), self.CONTENIDO)
+
+    def test_if_range_con_fecha(self):
+        mtime = os.path.getmtime(os.path.join(self.media_root, 'alertas', 'captura.bin'))
+        vigente = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=http_date(mtime + 60))
+        self.assertEqual(vigente.status_code, 206)
+        anterior = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=http_date(mtime - 60))
+        self.assertEqual(anterior.status_code, 200)
+
+    def test_ruta_fuera_de_media_404(self):
+        url = reverse('deteccion:media_file', args=['../secreto.txt'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_solo_get_y_head(self):
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+        cabeza = self.client.head(self.url)
+        self.assertEqual(cabeza.status_code, 200)
+        self.assertEqual(cabeza['Content-Length'], '1024')
+
+
+class AlertDailySummaryTests(TestCase):
+    """Alert.save()/delete() mantienen el resumen igual que recalcularlo desde cero"""
+
+    def resumen(self):
+        campos = AlertDailySummary.counter_fields()
+        return {
+            fila['date']: {campo: fila[campo] for campo in campos if fila[campo]}
+            for fila in AlertDailySummary.objects.values('date', *campos)
+        }
+
+    def assertResumenConsistente(self):
+        incremental = self.resumen()
+        rebuild_daily_summary(Alert, AlertDailySummary)
+        recalculado = self.resumen()
+        # Días que quedaron en cero no cuentan (el recálculo no crea esas filas)
+        self.assertEqual({dia: fila for dia, fila in incremental.items() if fila}, recalculado)
+        return recalculado
+
+    def test_crear(self):
+        alerta = Alert.objects.create(message='m', missing='Casco, Chaleco', level='high')
+        dia = timezone.localdate(alerta.timestamp)
+        resumen = self.assertResumenConsistente()
+        self.assertEqual(resumen[dia], {
+            'total': 1, 'level_high': 1, 'status_pending': 1, 'missing_helmet': 1, 'missing_vest': 1,
+        })
+
+    def test_actualizar(self):
+        alerta = Alert.objects.create(message='m', missing='Casco', level='high')
+        alerta.level = 'medium'
+        alerta.missing = 'Botas'
+        alerta.resolution_status = 'non_compliant'
+        alerta.resolved = True
+        alerta.save()
+        dia = timezone.localdate(alerta.timestamp)
+        resumen = self.assertResumenConsistente()
+        self.assertEqual(resumen[dia], {
+            'total': 1, 'level_medium': 1, 'resolved': 1, 'status_non_compliant': 1,
+            'missing_boots': 1, 'non_compliant_boots': 1,
+        })
+
+    def test_actualizar_con_update_fields_y_campos_diferidos(self):
+        alerta = Alert.objects.create(message='m', missing='Casco', level='high')
+        diferida = Alert.objects.only('id', 'missing').get(pk=alerta.pk)
+        diferida.missing = 'Chaleco'
+        diferida.save(update_fields=['missing'])
+        dia = timezone.localdate(alerta.timestamp)
+        self.assertEqual(self.assertResumenConsistente()[dia]['missing_vest'], 1)
+
+    def test_cambio_de_dia(self):
+        alerta = Alert.objects.create(message='m', missing='Casco', level='high')
+        hoy = timezone.localdate(alerta.timestamp)
+        alerta.timestamp -= timedelta(days=1)
+        alerta.save()
+        resumen = self.assertResumenConsistente()
+        self.assertNotIn(hoy, resumen)
+        self.assertEqual(resumen[hoy - timedelta(days=1)]['total'], 1)
+
+    def test_borrar(self):
+        primera = Alert.objects.create(message='m', missing='Casco', level='high')
+        Alert.objects.create(message='m', missing='Chaleco', level='low')
+        primera.delete()
+        dia = timezone.localdate(primera.timestamp)
+        self.assertEqual(self.assertResumenConsistente()[dia], {
+            'total': 1, 'level_low': 1, 'status_pending': 1, 'missing_vest': 1,
+        })
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-reports'},
+})
+class CachingTests(TestCase):
+    def test_cached_value_se_invalida_por_grupo(self):
+        llamadas = []
+
+        def construir():
+            llamadas.append(1)
+            return {'n': len(llamadas)}
+
+        self.assertEqual(cached_value(('alerts',), ('prueba',), construir), {'n': 1})
+        self.assertEqual(cached_value(('alerts',), ('prueba',), construir), {'n': 1})
+        invalidate('capacitaciones')
+        self.assertEqual(cached_value(('alerts',), ('prueba',), construir), {'n': 1})
+        invalidate('alerts')
+        self.assertEqual(cached_value(('alerts',), ('prueba',), construir), {'n': 2})
+
+    def test_guardar_alerta_invalida_al_confirmar(self):
+        antes = namespace_versions(['alerts'])['alerts']
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Alert.objects.create(message='m', missing='Casco', level='high')
+                Alert.objects.create(message='m', missing='Botas', level='high')
+                # Dentro de la transacción todavía no se invalida
+                self.assertEqual(namespace_versions(['alerts'])['alerts'], antes)
+        self.assertNotEqual(namespace_versions(['alerts'])['alerts'], antes)
@@ -0,0 +1,172 @@
+# deteccion/thumbnails.py
+"""
+Miniaturas de las capturas de alertas.
+
+Las listas de alertas (inicio, alert_list) mostraban la captura original de
+media/alertas en cada fila. Al guardar una alerta, la cámara entrega el
+frame a un hilo en segundo plano que genera, junto a la original,
+
+    alertas/thumbs/<nombre>.jpg   JPEG de ALERT_THUMBNAIL_WIDTH px de ancho
+    alertas/thumbs/<nombre>.webp  la misma miniatura en WebP (ALERT_THUMBNAIL_WEBP)
+
+y guarda sus rutas en Alert.thumbnail / Alert.thumbnail_webp. Las listas
+usan las miniaturas y sólo el detalle (ver_incumplimiento) pide la
+original. La cola es acotada: si se llena, la miniatura se descarta y se
+puede generar después con `manage.py generate_thumbnails`.
+"""
+import logging
+import os
+import queue
+import threading
+
+import cv2
+from django.conf import settings
+
+from .caching import invalidate
+from .dbconn import refresh_thread_connection
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbs'
+
+
+def thumbnail_names(nombre):
+    """Rutas (relativas a MEDIA_ROOT) de la miniatura JPEG y WebP de la captura `nombre`"""
+    carpeta, archivo = os.path.split(nombre)
+    base = os.path.splitext(archivo)[0]
+    return (os.path.join(carpeta, THUMBNAIL_DIR, f'{base}.jpg').replace(os.sep, '/'),
+            os.path.join(carpeta, THUMBNAIL_DIR, f'{base}.webp').replace(os.sep, '/'))
+
+
+def _write_encoded(ruta, extension, imagen, parametros):
+    """Codifica y escribe de forma atómica (nunca se sirve un archivo a medio escribir)"""
+    ok, datos = cv2.imencode(extension, imagen, parametros)
+    if not ok:
+        raise ValueError(f'No se pudo codificar {ruta}')
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as archivo:
+        archivo.write(datos.tobytes())
+    os.replace(temporal, ruta)
+
+
+def render_thumbnails(imagen, nombre, width=320, quality=75, webp=True):
+    """
+    Escribe las miniaturas de `imagen` (BGR) para la captura `nombre` y devuelve
+    los campos del Alert: {'thumbnail': ..., 'thumbnail_webp': ...}
+    """
+    alto, ancho = imagen.shape[:2]
+    if ancho > width:
+        imagen = cv2.resize(imagen, (width, max(1, round(alto * width / ancho))), interpolation=cv2.INTER_AREA)
+
+    jpeg, webp_nombre = thumbnail_names(nombre)
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, os.path.dirname(jpeg)), exist_ok=True)
+    _write_encoded(os.path.join(settings.MEDIA_ROOT, jpeg), '.jpg', imagen, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    campos = {'thumbnail': jpeg, 'thumbnail_webp': ''}
+    if webp:
+        _write_encoded(os.path.join(settings.MEDIA_ROOT, webp_nombre), '.webp', imagen,
+                       [cv2.IMWRITE_WEBP_QUALITY, quality])
+        campos['thumbnail_webp'] = webp_nombre
+    return campos
+
+
+class ThumbnailWriter:
+    """Hilo que genera las miniaturas de las alertas fuera del bucle de captura"""
+
+    def __init__(self, width=320, quality=75, webp=True, max_pending=32):
+        self.width = width
+        self.quality = quality
+        self.webp = webp
+        self.generated = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            width=getattr(settings, 'ALERT_THUMBNAIL_WIDTH', 320),
+            quality=getattr(settings, 'ALERT_THUMBNAIL_QUALITY', 75),
+            webp=getattr(settings, 'ALERT_THUMBNAIL_WEBP', True),
+            max_pending=getattr(settings, 'ALERT_THUMBNAIL_QUEUE', 32),
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='alert-thumbnails', daemon=True)
+                self._thread.start()
+        return self
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, alert_id, imagen, nombre):
+        """Encola la miniatura de la alerta; False si la cola está llena (se descarta)"""
+        try:
+            # Copia: el bucle de captura sigue dibujando sobre su frame
+            self._queue.put_nowait((alert_id, imagen.copy(), nombre))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"⚠️ Cola de miniaturas llena: se omite la de la alerta {alert_id}")
+            return False
+
+    def join(self):
+        """Espera a que se procesen las miniaturas encoladas"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            alert_id, imagen, nombre = self._queue.get()
+            try:
+                self.generate(alert_id, nombre, imagen)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Error generando la miniatura de la alerta {alert_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def generate(self, alert_id, nombre, imagen=None):
+        """Genera las miniaturas (leyendo la captura si no se pasa `imagen`) y las guarda en el Alert"""
+        from .models import Alert
+
+        if imagen is None:
+            ruta = os.path.join(settings.MEDIA_ROOT, nombre)
+            imagen = cv2.imread(ruta) if os.path.isfile(ruta) else None
+            if imagen is None:
+                raise FileNotFoundError(f'No se pudo leer la captura {nombre}')
+        campos = render_thumbnails(imagen, nombre, self.width, self.quality, self.webp)
+        refresh_thread_connection()
+        Alert.objects.filter(pk=alert_id).update(**campos)
+        # update() no emite señales: las listas cacheadas deben ver la miniatura
+        invalidate('alerts')
+        self.generated += 1
+        return campos
+
+    def prometheus_lines(self):
+        lineas = ['# HELP epp_thumbnails_total Miniaturas de alertas por resultado',
+                  '# TYPE epp_thumbnails_total counter']
+        lineas += [f'epp_thumbnails_total{{result="{r}"}} {n}'
+                   for r, n in (('generated', self.generated), ('dropped', self.dropped), ('failed', self.failed))]
+        lineas += ['# HELP epp_thumbnails_pending Miniaturas en cola', '# TYPE epp_thumbnails_pending gauge',
+                   f'epp_thumbnails_pending {self.pending}']
+        return lineas
+
+
+# Singleton del generador (igual que el watchdog de memoria)
+thumbnail_writer = None
+thumbnail_writer_lock = threading.Lock()
+
+
+def get_thumbnail_writer():
+    """Obtiene o crea (y arranca) el generador de miniaturas del proceso"""
+    global thumbnail_writer
+    with thumbnail_writer_lock:
+        if thumbnail_writer is None:
+            thumbnail_writer = ThumbnailWriter.from_settings().start()
+            registry.add_collector(thumbnail_writer.prometheus_lines)
+        return thumbnail_writer
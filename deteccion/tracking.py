@@ -0,0 +1,161 @@
+# deteccion/tracking.py
+"""
+Seguimiento de personas entre frames para que las alertas sean por persona.
+
+`PersonTracker` asigna un ID persistente a cada caja de persona emparejando
+por IoU con las del frame anterior (estilo ByteTrack: primero las
+detecciones de confianza alta, luego las de confianza baja sólo para
+continuar tracks existentes). Cada `Track` lleva su propio estado de alerta:
+desde cuándo le falta EPP y cuándo se alertó por última vez, de modo que el
+retraso y el cooldown se aplican a cada persona por separado. El EPP se
+asocia a cada persona por franjas de su caja (association.py).
+"""
+import numpy as np
+
+from .association import associate_items, class_ids
+
+PERSON_CLASSES = ('human', 'person')
+
+
+def box_iou(a, b):
+    """Matriz IoU (N×M) entre cajas xyxy `a` (N×4) y `b` (M×4)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def track_people(tracker, detections, item_classes, now):
+    """
+    Actualiza `tracker` con las personas de `detections` (ver detections.py)
+    y devuelve [(track, cumplimiento)] para cada persona con track en este
+    frame. `cumplimiento` es un vector booleano alineado con `item_classes`
+    (ver association.associate_items).
+    """
+    person_idx, compliance = associate_items(
+        detections.boxes, detections.classes,
+        class_ids(detections.names, PERSON_CLASSES), class_ids(detections.names, item_classes),
+        item_classes,
+    )
+    tracks = tracker.update(detections.boxes[person_idx], detections.confidences[person_idx], now)
+    return [(track, fila) for track, fila in zip(tracks, compliance) if track is not None]
+
+
+def _greedy_match(iou, threshold):
+    """Pares (fila, columna) con mayor IoU primero, sin repetir filas ni columnas"""
+    pares = []
+    if iou.size == 0:
+        return pares
+    filas, columnas = np.nonzero(iou >= threshold)
+    orden = np.argsort(-iou[filas, columnas], kind='stable')
+    usadas_f, usadas_c = set(), set()
+    for k in orden:
+        f, c = int(filas[k]), int(columnas[k])
+        if f in usadas_f or c in usadas_c:
+            continue
+        usadas_f.add(f)
+        usadas_c.add(c)
+        pares.append((f, c))
+    return pares
+
+
+class Track:
+    """Una persona seguida entre frames, con su estado de alerta"""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.missed = 0
+        self.missing = []           # Etiquetas del EPP faltante en la última observación
+        self.missing_since = None   # Desde cuándo le falta EPP (None = completo)
+        self.last_alert_time = None
+
+    def observe(self, missing, now):
+        """Registra el EPP faltante observado en este frame"""
+        if missing:
+            if self.missing_since is None:
+                self.missing_since = now
+        else:
+            self.missing_since = None
+        self.missing = list(missing)
+
+    def cooled_down(self, now, cooldown):
+        return self.last_alert_time is None or now - self.last_alert_time >= cooldown
+
+    def alert_due(self, now, delay, cooldown):
+        """¿Lleva `delay` segundos sin EPP y pasó el cooldown de su última alerta?"""
+        return (self.missing_since is not None
+                and now - self.missing_since >= delay
+                and self.cooled_down(now, cooldown))
+
+    def mark_alerted(self, now):
+        self.last_alert_time = now
+
+
+class PersonTracker:
+    """Tracker IoU de cajas de persona"""
+
+    def __init__(self, iou_threshold=0.3, high_confidence=0.5, max_missed=15):
+        self.iou_threshold = iou_threshold
+        self.high_confidence = high_confidence
+        self.max_missed = max_missed  # Frames sin ver a la persona antes de olvidarla
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes, confidences, now):
+        """
+        Empareja las cajas del frame con los tracks y devuelve una lista
+        alineada con `boxes` con el Track de cada caja (None si es una caja de
+        confianza baja que no continúa ningún track).
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        asignados = [None] * len(boxes)
+
+        altas = np.flatnonzero(confidences >= self.high_confidence)
+        bajas = np.flatnonzero(confidences < self.high_confidence)
+        libres = list(range(len(self.tracks)))
+
+        # Primera pasada: detecciones confiables; segunda: las dudosas sólo
+        # para no perder tracks existentes (oclusiones, desenfoque)
+        for indices in (altas, bajas):
+            if len(indices) == 0 or not libres:
+                continue
+            track_boxes = np.stack([self.tracks[t].box for t in libres])
+            iou = box_iou(track_boxes, boxes[indices])
+            emparejados = set()
+            for f, c in _greedy_match(iou, self.iou_threshold):
+                track = self.tracks[libres[f]]
+                track.box = boxes[indices[c]]
+                track.last_seen = now
+                track.hits += 1
+                track.missed = 0
+                asignados[indices[c]] = track
+                emparejados.add(libres[f])
+            libres = [t for t in libres if t not in emparejados]
+
+        for t in libres:
+            self.tracks[t].missed += 1
+
+        for i in altas:
+            if asignados[i] is None:
+                track = Track(self._next_id, boxes[i], now)
+                self._next_id += 1
+                self.tracks.append(track)
+                asignados[i] = track
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return asignados
+
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,128 @@
+# deteccion/trends.py
+"""
+Series de alertas agrupadas por hora, día o semana para las gráficas.
+
+El agrupamiento lo hace la base de datos (TruncHour/TruncDay/TruncWeek en la
+zona horaria local). Cada intervalo ya cerrado se guarda en la caché
+compartida de reportes (caching.report_cache: archivos o Redis, la misma para
+todos los workers y para run_cameras) por CACHE_TIMEOUT: sólo se consulta la
+base para los intervalos que faltan en caché y para el intervalo en curso.
+Alert.save()/delete(), el re-análisis y el loadtest invalidan los intervalos
+de una alerta cuando cambia lo que aporta (p. ej. el nivel al resolverla);
+el vencimiento acota cualquier invalidación que se pierda.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+
+from .caching import report_cache
+from .models import Alert, EPP_ITEMS
+from .rollup import missing_item_filter
+
+BUCKETS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+MAX_BUCKETS = 1000
+LEVELS = [nivel for nivel, _ in Alert.LEVEL_CHOICES]
+CACHE_PREFIX = 'alert_trend'
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def bucket_floor(bucket, moment):
+    """Inicio (hora local) del intervalo que contiene `moment`"""
+    local = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    if bucket != 'hour':
+        local = local.replace(hour=0)
+    if bucket == 'week':
+        local -= timedelta(days=local.weekday())
+    return timezone.make_aware(local)
+
+
+def bucket_next(bucket, start):
+    local = timezone.localtime(start).replace(tzinfo=None)
+    paso = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[bucket]
+    return timezone.make_aware(local + paso)
+
+
+def bucket_starts(bucket, start, end):
+    """Inicios de los intervalos que cubren [start, end)"""
+    actual = bucket_floor(bucket, start)
+    inicios = []
+    while actual < end:
+        inicios.append(actual)
+        actual = bucket_next(bucket, actual)
+    return inicios
+
+
+def _cache_key(bucket, inicio):
+    return f'{CACHE_PREFIX}:{bucket}:{inicio.isoformat()}'
+
+
+def _count_expressions():
+    expresiones = {'total': Count('id')}
+    for nivel in LEVELS:
+        expresiones[f'level_{nivel}'] = Count('id', filter=Q(level=nivel))
+    for clave, _ in EPP_ITEMS:
+        expresiones[f'missing_{clave}'] = Count('id', filter=missing_item_filter(clave))
+    return expresiones
+
+
+def _empty_counts():
+    return {nombre: 0 for nombre in _count_expressions()}
+
+
+def _query_buckets(bucket, start, end):
+    """Conteos por intervalo entre start y end en una sola consulta agrupada"""
+    filas = Alert.objects.filter(
+        timestamp__gte=start, timestamp__lt=end
+    ).annotate(
+        bucket_start=BUCKETS[bucket]('timestamp')
+    ).order_by().values('bucket_start').annotate(**_count_expressions())
+
+    resultado = {}
+    for fila in filas:
+        inicio = fila.pop('bucket_start')
+        resultado[timezone.localtime(inicio)] = fila
+    return resultado
+
+
+def alert_trend_series(bucket, start, end, now=None):
+    """
+    Devuelve (series, cerrada). `series` es una lista de
+    {'bucket': inicio, 'counts': {...}}; `cerrada` indica que todos los
+    intervalos ya terminaron (sólo cambia si se reanalizan o resuelven alertas).
+    """
+    now = now or timezone.now()
+    inicios = bucket_starts(bucket, start, end)
+    if len(inicios) > MAX_BUCKETS:
+        raise ValueError(f'Demasiados intervalos ({len(inicios)} > {MAX_BUCKETS})')
+
+    cerrados = [i for i in inicios if bucket_next(bucket, i) <= now]
+    cache = report_cache()
+    en_cache = cache.get_many([_cache_key(bucket, i) for i in cerrados])
+    conteos = {i: en_cache[_cache_key(bucket, i)] for i in cerrados if _cache_key(bucket, i) in en_cache}
+
+    pendientes = [i for i in inicios if i not in conteos]
+    if pendientes:
+        consultados = _query_buckets(bucket, pendientes[0], bucket_next(bucket, pendientes[-1]))
+        nuevos_cerrados = {}
+        for inicio in pendientes:
+            conteos[inicio] = consultados.get(inicio, _empty_counts())
+            if bucket_next(bucket, inicio) <= now:
+                nuevos_cerrados[_cache_key(bucket, inicio)] = conteos[inicio]
+        if nuevos_cerrados:
+            cache.set_many(nuevos_cerrados, timeout=CACHE_TIMEOUT)
+
+    series = [{'bucket': inicio, 'counts': conteos[inicio]} for inicio in inicios]
+    return series, len(cerrados) == len(inicios)
+
+
+def invalidate_alert_trends(timestamp):
+    """Borra de la caché los intervalos que contienen `timestamp`"""
+    if timestamp is None:
+        return
+    report_cache().delete_many([_cache_key(bucket, bucket_floor(bucket, timestamp)) for bucket in BUCKETS])
@@ -3,7 +3,6 @@ from django.urls import path
 from . import views
 from django.shortcuts import redirect
 from django.conf import settings
-from django.conf.urls.static import static
 from . import views_admin_capacitaciones as admin_views
 app_name = 'deteccion' # Define el namespace de la app
 
@@ -17,8 +16,14 @@ urlpatterns = [
     # URLs para la cámara
     path('video_feed/', views.video_feed, name='video_feed'),
     path('toggle_camera/', views.toggle_camera, name='toggle_camera'),
+    path('camaras/<int:camera_id>/feed/', views.camera_feed, name='camera_feed'),
+    path('camaras/health/', views.camera_health, name='camera_health'),
+    path('metrics', views.metrics, name='metrics'),
+    path('metrics/memory', views.memory_status, name='memory_status'),
     
     path('grabaciones/', views.grabaciones, name='grabaciones'),
+    path('grabaciones/<path:path>', views.recording_file, name='recording_file'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.media_file, name='media_file'),
 
 
 ##alertas
@@ -27,6 +32,7 @@ urlpatterns = [
     path('inicio/latest-alerts/', views.latest_alerts, name='latest_alerts'),
     path('inicio/alerts/resolve/<int:alert_id>/', views.resolve_alert, name='resolve_alert'),
     path('inicio/alerts/statistics/', views.alert_statistics, name='alert_statistics'),
+    path('inicio/alerts/trends/', views.alert_trends, name='alert_trends'),
     path('inicio/alerts/modal/<int:alert_id>/', views.alert_resolution_modal, name='alert_resolution_modal'),
     
     path('inicio/incunplimiento/<int:incumplimiento_id>/', views.ver_incumplimiento, name='incunplimiento'),
@@ -100,7 +106,6 @@ urlpatterns = [
     path('capacitacion/<int:capacitacion_id>/actualizar-progreso/', admin_views.actualizar_progreso, name='actualizar_progreso'),
     # Alternativa con clase-based view
     path('capacitacion/<int:capacitacion_id>/progreso/', admin_views.ActualizarProgresoView.as_view(),name='actualizar_progreso_cbv'),
-    path('inicio_trabajador/', admin_views.inicio_trabajador, name='inicio_trabajador'),
     path('inicio/detalle/capacitaciones/<int:pk>/', admin_views.detalle_capacitacion, name='detalle_capacitacion'),
     path('capacitaciones/iniciar/<int:capacitacion_id>/', admin_views.iniciar_capacitacion, name='iniciar_capacitacion'),
 
@@ -108,6 +113,4 @@ urlpatterns = [
 
     path('inicio/reportes/', views.alerts_report_view, name='reportes'),
 
-]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
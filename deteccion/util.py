@@ -30,6 +30,17 @@ def valida_cedula(value):
     if digito_verificador != int(cedula[9]):
         raise ValidationError('La cédula ingresada no es válida.')
 
+def valida_poligono_roi(value):
+    """Zona de interés: [[x, y], ...] con al menos 3 vértices entre 0 y 1, o vacía"""
+    if value in (None, []):
+        return
+    if not isinstance(value, list) or len(value) < 3:
+        raise ValidationError('La zona de interés debe tener al menos 3 vértices [[x, y], ...].')
+    for punto in value:
+        if (not isinstance(punto, (list, tuple)) or len(punto) != 2
+                or not all(isinstance(c, (int, float)) and 0 <= c <= 1 for c in punto)):
+            raise ValidationError('Cada vértice debe ser [x, y] con valores entre 0 y 1.')
+
 def cedula_valida(cedula):
     """
     Valida una cédula ecuatoriana usando el algoritmo del módulo 10.
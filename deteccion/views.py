@@ -14,30 +14,30 @@ from .forms import UserForm, UserEditForm, UserPasswordChangeForm
 from django.db.models import Prefetch
 import os
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, date
 from django.utils.timezone import localtime
 from django.db import models, transaction
 from .models import Capacitacion, ProgresoCapacitacion, Certificado
 from django.contrib.auth.models import Group, Permission
 import cv2
 import threading
-from django.http import StreamingHttpResponse, JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
 from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
-import gc
-import psutil
-
-def check_memory_usage():
-    """Verifica el uso de memoria y libera recursos si es necesario"""
-    process = psutil.Process(os.getpid())
-    memory_mb = process.memory_info().rss / 1024 / 1024
-    
-    if memory_mb > 400:  # Si supera 400MB
-        print(f"⚠️  Alto uso de memoria: {memory_mb:.2f}MB - Liberando recursos...")
-        gc.collect()
-        
-    return memory_mb
+from .trends import BUCKETS, alert_trend_series
+from .caching import cached_value, cached_view
+from .detections import DemoDetectionCache, Detections
+from .encoding import DEFAULT_TIER, EncodedFrame, resolve_tier
+from .media import serve_file
+from .snapshots import find_alert_snapshot
+from .memory import get_memory_watchdog
+from .preload import load_model
+from .metrics import pipeline_metrics, registry as metrics_registry
+from .overlay import default_renderer
+from .supervisor import camera_health as supervisor_camera_health, get_camera_supervisor
 
 # =============================================
 # NUEVO SISTEMA DE VIDEO PARA RENDER
@@ -57,6 +57,10 @@ class VideoProcessor:
         self.model_loaded = False
         self.frame_skip = 3  # Procesar 1 de cada 3 frames
         self.frame_count = 0
+        self.demo_cache = None  # Detecciones precalculadas del video (precompute_demo_detections)
+        self.metrics = pipeline_metrics('video_demo')  # Tiempos por etapa para /metrics
+        self.imgsz = 320  # Reducir tamaño de procesamiento (el watchdog de memoria puede bajarlo)
+        get_memory_watchdog().register_source(self)
         print(f"🎥 Inicializando procesador de video - RENDER: {self.is_render}")
         
     def initialize_video(self):
@@ -86,6 +90,10 @@ class VideoProcessor:
             # Configuraciones optimizadas para reducir carga
             self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             print(f"✅ Video cargado correctamente: {self.video_path}")
+
+            self.demo_cache = DemoDetectionCache.for_video(self.video_path)
+            if self.demo_cache is not None:
+                print("⚡ Usando detecciones precalculadas del video (sin cargar YOLO)")
             return True
             
         except Exception as e:
@@ -95,15 +103,14 @@ class VideoProcessor:
     def initialize_model(self):
         """Inicializa el modelo YOLO para detección - OPTIMIZADO"""
         try:
-            from ultralytics import YOLO
-            model_path = '/opt/render/project/src/models2/Models/best.pt'
+            model_path = settings.MODEL_PATH  # El mismo que precarga gunicorn (PRELOAD_MODELS)
             
             if not os.path.exists(model_path):
                 print(f"❌ Modelo no encontrado en: {model_path}")
                 return False
                 
             print(f"🔧 Cargando modelo YOLO desde: {model_path}")
-            self.model = YOLO(model_path)
+            self.model = load_model(model_path)  # Comparte el modelo precargado (preload.py)
             self.model_loaded = True
             
             print("✅ Modelo YOLOv8 cargado correctamente")
@@ -122,58 +129,66 @@ class VideoProcessor:
         self.frame_count += 1
         if self.frame_count % self.frame_skip != 0:
             self.cap.grab()  # Descarta frame sin decodificar
+            self.metrics.frame_dropped()
             return None
-            
-        ret, frame = self.cap.read()
-        if not ret:
-            # Reiniciar video cuando termina
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+        with self.metrics.stage('capture'):
             ret, frame = self.cap.read()
             if not ret:
-                return None
-        
+                # Reiniciar video cuando termina
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+        if not ret:
+            self.metrics.frame_dropped()
+            return None
+        frame_index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        self.metrics.frame_done()
+
         # Reducir resolución para optimizar
-        frame = cv2.resize(frame, (640, 480))
+        with self.metrics.stage('resize'):
+            frame = cv2.resize(frame, (640, 480))
         
         # Procesar frame según el modo
-        if self.mode == 'detection' and self.model_loaded:
-            processed_frame = self.process_frame_detection(frame)
+        if self.mode == 'detection' and (self.model_loaded or self.demo_cache is not None):
+            processed_frame = self.process_frame_detection(frame, frame_index)
         else:
             processed_frame = self.process_frame_view(frame)
         
         return processed_frame
     
-    def process_frame_detection(self, frame):
+    def process_frame_detection(self, frame, frame_index=0):
         """Procesa un frame con detección YOLO - OPTIMIZADO"""
-        if not self.model_loaded:
+        if self.demo_cache is not None:
+            # Video demo: cajas precalculadas, escaladas al tamaño reducido
+            detections = self.demo_cache.get(frame_index, (frame.shape[1], frame.shape[0]))
+        elif not self.model_loaded:
             return frame
-            
+        else:
+            detections = None
+
         try:
-            # Configuración optimizada para YOLO
-            results = self.model.predict(
-                frame, 
-                conf=0.25, 
-                verbose=False, 
-                imgsz=320,  # Reducir tamaño de procesamiento
-                stream=False  # No usar modo stream para evitar memory leaks
-            )
-            
-            if results and len(results) > 0:
-                result = results[0]
-                annotated_frame = result.plot()
-                
-                # Agregar información al frame
-                cv2.putText(annotated_frame, "MODO DETECCIÓN ACTIVO", (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(annotated_frame, f"Detecciones: {len(result.boxes)}", (10, 60),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                return annotated_frame
-            else:
-                cv2.putText(frame, "MODO DETECCIÓN - SIN DETECCIONES", (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                return frame
-                
+            if detections is None:
+                # Configuración optimizada para YOLO
+                with self.metrics.stage('inference'):
+                    results = self.model.predict(
+                        frame,
+                        conf=0.25,
+                        verbose=False,
+                        imgsz=self.imgsz,
+                        stream=False  # No usar modo stream para evitar memory leaks
+                    )
+                if not results:
+                    default_renderer.text(frame, "MODO DETECCIÓN - SIN DETECCIONES", (10, 30), 0.7, (0, 255, 255), 2)
+                    return frame
+                detections = Detections.from_result(results[0])
+
+            # Dibujo en el mismo frame (sin la copia de result.plot())
+            with self.metrics.stage('overlay'):
+                default_renderer.draw_detections(frame, detections)
+                default_renderer.text(frame, "MODO DETECCIÓN ACTIVO", (10, 30), 0.7, (0, 255, 0), 2)
+                default_renderer.text(frame, f"Detecciones: {len(detections)}", (10, 60), 0.6, (255, 255, 255), 2)
+            return frame
+
         except Exception as e:
             print(f"❌ Error en procesamiento YOLO: {e}")
             cv2.putText(frame, "ERROR EN DETECCIÓN", (10, 30),
@@ -194,8 +209,8 @@ class VideoProcessor:
             self.mode = mode
             print(f"🔄 Modo cambiado a: {mode}")
             
-            # Cargar modelo solo cuando se activa la detección
-            if mode == 'detection' and not self.model_loaded:
+            # Cargar modelo solo cuando se activa la detección (y no hay caché)
+            if mode == 'detection' and not self.model_loaded and self.demo_cache is None:
                 self.initialize_model()
 
 
@@ -214,7 +229,7 @@ def get_video_processor():
         return video_processor
 
 
-def generate_frames():
+def generate_frames(tier='480p'):
     """Generador de frames para streaming con manejo de errores OPTIMIZADO"""
     processor = get_video_processor()
     if processor is None:
@@ -239,14 +254,10 @@ def generate_frames():
             frame_count = 0  # Reset counter on successful frame
             error_count = 0  # Reset error counter
             
-            # Codificar frame como JPEG con calidad reducida
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, 60]  # 60% calidad
-            ret, buffer = cv2.imencode('.jpg', frame, encode_params)
-            
-            if not ret:
+            # Codificar frame como JPEG en el nivel pedido por el cliente
+            frame_bytes = EncodedFrame(frame, processor.metrics).jpeg(tier)
+            if not frame_bytes:
                 continue
-                
-            frame_bytes = buffer.tobytes()
             
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
@@ -283,7 +294,7 @@ def video_feed(request):
             return JsonResponse({'error': 'No se pudo inicializar el video'}, status=500)
         
         response = StreamingHttpResponse(
-            generate_frames(), 
+            generate_frames(resolve_tier(request.GET.get('tier'), default='480p')), 
             content_type='multipart/x-mixed-replace; boundary=frame'
         )
         
@@ -300,6 +311,108 @@ def video_feed(request):
         traceback.print_exc()
         return JsonResponse({'error': 'Error interno del servidor'}, status=500)
     
+def generate_camera_frames(worker, tier=DEFAULT_TIER):
+    """Stream MJPEG con los frames que publica el worker de una cámara, en el nivel pedido"""
+    seq = 0
+    with worker.subscribe():  # Mientras haya espectadores el worker dibuja y codifica
+        while worker.is_alive():
+            seq, frame = worker.wait_frame(seq, timeout=5.0, tier=tier)
+            if frame is None:
+                continue
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+
+def _cameras_disabled_response():
+    """503 si las cámaras no corren en el proceso web (ver settings.CAMERAS_IN_WEB_PROCESS)"""
+    if settings.CAMERAS_IN_WEB_PROCESS:
+        return None
+    return JsonResponse({'error': 'Las cámaras corren en manage.py run_cameras, no en el servidor web'}, status=503)
+
+
+@login_required
+def camera_feed(request, camera_id):
+    """Stream de una cámara registrada (modelo Camera), servido por el supervisor (?tier=thumb|480p|full)"""
+    desactivadas = _cameras_disabled_response()
+    if desactivadas is not None:
+        return desactivadas
+    supervisor = get_camera_supervisor()
+    worker = supervisor.get(camera_id) or supervisor.sync().get(camera_id)
+    if worker is None:
+        return JsonResponse({'error': 'Cámara no encontrada o deshabilitada'}, status=404)
+
+    response = StreamingHttpResponse(
+        generate_camera_frames(worker, resolve_tier(request.GET.get('tier'))),
+        content_type='multipart/x-mixed-replace; boundary=frame'
+    )
+    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+
+@login_required
+def camera_health(request):
+    """Estado de salud de cada cámara (sólo lectura: no arranca ni detiene cámaras)"""
+    desactivadas = _cameras_disabled_response()
+    if desactivadas is not None:
+        return desactivadas
+    return JsonResponse({'cameras': supervisor_camera_health()})
+
+
+def _metrics_token(request):
+    """Authorization: Bearer METRICS_TOKEN"""
+    token = settings.METRICS_TOKEN
+    return bool(token) and request.headers.get('Authorization', '') == f'Bearer {token}'
+
+
+def _metrics_authorized(request):
+    """Usuarios staff o Authorization: Bearer METRICS_TOKEN"""
+    if _metrics_token(request):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics(request):
+    """Tiempos por etapa, FPS y frames descartados de cada cámara, y memoria del proceso, en formato Prometheus"""
+    if not _metrics_authorized(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    get_memory_watchdog()  # Arranca el watchdog (y sus métricas) si ninguna fuente lo hizo
+    return HttpResponse(metrics_registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@csrf_exempt
+def memory_status(request):
+    """
+    Estado del watchdog de memoria (GET). POST con trace=start|stop activa
+    o detiene tracemalloc; ?top=N agrega las N líneas con más memoria viva
+    (y el total de numpy) mientras tracemalloc esté activo.
+    """
+    if request.method not in ('GET', 'HEAD', 'POST'):
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    if not _metrics_authorized(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    if request.method == 'POST' and not _metrics_token(request):
+        # Con sesión (staff) el POST sigue pidiendo el token CSRF; sólo el Bearer queda exento
+        from django.middleware.csrf import CsrfViewMiddleware
+        rechazo = CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+        if rechazo is not None:
+            return rechazo
+    watchdog = get_memory_watchdog()
+    if request.method == 'POST':
+        accion = request.POST.get('trace')
+        if accion == 'start':
+            watchdog.start_tracing()
+        elif accion == 'stop':
+            watchdog.stop_tracing()
+        else:
+            return JsonResponse({'error': 'trace debe ser start o stop'}, status=400)
+    try:
+        top = max(0, min(int(request.GET.get('top', 0)), 100))
+    except ValueError:
+        top = 0
+    watchdog.sample()
+    return JsonResponse(watchdog.status(top=top))
+
+
 @csrf_exempt
 def toggle_camera(request):
     """Función mantenida para compatibilidad - NUEVA VERSIÓN"""
@@ -399,6 +512,22 @@ def inicio(request):
 
 
 
+def combinar_capacitaciones_con_progreso(capacitaciones, progresos):
+    """
+    Une cada capacitación con el progreso del usuario en una sola pasada.
+    Los progresos se indexan por capacitacion_id, así el costo es lineal
+    en lugar de recorrer todos los progresos por cada capacitación.
+    """
+    progreso_por_capacitacion = {p.capacitacion_id: p for p in progresos}
+    return [
+        {
+            'capacitacion': capacitacion,
+            'progreso': progreso_por_capacitacion.get(capacitacion.id),
+        }
+        for capacitacion in capacitaciones
+    ]
+
+
 @login_required
 def inicio_trabajador(request):
     """Vista exclusiva para trabajadores - Panel de capacitación"""
@@ -406,18 +535,18 @@ def inicio_trabajador(request):
     if not request.user.groups.filter(name='trabajador').exists():
         return redirect('deteccion:inicio')
     
-    # Obtener capacitaciones publicadas
-    capacitaciones = Capacitacion.objects.filter(estado='publicada')
+    # Obtener capacitaciones publicadas (se evalúan una sola vez)
+    capacitaciones = list(Capacitacion.objects.filter(estado='publicada'))
     
     # Obtener progreso del usuario actual
-    progresos = ProgresoCapacitacion.objects.filter(usuario=request.user).select_related('capacitacion')
+    progresos = list(ProgresoCapacitacion.objects.filter(usuario=request.user).select_related('capacitacion'))
     
     # Obtener certificados del usuario actual
-    certificados = Certificado.objects.filter(usuario=request.user).select_related('capacitacion')
+    certificados = list(Certificado.objects.filter(usuario=request.user).select_related('capacitacion'))
     
-    # Calcular estadísticas
-    capacitaciones_completadas = progresos.filter(completada=True).count()
-    total_capacitaciones = capacitaciones.count()
+    # Calcular estadísticas sobre las filas ya cargadas, sin consultas .count()
+    capacitaciones_completadas = sum(1 for p in progresos if p.completada)
+    total_capacitaciones = len(capacitaciones)
     
     # Calcular porcentaje de progreso
     if total_capacitaciones > 0:
@@ -425,21 +554,11 @@ def inicio_trabajador(request):
     else:
         porcentaje_progreso = 0
     
-    # Preparar datos para el template - solución sin filtros
-    capacitaciones_con_progreso = []
-    for capacitacion in capacitaciones:
-        progreso_capacitacion = next(
-            (p for p in progresos if p.capacitacion.id == capacitacion.id), 
-            None
-        )
-        capacitaciones_con_progreso.append({
-            'capacitacion': capacitacion,
-            'progreso': progreso_capacitacion
-        })
+    capacitaciones_con_progreso = combinar_capacitaciones_con_progreso(capacitaciones, progresos)
     
     context = {
         'user': request.user,
-        'capacitaciones_con_progreso': capacitaciones_con_progreso,  # Nuevo formato
+        'capacitaciones_con_progreso': capacitaciones_con_progreso,
         'progresos': progresos,
         'certificados': certificados,
         'capacitaciones_completadas': capacitaciones_completadas,
@@ -460,6 +579,20 @@ def grabaciones(request):
     return render(request, 'deteccion/grabaciones.html')
 
 
+@login_required
+@require_safe
+def media_file(request, path):
+    """Archivos de MEDIA_ROOT (evidencias, fotos, PDFs) con Range y GET condicional"""
+    return serve_file(request, settings.MEDIA_ROOT, path, accel_location='media')
+
+
+@login_required
+@require_safe
+def recording_file(request, path):
+    """Grabaciones de las cámaras: el reproductor pide sólo los tramos que se ven"""
+    return serve_file(request, settings.RECORDINGS_ROOT, path, accel_location='grabaciones')
+
+
 
 
 
@@ -1033,59 +1166,43 @@ def ver_incumplimiento(request, incumplimiento_id):
     incumplimiento = get_object_or_404(Alert, pk=incumplimiento_id)
     
     image_url = None
+    recording_url = None
     debug_info = ""
     
-    if incumplimiento.video:
+    if incumplimiento.recording_path:
+        # Alerta del re-análisis: la evidencia es la grabación, no una captura
+        recording_url = incumplimiento.evidence_url
+        debug_info = f"Grabación: {incumplimiento.video.name}"
+    elif incumplimiento.video:
         # Obtener la ruta guardada en la BD
         db_path = incumplimiento.video.name
         debug_info = f"Ruta en BD: {db_path}"
-        
-        print(f"🔍 Buscando imagen para alerta {incumplimiento_id}: {db_path}")
-        
-        # Construir ruta local completa
-        local_path = os.path.join('media', db_path)
-        
-        # Verificar si el archivo existe localmente
-        if os.path.exists(local_path):
-            # Usar la URL de medios de Django
-            image_url = f"/media/{db_path}"
-            print(f"✅ Imagen encontrada: {image_url}")
-            debug_info += f" | Encontrada en: {local_path}"
+
+        # Captura registrada (consulta por índice, sin recorrer media/alertas)
+        snapshot = find_alert_snapshot(incumplimiento)
+        if snapshot is not None:
+            image_url = snapshot.url
+            debug_info += f" | Registrada: {snapshot.path} ({snapshot.width}x{snapshot.height})"
+        elif os.path.isfile(os.path.join(settings.MEDIA_ROOT, db_path)):
+            # Captura anterior al registro (manage.py reconcile_snapshots la registra)
+            image_url = f"{settings.MEDIA_URL}{db_path}"
+            debug_info += " | Sin registrar"
         else:
-            print(f"❌ Archivo NO encontrado: {local_path}")
-            debug_info += f" | NO encontrada en: {local_path}"
-            
-            # ✅ CORRECCIÓN: Llamar a la función directamente, no con self
-            alternative_paths = find_alternative_image(incumplimiento_id, db_path)
-            if alternative_paths:
-                image_url = alternative_paths[0]
-                print(f"✅ Imagen alternativa encontrada: {image_url}")
+            print(f"❌ Captura NO encontrada para alerta {incumplimiento_id}: {db_path}")
+            debug_info += " | NO encontrada"
     
     context = {
         'incumplimiento': incumplimiento,
         'image_url': image_url,
+        'recording_url': recording_url,
         'debug_info': debug_info,
         'title': f'Incumplimiento ID: {incumplimiento_id}'
     }
     
     return render(request, 'usuarios/ver_incumplimiento.html', context)
 
-# ✅ CORRECCIÓN: Quitar el parámetro self
-def find_alternative_image(alert_id, original_path):
-    """Busca imágenes alternativas si la original no se encuentra"""
-    alertas_dir = 'media/alertas'
-    if not os.path.exists(alertas_dir):
-        return []
-    
-    # Buscar cualquier imagen que pueda corresponder a esta alerta
-    possible_files = []
-    for filename in os.listdir(alertas_dir):
-        if filename.endswith('.jpg') and str(alert_id) in filename:
-            possible_files.append(f"/media/alertas/{filename}")
-    
-    return possible_files
-
 
+@cached_view('alerts', timeout=15)
 def alert_list(request):
     # Obtenemos alertas no resueltas de las últimas 24 horas
     since = timezone.now() - timedelta(hours=24)
@@ -1098,7 +1215,9 @@ def alert_list(request):
             'message': alert.message,
             'missing': alert.missing,
             'level': alert.get_level_display(),
-            'video_url': alert.video.url if alert.video else '',
+            'video_url': alert.evidence_url or '',
+            'thumbnail': alert.thumbnail_url,
+            'thumbnail_webp': alert.thumbnail_webp.url if alert.thumbnail_webp else None,
             'timestamp': alert.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'resolved': alert.resolved,
             'resolution_status': alert.resolution_status,  # ✅ Nuevo campo
@@ -1119,6 +1238,7 @@ def alert_list_page(request):
 
 
 
+@cached_view('alerts', timeout=10)
 def latest_alerts(request):
     # Filtrar alertas de las últimas 24 horas y ordenar por las más recientes
     time_threshold = timezone.now() - timedelta(hours=24)
@@ -1129,17 +1249,17 @@ def latest_alerts(request):
 
     alert_data = []
     for a in alerts:
-        # Procesar elementos faltantes del campo 'missing'
-        missing_elements = []
-        if a.missing:
-            missing_elements = [elemento.strip() for elemento in a.missing.split(',')]
+        # Elementos faltantes decodificados desde missing_mask (sin re-parsear el texto)
+        missing_elements = a.missing_elements
         
         alert_data.append({
             'id': a.pk,
             'message': a.message,
             'missing_elements': missing_elements,
             'timestamp': localtime(a.timestamp).strftime("%H:%M:%S %d-%m-%Y"), 
-            'video': a.video.url if a.video else None, 
+            'video': a.evidence_url, 
+            'thumbnail': a.thumbnail_url,
+            'thumbnail_webp': a.thumbnail_webp.url if a.thumbnail_webp else None,
             'level': a.level,
             'element_count': len(missing_elements),
             'resolved': a.resolved,  # ✅ Agregar estado de resolución
@@ -1206,6 +1326,7 @@ def resolve_alert(request, alert_id):
         }, status=500)
 
 @login_required
+@cached_view('alerts', timeout=30)
 def alert_statistics(request):
     """Obtiene estadísticas de las alertas"""
     # Alertas de las últimas 24 horas
@@ -1233,6 +1354,56 @@ def alert_statistics(request):
         'resolution_rate': (resolved_alerts / total_alerts * 100) if total_alerts > 0 else 0
     })
 
+@login_required
+def alert_trends(request):
+    """
+    Series de alertas por intervalo (hour/day/week) para gráficas.
+    Parámetros: bucket, start y end (YYYY-MM-DD, end inclusivo).
+    """
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return JsonResponse({'error': f'bucket debe ser uno de: {", ".join(BUCKETS)}'}, status=400)
+
+    today = timezone.localdate()
+    default_days = {'hour': 1, 'day': 30, 'week': 182}[bucket]
+    try:
+        end_date = date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        start_date = (date.fromisoformat(request.GET['start']) if request.GET.get('start')
+                      else end_date - timedelta(days=default_days - 1))
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido, use YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'error': 'start no puede ser posterior a end'}, status=400)
+
+    start = timezone.make_aware(timezone.datetime.combine(start_date, timezone.datetime.min.time()))
+    end = timezone.make_aware(timezone.datetime.combine(end_date + timedelta(days=1), timezone.datetime.min.time()))
+
+    try:
+        series, closed = alert_trend_series(bucket, start, end)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    labels = dict(Alert.LEVEL_CHOICES)
+    response = JsonResponse({
+        'bucket': bucket,
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'labels': [point['bucket'].isoformat() for point in series],
+        'total': [point['counts']['total'] for point in series],
+        'levels': {
+            labels[level]: [point['counts'][f'level_{level}'] for point in series]
+            for level in labels
+        },
+        'missing': {
+            etiqueta: [point['counts'][f'missing_{clave}'] for point in series]
+            for clave, etiqueta in EPP_ITEMS
+        },
+    })
+    # Un rango cerrado cambia poco (resoluciones, re-análisis), pero puede cambiar: sin immutable
+    response['Cache-Control'] = 'private, max-age=300' if closed else 'private, max-age=60'
+    return response
+
+
 @login_required
 def alert_resolution_modal(request, alert_id):
     """Devuelve el HTML del modal de resolución"""
@@ -1250,7 +1421,10 @@ def alert_resolution_modal(request, alert_id):
 from django.shortcuts import render
 from django.utils import timezone
 from datetime import timedelta, date
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import AlertDailySummary, EPP_ITEMS, EPP_ITEM_BITS, missing_labels_from_mask
+from .rollup import missing_item_filter
 
 # Importar el modelo (asume que está en .models o ajusta la importación)
 
@@ -1260,22 +1434,22 @@ from django.db.models import Count, Q
 def get_alerts_summary_report(start_date: date, end_date: date) -> dict:
     """
     Genera un resumen del conteo de alertas, agrupado por nivel y estado de resolución.
+    Lee el resumen diario materializado (una fila por día) en lugar de la tabla Alert.
     """
-    end_datetime = timezone.datetime.combine(end_date, timezone.localtime().max.time())
-    start_datetime = timezone.datetime.combine(start_date, timezone.localtime().min.time())
-
-    alerts = Alert.objects.filter(
-        timestamp__range=(start_datetime, end_datetime)
-    )
-
-    report_data = alerts.aggregate(
-        total_alerts=Count('id'),
-        high_alerts=Count('id', filter=Q(level='high')),
-        medium_alerts=Count('id', filter=Q(level='medium')),
-        low_alerts=Count('id', filter=Q(level='low')),
-        resolved_alerts=Count('id', filter=Q(resolved=True)),
-        non_compliant_alerts=Count('id', filter=Q(resolution_status='non_compliant')),
+    summaries = AlertDailySummary.objects.filter(date__range=(start_date, end_date))
+
+    report_data = summaries.aggregate(
+        total_alerts=Coalesce(Sum('total'), 0),
+        high_alerts=Coalesce(Sum('level_high'), 0),
+        medium_alerts=Coalesce(Sum('level_medium'), 0),
+        low_alerts=Coalesce(Sum('level_low'), 0),
+        resolved_alerts=Coalesce(Sum('resolved'), 0),
+        non_compliant_alerts=Coalesce(Sum('status_non_compliant'), 0),
+        casco_count=Coalesce(Sum('missing_helmet'), 0),
+        chaleco_count=Coalesce(Sum('missing_vest'), 0),
+        botas_count=Coalesce(Sum('missing_boots'), 0),
     )
+    report_data['unresolved_alerts'] = report_data['total_alerts'] - report_data['resolved_alerts']
 
     report_data['start_date'] = start_date
     report_data['end_date'] = end_date
@@ -1286,22 +1460,60 @@ def get_top_non_compliant_items(limit=10) -> list:
     """
     Identifica y cuenta los elementos (`missing`) más frecuentemente
     asociados con un 'Incumplimiento Real' ('non_compliant').
+    Agrupa por missing_mask, así "Casco, Chaleco" y "Chaleco, Casco" son
+    la misma combinación.
     """
-    top_items = Alert.objects.filter(
-        resolution_status='non_compliant'
-    ).exclude(
-        missing__isnull=True
-    ).exclude(
-        missing__exact=''
-    ).values(
-        'missing'
+    top_masks = Alert.objects.filter(
+        resolution_status='non_compliant',
+        missing_mask__gt=0
+    ).order_by().values(
+        'missing_mask'
     ).annotate(
-        count=Count('missing')
+        count=Count('id')
     ).order_by(
         '-count'
     )[:limit]
 
-    return list(top_items)
+    return [
+        {
+            'missing': ', '.join(missing_labels_from_mask(row['missing_mask'])),
+            'missing_mask': row['missing_mask'],
+            'count': row['count'],
+        }
+        for row in top_masks
+    ]
+
+
+def get_non_compliant_item_counts() -> list:
+    """Conteo por elemento de EPP en incumplimientos reales, en una sola consulta"""
+    counts = Alert.objects.filter(
+        resolution_status='non_compliant'
+    ).aggregate(**{
+        clave: Count('id', filter=missing_item_filter(clave)) for clave, _ in EPP_ITEMS
+    })
+
+    items = [{'missing': etiqueta, 'count': counts[clave]} for clave, etiqueta in EPP_ITEMS]
+    return sorted(items, key=lambda item: item['count'], reverse=True)
+
+
+def get_missing_item_cooccurrence() -> list:
+    """
+    Pares de elementos de EPP que faltan juntos en incumplimientos reales.
+    Se calcula a partir de los conteos por máscara (como mucho 2^N filas).
+    """
+    rows = Alert.objects.filter(
+        resolution_status='non_compliant',
+        missing_mask__gt=0
+    ).order_by().values('missing_mask').annotate(count=Count('id'))
+
+    pairs = []
+    for i, (clave_a, etiqueta_a) in enumerate(EPP_ITEMS):
+        for clave_b, etiqueta_b in EPP_ITEMS[i + 1:]:
+            bits = EPP_ITEM_BITS[clave_a] | EPP_ITEM_BITS[clave_b]
+            count = sum(row['count'] for row in rows if row['missing_mask'] & bits == bits)
+            if count:
+                pairs.append({'items': f'{etiqueta_a} + {etiqueta_b}', 'count': count})
+    return sorted(pairs, key=lambda pair: pair['count'], reverse=True)
 
 
 # --- Vista de Django ---
@@ -1310,6 +1522,7 @@ def alerts_report_view(request):
     """
     Muestra los reportes de resumen de alertas y objetos incumplidos.
     Permite filtrar por rango de fechas (últimos 7 días por defecto).
+    Se guardan los reportes, no la página (lleva el token CSRF de la sesión).
     """
     today = timezone.localdate()
     
@@ -1330,14 +1543,17 @@ def alerts_report_view(request):
         start_date = today - timedelta(days=6)
         end_date = today
 
-    # 3. Generar los reportes
-    summary_report = get_alerts_summary_report(start_date, end_date)
-    top_items_report = get_top_non_compliant_items(limit=10)
+    # 3. Generar los reportes (hasta 5 minutos o hasta que cambien las alertas)
+    reportes = cached_value(('alerts',), ('alerts_report', start_date, end_date), lambda: {
+        'summary': get_alerts_summary_report(start_date, end_date),
+        'top_items': get_top_non_compliant_items(limit=10),
+        'item_counts': get_non_compliant_item_counts(),
+        'item_pairs': get_missing_item_cooccurrence(),
+    }, timeout=300)
 
     # 4. Contexto para la plantilla
     context = {
-        'summary': summary_report,
-        'top_items': top_items_report,
+        **reportes,
         'start_date_input': start_date.isoformat(),
         'end_date_input': end_date.isoformat(),
     }
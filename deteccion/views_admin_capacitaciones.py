@@ -4,16 +4,15 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.http import JsonResponse, HttpResponse
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Count, Q, Avg
+from django.db.models import Count, Q, Avg, Max, Exists, OuterRef, Prefetch, Subquery
 from django.template.loader import render_to_string
 import csv
 from .models import *
 from .forms import *
+from .caching import cached_value, cached_view
 
-@login_required
-@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
-def dashboard_admin_capacitaciones(request):
-    """Dashboard principal para administradores/supervisores de capacitaciones"""
+def _datos_dashboard_capacitaciones():
+    """Estadísticas del dashboard, en consultas de agregación (se guardan en caché; la página no, lleva el token CSRF)"""
     # Estadísticas generales
     total_capacitaciones = Capacitacion.objects.count()
     capacitaciones_publicadas = Capacitacion.objects.filter(estado='publicada').count()
@@ -24,28 +23,26 @@ def dashboard_admin_capacitaciones(request):
     certificados_emitidos = Certificado.objects.count()
     
     # Capacitaciones recientes
-    capacitaciones_recientes = Capacitacion.objects.all().order_by('-fecha_creacion')[:5]
+    capacitaciones_recientes = list(Capacitacion.objects.all().order_by('-fecha_creacion')[:5])
     
-    # Trabajadores con bajo progreso
+    # Trabajadores con bajo progreso: una consulta con las completadas de cada uno
     trabajadores_bajo_progreso = []
-    trabajadores = User.objects.filter(groups__name='trabajador')
-    
-    for trabajador in trabajadores:
-        progresos = ProgresoCapacitacion.objects.filter(usuario=trabajador)
-        total_capacitaciones_trab = Capacitacion.objects.filter(estado='publicada').count()
-        completadas = progresos.filter(completada=True).count()
-        
-        if total_capacitaciones_trab > 0:
-            porcentaje = (completadas / total_capacitaciones_trab) * 100
+    trabajadores = User.objects.filter(groups__name='trabajador').annotate(
+        completadas=Count('progresocapacitacion', filter=Q(progresocapacitacion__completada=True))
+    )
+
+    if capacitaciones_publicadas > 0:
+        for trabajador in trabajadores:
+            porcentaje = (trabajador.completadas / capacitaciones_publicadas) * 100
             if porcentaje < 50:  # Menos del 50% de progreso
                 trabajadores_bajo_progreso.append({
                     'trabajador': trabajador,
-                    'completadas': completadas,
-                    'total': total_capacitaciones_trab,
+                    'completadas': trabajador.completadas,
+                    'total': capacitaciones_publicadas,
                     'porcentaje': porcentaje
                 })
     
-    context = {
+    return {
         'total_capacitaciones': total_capacitaciones,
         'capacitaciones_publicadas': capacitaciones_publicadas,
         'total_trabajadores': total_trabajadores,
@@ -54,6 +51,13 @@ def dashboard_admin_capacitaciones(request):
         'capacitaciones_recientes': capacitaciones_recientes,
         'trabajadores_bajo_progreso': trabajadores_bajo_progreso[:5],
     }
+
+@login_required
+@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
+def dashboard_admin_capacitaciones(request):
+    """Dashboard principal para administradores/supervisores de capacitaciones"""
+    context = cached_value(('capacitaciones',), ('dashboard_admin_capacitaciones',),
+                           _datos_dashboard_capacitaciones, timeout=300)
     return render(request, 'capacitacion/inicio_capacitaciones.html', context)
 
 @login_required
@@ -235,41 +239,37 @@ def eliminar_opcion(request, opcion_id):
     messages.success(request, 'Opción eliminada exitosamente')
     return redirect('deteccion:gestionar_preguntas', evaluacion_id=evaluacion_id)
 
-@login_required
-@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
-def reporte_progreso_general(request):
-    """Reporte general de progreso de todos los trabajadores"""
-    trabajadores = User.objects.filter(groups__name='trabajador')
-    capacitaciones = Capacitacion.objects.filter(estado='publicada')
-    
+def _datos_progreso_general():
+    """
+    Datos del reporte general: una consulta anotada para los trabajadores más
+    dos prefetch (progresos y certificados), en listas que se guardan en caché
+    sin que la plantilla vuelva a consultar
+    """
+    capacitaciones = list(Capacitacion.objects.filter(estado='publicada'))
+    total_capacitaciones = len(capacitaciones)
+    total_evaluaciones = Evaluacion.objects.filter(capacitacion__in=capacitaciones, activa=True).count()
+
+    trabajadores = User.objects.filter(groups__name='trabajador').select_related('empleado__cargo').annotate(
+        completadas=Count('progresocapacitacion', filter=Q(progresocapacitacion__completada=True), distinct=True),
+        evaluaciones_aprobadas=Count('intentoevaluacion__evaluacion', filter=Q(intentoevaluacion__aprobado=True),
+                                     distinct=True),
+    ).prefetch_related(
+        Prefetch('progresocapacitacion_set', to_attr='progresos'),
+        Prefetch('certificado_set', queryset=Certificado.objects.select_related('capacitacion'), to_attr='certificados'),
+    )
+
     datos_trabajadores = []
-    
+
     for trabajador in trabajadores:
-        progresos = ProgresoCapacitacion.objects.filter(usuario=trabajador)
-        certificados = Certificado.objects.filter(usuario=trabajador)
-        intentos = IntentoEvaluacion.objects.filter(usuario=trabajador)
-        
-        # Calcular estadísticas
-        completadas = progresos.filter(completada=True).count()
-        total_capacitaciones = capacitaciones.count()
-        porcentaje_progreso = (completadas / total_capacitaciones * 100) if total_capacitaciones > 0 else 0
-        
-        # Evaluaciones aprobadas vs total
-        evaluaciones_aprobadas = intentos.filter(aprobado=True).values('evaluacion').distinct().count()
-        total_evaluaciones = Evaluacion.objects.filter(
-            capacitacion__in=capacitaciones, 
-            activa=True
-        ).count()
-        
+        porcentaje_progreso = (trabajador.completadas / total_capacitaciones * 100) if total_capacitaciones > 0 else 0
         datos_trabajadores.append({
             'trabajador': trabajador,
-            'progresos': progresos,
-            'certificados': certificados,
-            'intentos': intentos,
-            'completadas': completadas,
+            'progresos': trabajador.progresos,
+            'certificados': trabajador.certificados,
+            'completadas': trabajador.completadas,
             'total_capacitaciones': total_capacitaciones,
             'porcentaje_progreso': porcentaje_progreso,
-            'evaluaciones_aprobadas': evaluaciones_aprobadas,
+            'evaluaciones_aprobadas': trabajador.evaluaciones_aprobadas,
             'total_evaluaciones': total_evaluaciones,
             'estado': 'Cumpliendo' if porcentaje_progreso >= 70 else 'En riesgo' if porcentaje_progreso >= 30 else 'No cumpliendo'
         })
@@ -283,7 +283,7 @@ def reporte_progreso_general(request):
     trabajadores_riesgo = len([t for t in datos_trabajadores if 30 <= t['porcentaje_progreso'] < 70])
     trabajadores_no_cumpliendo = len([t for t in datos_trabajadores if t['porcentaje_progreso'] < 30])
     
-    context = {
+    return {
         'datos_trabajadores': datos_trabajadores,
         'total_trabajadores': total_trabajadores,
         'trabajadores_cumpliendo': trabajadores_cumpliendo,
@@ -291,10 +291,17 @@ def reporte_progreso_general(request):
         'trabajadores_no_cumpliendo': trabajadores_no_cumpliendo,
         'capacitaciones': capacitaciones,
     }
+
+@login_required
+@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
+def reporte_progreso_general(request):
+    """Reporte general de progreso de todos los trabajadores"""
+    context = cached_value(('capacitaciones',), ('reporte_progreso_general',), _datos_progreso_general, timeout=300)
     return render(request, 'capacitacion/reporte_progreso_general.html', context)
 
 @login_required
 @permission_required('deteccion.can_create_evaluacion', raise_exception=True)
+@cached_view('capacitaciones', timeout=300)
 def exportar_reporte_progreso(request):
     """Exportar reporte de progreso a CSV"""
     trabajadores = User.objects.filter(groups__name='trabajador')
@@ -384,37 +391,74 @@ def detalle_progreso_trabajador(request, usuario_id):
     }
     return render(request, 'capacitacion/detalle_progreso_trabajador.html', context)
 
-@login_required
-@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
-def reporte_capacitacion_detalle(request, capacitacion_id):
-    """Reporte detallado de una capacitación específica"""
-    capacitacion = get_object_or_404(Capacitacion, id=capacitacion_id)
-    trabajadores = User.objects.filter(groups__name='trabajador')
-    
+def _datos_capacitacion_detalle(capacitacion):
+    """Datos del reporte de la capacitación (se guardan en caché; la página no)"""
+    evaluacion = capacitacion.evaluacion if hasattr(capacitacion, 'evaluacion') else None
+
+    # Una sola consulta: progreso, certificado e intentos se resuelven con
+    # subconsultas y agregados en lugar de consultas por trabajador.
+    # Los intentos se filtran por la evaluación (no por capacitación) para
+    # que la subconsulta use el índice de usuario sin unir con evaluaciones.
+    progreso_qs = ProgresoCapacitacion.objects.filter(usuario=OuterRef('pk'), capacitacion=capacitacion)
+    certificado_qs = Certificado.objects.filter(usuario=OuterRef('pk'), capacitacion=capacitacion)
+    ultimo_intento_qs = IntentoEvaluacion.objects.filter(
+        usuario=OuterRef('pk'),
+        evaluacion=evaluacion
+    ).order_by('-fecha_intento')
+    filtro_intentos = Q(intentoevaluacion__evaluacion=evaluacion)
+
+    trabajadores = User.objects.filter(groups__name='trabajador').annotate(
+        tiene_progreso=Exists(progreso_qs),
+        progreso_completada=Subquery(progreso_qs.values('completada')[:1]),
+        progreso_fecha_inicio=Subquery(progreso_qs.values('fecha_inicio')[:1]),
+        progreso_fecha_completacion=Subquery(progreso_qs.values('fecha_completacion')[:1]),
+        tiene_certificado=Exists(certificado_qs),
+        codigo_certificado=Subquery(certificado_qs.values('codigo_certificado')[:1]),
+        total_intentos=Count('intentoevaluacion', filter=filtro_intentos),
+        mejor_puntaje=Max('intentoevaluacion__puntaje_obtenido', filter=filtro_intentos),
+        ultimo_intento_aprobado=Subquery(ultimo_intento_qs.values('aprobado')[:1]),
+        ultimo_intento_numero=Subquery(ultimo_intento_qs.values('numero_intento')[:1]),
+    ).order_by('id')
+
     datos_trabajadores = []
+    trabajadores_completados = 0
+    trabajadores_certificados = 0
     for trabajador in trabajadores:
-        progreso = ProgresoCapacitacion.objects.filter(usuario=trabajador, capacitacion=capacitacion).first()
-        certificado = Certificado.objects.filter(usuario=trabajador, capacitacion=capacitacion).first()
-        intentos = IntentoEvaluacion.objects.filter(
-            usuario=trabajador, 
-            evaluacion__capacitacion=capacitacion
-        ).order_by('-fecha_intento')
-        
+        progreso = None
+        if trabajador.tiene_progreso:
+            progreso = {
+                'completada': trabajador.progreso_completada,
+                'fecha_inicio': trabajador.progreso_fecha_inicio,
+                'fecha_completacion': trabajador.progreso_fecha_completacion,
+            }
+            if trabajador.progreso_completada:
+                trabajadores_completados += 1
+
+        certificado = None
+        if trabajador.tiene_certificado:
+            certificado = {'codigo_certificado': trabajador.codigo_certificado}
+            trabajadores_certificados += 1
+
+        ultimo_intento = None
+        if trabajador.total_intentos:
+            ultimo_intento = {
+                'aprobado': trabajador.ultimo_intento_aprobado,
+                'numero_intento': trabajador.ultimo_intento_numero,
+            }
+
         datos_trabajadores.append({
             'trabajador': trabajador,
             'progreso': progreso,
             'certificado': certificado,
-            'intentos': intentos,
-            'ultimo_intento': intentos.first() if intentos.exists() else None,
-            'mejor_puntaje': max([i.puntaje_obtenido for i in intentos]) if intentos.exists() else 0,
+            'total_intentos': trabajador.total_intentos,
+            'ultimo_intento': ultimo_intento,
+            'mejor_puntaje': trabajador.mejor_puntaje or 0,
         })
-    
+
     # Estadísticas de la capacitación
     total_trabajadores = len(datos_trabajadores)
-    trabajadores_completados = len([t for t in datos_trabajadores if t['progreso'] and t['progreso'].completada])
-    trabajadores_certificados = len([t for t in datos_trabajadores if t['certificado']])
-    
-    context = {
+
+    return {
         'capacitacion': capacitacion,
         'datos_trabajadores': datos_trabajadores,
         'total_trabajadores': total_trabajadores,
@@ -422,6 +466,14 @@ def reporte_capacitacion_detalle(request, capacitacion_id):
         'trabajadores_certificados': trabajadores_certificados,
         'porcentaje_completado': (trabajadores_completados / total_trabajadores * 100) if total_trabajadores > 0 else 0,
     }
+
+@login_required
+@permission_required('deteccion.can_create_evaluacion', raise_exception=True)
+def reporte_capacitacion_detalle(request, capacitacion_id):
+    """Reporte detallado de una capacitación específica"""
+    capacitacion = get_object_or_404(Capacitacion.objects.select_related('evaluacion'), id=capacitacion_id)
+    context = cached_value(('capacitaciones',), ('reporte_capacitacion_detalle', capacitacion.pk),
+                           lambda: _datos_capacitacion_detalle(capacitacion), timeout=300)
     return render(request, 'capacitacion/reporte_capacitacion_detalle.html', context)
 
 
@@ -694,49 +746,8 @@ def _get_mensaje_exito(accion, created):
     return mensajes.get(accion, 'Progreso actualizado')
 
 
-# Agregar estas vistas al final de views_admin_capacitaciones.py
-
-@login_required
-def inicio_trabajador(request):
-    """Vista principal del panel del trabajador"""
-    # Obtener solo capacitaciones publicadas
-    capacitaciones = Capacitacion.objects.filter(estado='publicada').order_by('-fecha_creacion')
-    
-    # Obtener progresos del usuario actual
-    progresos = ProgresoCapacitacion.objects.filter(usuario=request.user).select_related('capacitacion')
-    
-    # Combinar capacitaciones con progresos
-    capacitaciones_con_progreso = []
-    for capacitacion in capacitaciones:
-        progreso = progresos.filter(capacitacion=capacitacion).first()
-        capacitaciones_con_progreso.append({
-            'capacitacion': capacitacion,
-            'progreso': progreso
-        })
-    
-    # Obtener certificados del usuario
-    certificados = Certificado.objects.filter(usuario=request.user)
-    
-    # Calcular estadísticas
-    total_capacitaciones = capacitaciones.count()
-    capacitaciones_completadas = progresos.filter(completada=True).count()
-    
-    # Calcular porcentaje de progreso general
-    if total_capacitaciones > 0:
-        porcentaje_progreso = (capacitaciones_completadas / total_capacitaciones) * 100
-    else:
-        porcentaje_progreso = 0
-    
-    context = {
-        'capacitaciones_con_progreso': capacitaciones_con_progreso,
-        'total_capacitaciones': total_capacitaciones,
-        'capacitaciones_completadas': capacitaciones_completadas,
-        'porcentaje_progreso': porcentaje_progreso,
-        'certificados': certificados,
-        'progresos': progresos,
-        'current_date': timezone.now(),
-    }
-    return render(request, 'capacitacion/inicio_trabajador.html', context)
+# El panel del trabajador tiene una única implementación en views.py
+from .views import inicio_trabajador
 
 @login_required
 def detalle_capacitacion(request, pk):
@@ -1,8 +1,10 @@
 # gunicorn.conf.py
-import multiprocessing
-
 # Configuración optimizada para Render.com
 bind = "0.0.0.0:10000"
+# Un solo worker: VideoProcessor es por proceso y, con CAMERAS_IN_WEB_PROCESS, camera_feed
+# arranca el supervisor de cámaras en el worker, así que cada worker abriría de nuevo cada
+# stream de DroidCam y guardaría alertas duplicadas. Con las cámaras sólo en
+# `manage.py run_cameras` se puede pasar a deteccion.preload.recommended_workers.
 workers = 1
 worker_class = "sync"
 worker_connections = 1000
@@ -17,5 +19,14 @@ accesslog = "-"
 errorlog = "-"
 loglevel = "info"
 
+def when_ready(server):
+    # Con preload_app la aplicación ya está cargada en el master: se carga y calienta
+    # el modelo antes del fork y se congela el heap para que los workers compartan
+    # esas páginas (copy-on-write) también después de que corra el GC
+    from deteccion.preload import freeze_heap, preload_models
+    modelos = preload_models()
+    congelados = freeze_heap()
+    server.log.info(f"Modelos precargados: {modelos or 'ninguno'}; {congelados} objetos congelados; {workers} workers")
+
 def worker_abort(worker):
-    worker.log.info("worker received ABORT")
\ No newline at end of file
+    worker.log.info("worker received ABORT")
@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+import tempfile
+from decouple import Csv, config
 import dj_database_url
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -79,9 +80,14 @@ WSGI_APPLICATION = 'sistema.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Conexiones persistentes: cada worker/hilo reutiliza su conexión (en Render, con TLS)
+# hasta DB_CONN_MAX_AGE segundos, verificándola antes de reutilizarla.
+# DB_CONN_MAX_AGE=0 vuelve a una conexión por petición.
 DATABASES = {
     'default': dj_database_url.config(
-        default=config('DATABASE_URL', default='sqlite:///db.sqlite3')
+        default=config('DATABASE_URL', default='sqlite:///db.sqlite3'),
+        conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
+        conn_health_checks=True,
     )
 }
 
@@ -127,6 +133,21 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Grabaciones de las cámaras (servidas, con login, en /grabaciones/<archivo>)
+RECORDINGS_ROOT = BASE_DIR / 'grabaciones'
+
+# Media y grabaciones se sirven con login, Range y GET condicional (deteccion/media.py).
+# Detrás de nginx: MEDIA_ACCEL_REDIRECT=/protected/ y una location interna por carpeta
+# (/protected/media/ -> MEDIA_ROOT, /protected/grabaciones/ -> RECORDINGS_ROOT).
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default='')
+MEDIA_ACCEL_HEADER = config('MEDIA_ACCEL_HEADER', default='X-Accel-Redirect')
+MEDIA_MAX_AGE = config('MEDIA_MAX_AGE', default=3600, cast=int)
+
+# Miniaturas de las capturas de alertas para las listas (deteccion/thumbnails.py)
+ALERT_THUMBNAIL_WIDTH = config('ALERT_THUMBNAIL_WIDTH', default=320, cast=int)
+ALERT_THUMBNAIL_QUALITY = config('ALERT_THUMBNAIL_QUALITY', default=75, cast=int)
+ALERT_THUMBNAIL_WEBP = config('ALERT_THUMBNAIL_WEBP', default=True, cast=bool)
+ALERT_THUMBNAIL_QUEUE = config('ALERT_THUMBNAIL_QUEUE', default=32, cast=int)
 
 
 # Default primary key field type
@@ -136,4 +157,56 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-MODEL_PATH = config('MODEL_PATH', default=os.path.join(BASE_DIR, 'models', 'best.pt'))
\ No newline at end of file
+# Modelo YOLO de las cámaras, del video demo (VideoProcessor) y de la precarga.
+# Sin MODEL_PATH se usa models/best.pt o, si no existe, models2/Models/best.pt (despliegue en Render)
+_MODEL_CANDIDATES = [BASE_DIR / 'models' / 'best.pt', BASE_DIR / 'models2' / 'Models' / 'best.pt']
+MODEL_PATH = config('MODEL_PATH', default=str(next((p for p in _MODEL_CANDIDATES if p.exists()), _MODEL_CANDIDATES[0])))
+
+# Modelos que el master de gunicorn carga y calienta antes del fork para que los
+# workers los compartan (copy-on-write, ver deteccion/preload.py y gunicorn.conf.py)
+PRELOAD_MODELS = config('PRELOAD_MODELS', default=MODEL_PATH, cast=Csv())
+
+# Las cámaras (captura + YOLO + alertas) corren en `manage.py run_cameras`. Sólo con
+# CAMERAS_IN_WEB_PROCESS=True el proceso web arranca su propio supervisor para
+# camera_feed/camera_health (desarrollo con runserver); nunca junto con run_cameras,
+# porque cada cámara se capturaría dos veces y cada alerta quedaría duplicada.
+CAMERAS_IN_WEB_PROCESS = config('CAMERAS_IN_WEB_PROCESS', default=False, cast=bool)
+
+# Detección en dos etapas: personas a baja resolución y EPP sobre recortes
+# de cada persona a TWO_STAGE_CROP_IMGSZ (ver deteccion/detections.py)
+TWO_STAGE_DETECTION = config('TWO_STAGE_DETECTION', default=False, cast=bool)
+TWO_STAGE_CROP_IMGSZ = config('TWO_STAGE_CROP_IMGSZ', default=640, cast=int)
+
+# Caché: 'default' en memoria (por proceso) y 'reports' en archivos, compartida entre
+# los workers de gunicorn (reportes y endpoints JSON, ver deteccion/caching.py).
+# Con REDIS_URL ambas usan Redis (requiere el paquete redis).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+        'reports': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL,
+                    'KEY_PREFIX': 'reports'},
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'epp-default'},
+        'reports': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'epp_cache')),
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        },
+    }
+
+# Token para que Prometheus lea /metrics sin sesión (Authorization: Bearer <token>).
+# Sin token sólo pueden verlo usuarios staff.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Watchdog de memoria (MB de memoria privada -USS- del proceso, sin el modelo compartido con el master; 0 desactiva el nivel, ver deteccion/memory.py):
+# warn = gc.collect(), shed = streams hasta 480p, degrade = miniaturas e imgsz reducido,
+# recycle = reciclar el worker de gunicorn. MEMORY_WATCHDOG_INTERVAL=0 lo desactiva.
+MEMORY_WATCHDOG_INTERVAL = config('MEMORY_WATCHDOG_INTERVAL', default=15, cast=float)
+MEMORY_WARN_MB = config('MEMORY_WARN_MB', default=400, cast=int)
+MEMORY_SHED_MB = config('MEMORY_SHED_MB', default=430, cast=int)
+MEMORY_DEGRADE_MB = config('MEMORY_DEGRADE_MB', default=460, cast=int)
+MEMORY_RECYCLE_MB = config('MEMORY_RECYCLE_MB', default=490, cast=int)
+MEMORY_DEGRADED_IMGSZ = config('MEMORY_DEGRADED_IMGSZ', default=224, cast=int)